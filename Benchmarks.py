@@ -0,0 +1,781 @@
+"""
+Бенчмарки обработки на стороне Raspberry Pi.
+
+Запуск:
+    python Benchmarks.py pool [--packets N] [--workers 1 2 4]
+    python Benchmarks.py validate [--packets N]
+    python Benchmarks.py suite [--packets N] [--capture capture.bin] [--json results.json]
+    python Benchmarks.py codecs [--packets N] [--capture capture.bin] [--budget BYTES]
+    python Benchmarks.py logging [--packets N] [--console-bps B/S]
+    python Benchmarks.py dc [--packets N] [--capture capture.bin] [--glitch-rate P]
+    python Benchmarks.py ingest [--packets N] [--capture capture.bin] [--baud B]
+"""
+import argparse
+import bisect
+import json
+import os
+import platform
+import resource
+import struct
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+import ByInConvert
+import Dc_Blocker
+import Uart_Logic
+import Detect_Pool
+import Frame_Protocol
+import Log_Queue
+import Packet_Framer
+import Stream_Detect
+import Uart_Ingest
+import Uart_Replay
+import Wave_Codec
+
+PACKET_SAMPLES = 4800
+PEAK_THRESHOLD = 150000000
+# Полезная скорость Zigbee-линка: 9600 бод, 8N1
+LINK_BYTES_PER_S = 960
+# Serial-консоль Pi: 115200 бод, 8N1
+CONSOLE_BYTES_PER_S = 11520
+
+
+# ============================================================================
+# ДАННЫЕ
+# ============================================================================
+def synthetic_packets(count, events_per_packet=1, samples=PACKET_SAMPLES, seed=0):
+    """
+    Синтетические пакеты (np.int64, смещение уже удалено): шум АЦП + короткие всплески.
+    """
+    rng = np.random.default_rng(seed)
+    packets = []
+    for _ in range(count):
+        packet = rng.integers(-20000, 20000, samples, dtype=np.int64)
+        for _ in range(events_per_packet):
+            length = int(rng.integers(50, 800))
+            start = int(rng.integers(0, samples - length))
+            burst = rng.standard_normal(length) * 6e8 * np.hanning(length)
+            packet[start:start + length] += burst.astype(np.int64)
+        packets.append(packet)
+    return packets
+
+
+# ============================================================================
+# ДЕТЕКЦИЯ: В ПОТОКЕ vs ПУЛ ПРОЦЕССОВ
+# ============================================================================
+def bench_detection_pool(packets, workers=(1, 2, 4), threshold=PEAK_THRESHOLD):
+    """
+    Пропускная способность детекции (пакетов/с): в потоке и в Detect_Pool с N воркерами.
+    Заодно проверяет, что пул выдаёт те же события в том же порядке.
+    """
+    results = {}
+
+    t0 = time.perf_counter()
+    reference = [Uart_Logic.analyze_packet(p, threshold) for p in packets]
+    elapsed = time.perf_counter() - t0
+    results["in_thread"] = {"packets_per_s": len(packets) / elapsed}
+
+    for n in workers:
+        pool = Detect_Pool.DetectionPool(workers=n)
+        try:
+            # Прогрев: запуск процессов и импорт модулей в воркерах
+            for i, p in enumerate(packets[:n * 2]):
+                pool.submit(i, p, threshold)
+            list(pool.collect(block=True))
+
+            out = []
+            t0 = time.perf_counter()
+            for i, p in enumerate(packets):
+                pool.submit(i, p, threshold)
+                out.extend(pool.collect())
+            out.extend(pool.collect(block=True))
+            elapsed = time.perf_counter() - t0
+        finally:
+            pool.close()
+
+        in_order = [meta for meta, _ in out] == list(range(len(packets)))
+        same = [analysis for _, analysis in out] == reference
+        results[f"pool_{n}"] = {
+            "packets_per_s": len(packets) / elapsed,
+            "in_order": in_order,
+            "same_events": same,
+        }
+
+    return results
+
+
+# ============================================================================
+# ВАЛИДАЦИЯ: is_packet_valid_lite vs NumPy
+# ============================================================================
+def validation_cases(seed=0):
+    """Окна для проверки эквивалентности, включая граничные случаи"""
+    rng = np.random.default_rng(seed)
+    cases = [
+        np.empty(0, dtype=np.int64),
+        np.zeros(100, dtype=np.int64),
+        np.array([999, -999], dtype=np.int64),
+        np.array([1000], dtype=np.int64),
+        np.array([-1000, 0, 0], dtype=np.int64),
+        np.array([4000000000, -5], dtype=np.int64),
+        np.array([4000000001], dtype=np.int64),
+        np.array([-4000000001, 10], dtype=np.int64),
+        np.array([5000] + [1000] * 49, dtype=np.int64),  # ровно 20% от максимума - не активна
+        np.array([5000] + [0] * 49, dtype=np.int64),  # одна "игла" на 50 точек: 1 > 1.0 - нет
+        np.array([5000, 5000] + [0] * 48, dtype=np.int64),
+    ]
+    for _ in range(2000):
+        n = int(rng.integers(1, 3000))
+        scale = 10 ** rng.uniform(1, 10)
+        window = (rng.standard_normal(n) * scale).astype(np.int64)
+        if rng.random() < 0.3:
+            # Редкие иглы на фоне тишины
+            window[:] //= 1000
+            window[rng.integers(0, n, int(rng.integers(1, 5)))] = int(scale)
+        cases.append(window)
+    return cases
+
+
+def bench_validation(packets, threshold=PEAK_THRESHOLD, window=300):
+    """
+    Эквивалентность is_packet_valid_np / validate_windows и is_packet_valid_lite,
+    плюс время валидации всех событий пакета: старый путь (tolist на событие) vs пакетный.
+    """
+    cases = validation_cases()
+    mismatches = sum(
+        Uart_Logic.is_packet_valid_np(c) != Uart_Logic.is_packet_valid_lite(c.tolist()) for c in cases
+    )
+
+    events = [Uart_Logic.detect_peaks(p, threshold) for p in packets]
+    batch_mismatches = 0
+    old_time = new_time = 0.0
+    total_events = 0
+    for packet, packet_events in zip(packets, events):
+        if not packet_events:
+            continue
+        total_events += len(packet_events)
+        starts = [max(0, s - window) for s, _ in packet_events]
+        ends = [min(len(packet), e + window) for _, e in packet_events]
+
+        t0 = time.perf_counter()
+        old = [Uart_Logic.is_packet_valid_lite(packet[s:e].tolist()) for s, e in zip(starts, ends)]
+        t1 = time.perf_counter()
+        new = Uart_Logic.validate_windows(packet, starts, ends)
+        t2 = time.perf_counter()
+
+        old_time += t1 - t0
+        new_time += t2 - t1
+        batch_mismatches += int(np.count_nonzero(np.array(old) != new))
+
+    return {
+        "equivalence": {
+            "cases": len(cases),
+            "mismatches": mismatches,
+            "batch_events": total_events,
+            "batch_mismatches": batch_mismatches,
+        },
+        "timing": {
+            "lite_us_per_packet": old_time / len(packets) * 1e6,
+            "batched_us_per_packet": new_time / len(packets) * 1e6,
+        },
+    }
+
+
+# ============================================================================
+# НАБОР БЕНЧМАРКОВ ПО СТАДИЯМ
+# ============================================================================
+def measure(func, items, memory=True):
+    """
+    Вызывает func(item) для каждого элемента.
+
+    Returns:
+        dict: mean / p99 задержки на элемент (мкс), элементов/с, пик памяти (КБ, tracemalloc)
+    """
+    durations = np.empty(len(items))
+    for i, item in enumerate(items):
+        t0 = time.perf_counter()
+        func(item)
+        durations[i] = time.perf_counter() - t0
+
+    row = {
+        "mean_us": float(durations.mean() * 1e6) if len(items) else 0.0,
+        "p99_us": float(np.percentile(durations, 99) * 1e6) if len(items) else 0.0,
+        "per_s": float(len(items) / durations.sum()) if durations.sum() > 0 else 0.0,
+    }
+
+    if memory:
+        # Отдельный прогон: tracemalloc сильно замедляет и исказил бы время
+        tracemalloc.start()
+        for item in items:
+            func(item)
+        row["peak_kb"] = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+
+    return row
+
+
+def packets_from_capture(data):
+    """(сырые пакеты с маркерами, сэмплы np.int64 со снятым смещением) из записи UART"""
+    framer = Packet_Framer.PacketFramer(capacity=max(1 << 18, len(data) + 1))
+    framer.feed(data)
+    frames = [bytes(frame) for frame in framer.iter_frames()]
+    frames = [frame for frame in frames if len(frame) > 19000]
+    packets = []
+    for frame in frames:
+        packet = ByInConvert.bytesArrayConvert(frame).astype(np.int64)
+        packet -= packet[0]
+        packets.append(packet)
+    return frames, packets
+
+
+def _legacy_framing(chunks):
+    """Старый поиск пакетов из main_serial_reader: find с нуля + копия хвоста буфера"""
+    buffer = bytearray()
+    end_marker = Uart_Logic.Serial_reader.END_MARKER
+    start_marker = Uart_Logic.Serial_reader.START_MARKER
+
+    def feed(chunk):
+        nonlocal buffer
+        buffer.extend(chunk)
+        while True:
+            idx_end = buffer.find(end_marker)
+            if idx_end == -1:
+                return
+            idx_start = buffer[:idx_end].rfind(start_marker)
+            end_pos = idx_end + len(end_marker)
+            if idx_start != -1:
+                bytes(buffer[idx_start:end_pos])
+            buffer = buffer[end_pos:]
+
+    return feed
+
+
+def _legacy_frame_build(item):
+    """Старая сборка PKT: tolist() всего пакета, срез, np.array, tobytes, конкатенация"""
+    packet, start, end = item
+    packet_list = packet.tolist()
+    window = packet_list[max(0, start - 300):min(len(packet_list), end + 300)]
+    arr = np.array(window[::4], dtype=np.int64).astype(np.int32)
+    return b"\r" + b"PKT" + struct.pack(">IIHH", 1, max(0, start - 300), 4, len(arr)) + arr.tobytes()
+
+
+def bench_stages(frames, packets, threshold=PEAK_THRESHOLD, chunk=4096, memory=True):
+    """Задержка и память каждой стадии на наборе пакетов"""
+    results = {}
+
+    results["convert_list"] = measure(ByInConvert.bytesIntsConvert, frames, memory)
+    results["convert_numpy"] = measure(
+        lambda f: ByInConvert.bytesArrayConvert(f).astype(np.int64), frames, memory
+    )
+
+    stream = b"".join(frames)
+    chunks = [stream[i:i + chunk] for i in range(0, len(stream), chunk)]
+    scale = len(chunks) / max(1, len(frames))  # пересчёт "на чанк" в "на пакет"
+    for name, make_feed in (
+            ("framing_legacy", _legacy_framing),
+            ("framing_framer", lambda _: _framer_feed(Packet_Framer.PacketFramer())),
+    ):
+        row = measure(make_feed(None), chunks, memory=False)
+        row["mean_us"] *= scale
+        row["per_s"] /= scale
+        row["note"] = f"p99 per {chunk}-byte chunk"
+        if memory:
+            feed = make_feed(None)
+            tracemalloc.start()
+            for c in chunks:
+                feed(c)
+            row["peak_kb"] = tracemalloc.get_traced_memory()[1] / 1024
+            tracemalloc.stop()
+        results[name] = row
+
+    results["detect_packet"] = measure(lambda p: Uart_Logic.detect_peaks(p, threshold), packets, memory)
+    detector = Stream_Detect.StreamingPeakDetector(threshold)
+    results["detect_stream"] = measure(lambda p: detector.process(p), packets, memory)
+
+    events = [(p, Uart_Logic.detect_peaks(p, threshold)) for p in packets]
+    results["validate_lite"] = measure(
+        lambda item: [
+            Uart_Logic.is_packet_valid_lite(item[0][max(0, s - 300):e + 300].tolist()) for s, e in item[1]
+        ],
+        events, memory,
+    )
+    results["validate_batched"] = measure(
+        lambda item: Uart_Logic.validate_windows(
+            item[0], [max(0, s - 300) for s, _ in item[1]], [min(len(item[0]), e + 300) for _, e in item[1]]
+        ),
+        events, memory,
+    )
+    results["analyze_packet"] = measure(lambda p: Uart_Logic.analyze_packet(p, threshold), packets, memory)
+
+    per_event = [(p, s, e) for p, evs in events for s, e in evs]
+    builder = Frame_Protocol.ZigbeeFrameBuilder()
+    results["frame_build_legacy"] = measure(_legacy_frame_build, per_event, memory)
+    results["frame_build_builder"] = measure(
+        lambda item: builder.build_pkt(item[0][max(0, item[1] - 300):item[2] + 300], 1, item[1], 4),
+        per_event, memory,
+    )
+    return results
+
+
+def _framer_feed(framer):
+    def feed(chunk):
+        framer.feed(chunk)
+        for _ in framer.iter_frames():
+            pass
+    return feed
+
+
+def bench_full_pipeline(capture):
+    """Полный конвейер Serial_reader на записи (максимальная скорость воспроизведения)"""
+    results = {}
+    for name, kwargs in (
+            ("inline", {"read_mode": "select", "detector": "packet", "staged": False}),
+            ("staged_stream", {"read_mode": "select", "detector": "stream", "staged": True}),
+    ):
+        report = Uart_Replay.run_replay(capture, speed=0, reader_kwargs=kwargs)
+        results[name] = {
+            "packets": report["packets"],
+            "events": report["events"],
+            "packets_per_s": report["packets_per_s"],
+            "events_per_s": report["events_per_s"],
+            "mean_us": report["elapsed_s"] / max(1, report["packets"]) * 1e6,
+        }
+    return results
+
+
+def _pi_model():
+    try:
+        with open("/proc/device-tree/model") as f:
+            return f.read().strip("\x00\n ")
+    except OSError:
+        return None
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5,
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run_suite(packets_count=300, events_per_packet=1, capture_path=None, memory=True, pipeline=True):
+    """Все стадии на синтетических (и записанных, если есть) пакетах + метаданные прогона"""
+    datasets = {}
+    synthetic = synthetic_packets(packets_count, events_per_packet=events_per_packet)
+    datasets["synthetic"] = Uart_Replay.synthetic_capture(synthetic)
+    if capture_path:
+        with open(capture_path, "rb") as f:
+            datasets[os.path.basename(capture_path)] = f.read()
+
+    results = {}
+    for name, capture in datasets.items():
+        frames, packets = packets_from_capture(capture)
+        results[name] = {"packets": len(packets), "stages": bench_stages(frames, packets, memory=memory)}
+        if pipeline:
+            results[name]["pipeline"] = bench_full_pipeline(capture)
+
+    return {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "machine": platform.machine(),
+            "pi_model": _pi_model(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        },
+        "results": results,
+    }
+
+
+# ============================================================================
+# КОДЕКИ ФОРМЫ СИГНАЛА
+# ============================================================================
+def event_windows(packets, threshold=PEAK_THRESHOLD):
+    """Прореженные окна событий - ровно то, что уходит в payload PKT/EVT"""
+    windows = []
+    for packet in packets:
+        for start, end in Uart_Logic.detect_peaks(packet, threshold):
+            _, window = Uart_Logic.Serial_reader.event_window(packet, start, end)
+            windows.append(window[::Uart_Logic.EVENT_COMPRESSION])
+    return windows
+
+
+def bench_codecs(windows):
+    """Байт на событие (EVT-пакет целиком), время линка, CPU кодирования/декодирования, ошибка"""
+    frame_overhead = len(Frame_Protocol.FRAME_PREFIX) + Frame_Protocol.EVT_HEADER_SIZE
+    results = {}
+    for name in tuple(Wave_Codec.CODECS) + (Wave_Codec.CODEC_AUTO,):
+        encoded = []
+        t0 = time.perf_counter()
+        for window in windows:
+            encoded.append(Wave_Codec.encode(name, window))
+        encode_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        decoded = [Wave_Codec.decode(codec, payload) for codec, payload in encoded]
+        decode_s = time.perf_counter() - t0
+
+        max_error = 0
+        for window, samples in zip(windows, decoded):
+            if len(window):
+                max_error = max(max_error, int(np.abs(samples.astype(np.int64) - window).max()))
+
+        frame_bytes = np.array([len(payload) + frame_overhead for _, payload in encoded])
+        raw_bytes = sum(len(w) for w in windows) * 4 + frame_overhead * len(windows)
+        results[name] = {
+            "bytes_per_event": float(frame_bytes.mean()),
+            "ratio": raw_bytes / float(frame_bytes.sum()),
+            "link_s_per_event": float(frame_bytes.mean()) / LINK_BYTES_PER_S,
+            "encode_us": encode_s / len(windows) * 1e6,
+            "decode_us": decode_s / len(windows) * 1e6,
+            "max_error": max_error,
+        }
+    return results
+
+
+def bench_budget(packets, budget, threshold=PEAK_THRESHOLD):
+    """Пакеты EVT с прореживанием под бюджет: размер, время линка, шаг, сохранность пика"""
+    builder = Frame_Protocol.ZigbeeFrameBuilder()
+    events = []
+    for packet in packets:
+        for start, end in Uart_Logic.detect_peaks(packet, threshold):
+            window_start, window = Uart_Logic.Serial_reader.event_window(packet, start, end)
+            events.append((window, start, end, window_start))
+
+    results = {}
+    for name in tuple(Wave_Codec.CODECS) + (Wave_Codec.CODEC_AUTO,):
+        sizes, steps, peak_error = [], [], 0
+        t0 = time.perf_counter()
+        for window, start, end, window_start in events:
+            frame = builder.build_evt(window, 0, 1, 1, 1, 0, start, end, window_start,
+                                      Uart_Logic.EVENT_COMPRESSION, name, budget=budget)
+            event, samples, _ = Frame_Protocol.parse_evt(frame, len(Frame_Protocol.FRAME_PREFIX))
+            sizes.append(len(frame))
+            steps.append(event["compression"])
+            peak = int(np.abs(window).max())
+            peak_error = max(peak_error, abs(peak - int(np.abs(samples).max())) if len(samples) else peak)
+        elapsed = time.perf_counter() - t0
+
+        sizes = np.array(sizes)
+        results[name] = {
+            "bytes_mean": float(sizes.mean()),
+            "bytes_max": int(sizes.max()),
+            "link_s_max": float(sizes.max()) / LINK_BYTES_PER_S,
+            "step_mean": float(np.mean(steps)),
+            "peak_error": peak_error,
+            "build_parse_us": elapsed / len(events) * 1e6,
+        }
+    return results
+
+
+# ============================================================================
+# ЛОГИРОВАНИЕ: цикл чтения при выводе из потока чтения (как print) и через очередь
+# ============================================================================
+class SlowConsole:
+    """Консоль с ограниченной скоростью: write блокируется на len / bytes_per_s (0 - без задержки)"""
+
+    def __init__(self, bytes_per_s=CONSOLE_BYTES_PER_S):
+        self.bytes_per_s = bytes_per_s
+        self.bytes = 0
+        self.lines = 0
+
+    def write(self, text):
+        n = len(text.encode("utf-8"))
+        self.bytes += n
+        self.lines += text.count("\n")
+        if self.bytes_per_s:
+            time.sleep(n / self.bytes_per_s)
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+# (имя, через очередь, уровень); print_info - прежнее поведение: строки пишет сам поток чтения
+LOGGING_MODES = (
+    ("print_info", False, "info"),
+    ("queued_debug", True, "debug"),
+    ("queued_info", True, "info"),
+    ("queued_warning", True, "warning"),
+)
+
+
+def bench_logging(capture, console_bps=CONSOLE_BYTES_PER_S):
+    """Время цикла чтения (вся обработка в потоке чтения) при разных уровнях и способах вывода логов"""
+    results = {}
+    for name, queued, level in LOGGING_MODES:
+        console = SlowConsole(console_bps)
+        Log_Queue.setup(level, stream=console, queued=queued)
+        report = Uart_Replay.run_replay(capture, speed=0, reader_kwargs={"detector": "packet", "staged": False})
+        log_stats = Log_Queue.stats()
+        t0 = time.perf_counter()
+        Log_Queue.shutdown()  # дописать очередь: это время поток чтения уже не ждёт
+        results[name] = {
+            "packets": report["packets"],
+            "events": report["events"],
+            "reader_s": report["elapsed_s"],
+            "us_per_packet": report["elapsed_s"] / max(1, report["packets"]) * 1e6,
+            "log_lines": console.lines,
+            "dropped": log_stats["dropped"],
+            "suppressed": log_stats["suppressed"],
+            "drain_s": time.perf_counter() - t0,
+        }
+    return results
+
+
+# ============================================================================
+# УДАЛЕНИЕ СМЕЩЕНИЯ: первый сэмпл пакета vs Dc_Blocker
+# ============================================================================
+def drifting_packets(count, event_rate=0.3, glitch_rate=0.1, drift=5e7, seed=0):
+    """
+    Синтетические пакеты: событие в доле event_rate пакетов, медленный дрейф смещения
+    (синус, период ~100 пакетов) и выброс в первом сэмпле доли glitch_rate пакетов
+    (как помеха при старте пакета).
+
+    Returns: (пакеты, сколько пакетов с событием)
+    """
+    rng = np.random.default_rng(seed + 1)
+    quiet = synthetic_packets(count, events_per_packet=0, seed=seed)
+    loud = synthetic_packets(count, events_per_packet=1, seed=seed + 2)
+    with_event = rng.random(count) < event_rate
+    packets = [l if e else q for q, l, e in zip(quiet, loud, with_event)]
+    position = 0
+    for packet in packets:
+        t = (position + np.arange(len(packet))) / (100 * PACKET_SAMPLES)
+        packet += (drift * np.sin(2 * np.pi * t)).astype(np.int64)
+        position += len(packet)
+        if rng.random() < glitch_rate:
+            packet[0] += int(rng.choice((-1, 1)) * rng.uniform(2e8, 5e8))
+    return packets, int(with_event.sum())
+
+
+def bench_dc_filter(capture):
+    """
+    Замена packet -= packet[0] на Dc_Blocker: стоимость на пакет и сколько событий
+    (и байт Zigbee) не уходит в радио на той же записи.
+    """
+    frames, _ = packets_from_capture(capture)
+    raw = [ByInConvert.bytesArrayConvert(frame).astype(np.int64) for frame in frames]
+
+    costs = {}
+    copies = [packet.copy() for packet in raw]
+    t0 = time.perf_counter()
+    for packet in copies:
+        packet -= packet[0]
+    costs[Uart_Logic.DC_FILTER_FIRST] = (time.perf_counter() - t0) / len(raw) * 1e6
+
+    blocker = Dc_Blocker.DcBlocker()
+    copies = [packet.copy() for packet in raw]
+    t0 = time.perf_counter()
+    for num, packet in enumerate(copies, 1):
+        blocker.process(num, packet)
+    costs[Uart_Logic.DC_FILTER_EMA] = (time.perf_counter() - t0) / len(raw) * 1e6
+
+    results = {}
+    for mode in Uart_Logic.DC_FILTERS:
+        zigbee = Uart_Replay.ReplayZigbee()
+        report = Uart_Replay.run_replay(capture, speed=0, zigbee=zigbee, reader_kwargs={
+            "detector": "packet", "staged": False, "frame_format": Uart_Logic.FRAME_EVT, "dc_filter": mode,
+        })
+        results[mode] = {
+            "packets": report["packets"],
+            "events": report["events"],
+            "zigbee_frames": report["zigbee_frames"],
+            "zigbee_bytes": sum(len(frame) for frame in zigbee.ser.frames),
+            "duration_mean": float(np.mean([e["duration"] for e in report["detected"]])) if report["events"] else 0.0,
+            "us_per_packet": costs[mode],
+        }
+    first, ema = results[Uart_Logic.DC_FILTER_FIRST], results[Uart_Logic.DC_FILTER_EMA]
+    results["avoided"] = {key: first[key] - ema[key] for key in ("events", "zigbee_frames", "zigbee_bytes")}
+    return results
+
+
+# ============================================================================
+# ЧТЕНИЕ UART: опрос in_waiting vs poll()/select() (через pty, в реальном времени)
+# Задержка байта - от записи в master pty до байта в буфере фреймера: на живом порте
+# метки времени прихода нет, здесь она известна из Uart_Replay.PtyReplay.
+# ============================================================================
+def bench_ingest(capture, baud_rate=256000, chunk=64, modes=None):
+    """Режимы чтения Uart_Ingest на одной записи: задержка байта, пробуждения, CPU потока чтения"""
+    import serial
+
+    results = {}
+    for mode in modes or sorted(Uart_Ingest.READ_MODES):
+        pty = Uart_Replay.PtyReplay(capture, baud_rate=baud_rate, speed=1.0, chunk=chunk)
+        ser = serial.Serial(pty.port, baud_rate, timeout=0)
+        framer = Packet_Framer.PacketFramer()
+        ingest = Uart_Ingest.make_ingest(mode, ser, framer, baud_rate)
+        delays = []
+        received = 0
+        pty.start()
+        t0 = time.perf_counter()
+        c0 = time.thread_time()
+        ingest.stats.reset()
+        done_at = None
+        while received < len(capture):
+            n = ingest.read_once()
+            if n:
+                now = time.perf_counter()
+                # Первый байт этого чтения записан вместе со своим куском
+                k = bisect.bisect_right(pty.sent_offsets, received) - 1
+                delays.append(now - pty.sent_times[k])
+                received += n
+                for _ in framer.iter_frames():
+                    pass
+            elif pty.done.is_set():
+                done_at = done_at or time.perf_counter()
+                if time.perf_counter() - done_at > 1.0:
+                    break  # байты потерялись в pty
+        wall = time.perf_counter() - t0
+        cpu = time.thread_time() - c0
+        ser.close()
+        pty.close()
+
+        stats = ingest.stats.summary()
+        delays.sort()
+        results[mode] = {
+            "bytes": received,
+            "packets": framer.frames,
+            "wakeups": stats["wakeups"],
+            "empty_wakeups": stats["empty_wakeups"],
+            "reader_cpu_pct": 100.0 * cpu / wall,
+            "blocked_pct": stats["blocked_pct"],
+            "byte_delay_ms_mean": 1000 * sum(delays) / max(1, len(delays)),
+            "byte_delay_ms_p99": 1000 * delays[min(len(delays) - 1, int(len(delays) * 0.99))] if delays else 0.0,
+            "byte_delay_ms_max": 1000 * delays[-1] if delays else 0.0,
+            "read_ms_mean": stats["read_ms_mean"],
+        }
+    return results
+
+
+def print_results(title, results):
+    print(f"\n=== {title} ===")
+    for name, row in results.items():
+        cells = " | ".join(
+            f"{k}={v:.1f}" if isinstance(v, float) else f"{k}={v}" for k, v in row.items()
+        )
+        print(f"{name:>20}: {cells}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pi-side processing benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_pool = sub.add_parser("pool", help="detection in-thread vs process pool")
+    p_pool.add_argument("--packets", type=int, default=500)
+    p_pool.add_argument("--events", type=int, default=3, help="events per synthetic packet")
+    p_pool.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+
+    p_valid = sub.add_parser("validate", help="validation equivalence and speed")
+    p_valid.add_argument("--packets", type=int, default=300)
+    p_valid.add_argument("--events", type=int, default=5, help="events per synthetic packet")
+
+    p_suite = sub.add_parser("suite", help="per-stage and full pipeline benchmarks")
+    p_suite.add_argument("--packets", type=int, default=300)
+    p_suite.add_argument("--events", type=int, default=1, help="events per synthetic packet")
+    p_suite.add_argument("--capture", help="recorded raw UART capture (Uart_Replay.py record)")
+    p_suite.add_argument("--no-memory", action="store_true", help="skip tracemalloc passes")
+    p_suite.add_argument("--no-pipeline", action="store_true", help="skip full pipeline replay")
+    p_suite.add_argument("--json", help="save results to this file")
+
+    p_codec = sub.add_parser("codecs", help="waveform codecs: bytes per event and CPU cost")
+    p_codec.add_argument("--packets", type=int, default=300)
+    p_codec.add_argument("--capture", help="recorded raw UART capture (Uart_Replay.py record)")
+    p_codec.add_argument("--budget", type=int, default=480, help="EVT frame byte budget (adaptive decimation)")
+
+    p_log = sub.add_parser("logging", help="reader loop time: synchronous vs queued logging, verbose vs quiet")
+    p_log.add_argument("--packets", type=int, default=200)
+    p_log.add_argument("--events", type=int, default=3, help="events per synthetic packet")
+    p_log.add_argument("--capture", help="recorded raw UART capture (Uart_Replay.py record)")
+    p_log.add_argument("--console-bps", type=int, default=CONSOLE_BYTES_PER_S,
+                       help="console write speed, bytes/s (0 = unlimited)")
+
+    p_dc = sub.add_parser("dc", help="offset removal: first sample vs DC blocker (cost, events avoided)")
+    p_dc.add_argument("--packets", type=int, default=300)
+    p_dc.add_argument("--event-rate", type=float, default=0.3, help="synthetic packets with an event")
+    p_dc.add_argument("--glitch-rate", type=float, default=0.1, help="synthetic packets with a bad first sample")
+    p_dc.add_argument("--capture", help="recorded raw UART capture (Uart_Replay.py record)")
+
+    p_ingest = sub.add_parser("ingest", help="UART read modes: in_waiting polling vs poll()/select(), via a pty")
+    p_ingest.add_argument("--packets", type=int, default=8, help="synthetic packets (~0.75 s each at 256000 baud)")
+    p_ingest.add_argument("--capture", help="recorded raw UART capture (Uart_Replay.py record)")
+    p_ingest.add_argument("--baud", type=int, default=256000)
+    p_ingest.add_argument("--chunk", type=int, default=64, help="bytes per pty write")
+    p_ingest.add_argument("--json", help="save results to this file")
+
+    args = parser.parse_args()
+
+    if args.command == "pool":
+        packets = synthetic_packets(args.packets, events_per_packet=args.events)
+        print_results("Detection throughput", bench_detection_pool(packets, args.workers))
+    elif args.command == "validate":
+        packets = synthetic_packets(args.packets, events_per_packet=args.events)
+        results = bench_validation(packets)
+        print_results("Validation", results)
+        eq = results["equivalence"]
+        if eq["mismatches"] or eq["batch_mismatches"]:
+            raise SystemExit("[ERROR] NumPy validation differs from is_packet_valid_lite")
+    elif args.command == "suite":
+        report = run_suite(args.packets, args.events, args.capture,
+                           memory=not args.no_memory, pipeline=not args.no_pipeline)
+        for name, res in report["results"].items():
+            print_results(f"{name}: stages ({res['packets']} packets)", res["stages"])
+            if "pipeline" in res:
+                print_results(f"{name}: full pipeline", res["pipeline"])
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"\n[Bench] Results saved to {args.json}")
+    elif args.command == "codecs":
+        if args.capture:
+            with open(args.capture, "rb") as f:
+                _, packets = packets_from_capture(f.read())
+        else:
+            packets = synthetic_packets(args.packets)
+        windows = event_windows(packets)
+        if not windows:
+            raise SystemExit("[ERROR] No events detected")
+        print_results(f"Codecs ({len(windows)} events)", bench_codecs(windows))
+        print_results(f"Adaptive min/max decimation, budget {args.budget} bytes", bench_budget(packets, args.budget))
+    elif args.command == "logging":
+        if args.capture:
+            with open(args.capture, "rb") as f:
+                capture = f.read()
+        else:
+            capture = Uart_Replay.synthetic_capture(synthetic_packets(args.packets, events_per_packet=args.events))
+        print_results(f"Logging, console {args.console_bps} B/s", bench_logging(capture, args.console_bps))
+    elif args.command == "dc":
+        if args.capture:
+            with open(args.capture, "rb") as f:
+                capture = f.read()
+        else:
+            packets, expected = drifting_packets(args.packets, event_rate=args.event_rate,
+                                                 glitch_rate=args.glitch_rate)
+            capture = Uart_Replay.synthetic_capture(packets)
+            print(f"[Bench] Synthetic: {expected} packets with an event, {args.glitch_rate:.0%} bad first samples")
+        Log_Queue.setup("warning")
+        print_results("Offset removal", bench_dc_filter(capture))
+    elif args.command == "ingest":
+        if args.capture:
+            with open(args.capture, "rb") as f:
+                capture = f.read()
+        else:
+            capture = Uart_Replay.synthetic_capture(synthetic_packets(args.packets))
+        print(f"[Bench] {len(capture)} bytes at {args.baud} baud, real time")
+        results = bench_ingest(capture, args.baud, args.chunk)
+        print_results("UART ingest", results)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(results, f, indent=2)
+            print(f"\n[Bench] Results saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
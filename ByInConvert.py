@@ -1,49 +1,67 @@
 import numpy as np
 
+import Log_Queue
 
-def bytesIntsConvert(data):
+log = Log_Queue.get_logger("ByInConvert")
+
+# Маркеры пакета от АЦП
+START_MARKER = b'\xB6' * 10  # 10 байт начало
+END_MARKER = b'\x49' * 10  # 10 байт конец
+
+# Формат сэмпла АЦП: Big-Endian signed int32
+ADC_DTYPE = np.dtype('>i4')
+
+
+def bytesArrayConvert(data):
     """
-    Конвертирует байты в массив signed int32 (Big-Endian).
-    Входит: полный пакет (с маркерами START и END).
-    Выходит: массив int32 (маркеры уже удалены).
+    Zero-copy конвертация байтов в массив signed int32 (Big-Endian).
+    Входит: полный пакет (bytes / bytearray / memoryview, с маркерами START и END).
+    Выходит: np.ndarray dtype '>i4' (маркеры уже удалены).
+
+    Массив - это view на память data (np.frombuffer, без промежуточного списка),
+    поэтому буфер нельзя менять, пока массив используется.
     """
-    if not data:
-        return []
+    if data is None or len(data) == 0:
+        return np.empty(0, dtype=ADC_DTYPE)
 
-    # ✅ РАБОЧАЯ ВЕРСИЯ:
-    START_MARKER = b'\xB6' * 10  # 10 байт начало
-    END_MARKER = b'\x49' * 10  # 10 байт конец
+    view = memoryview(data).cast('B')
 
     # ТОЧНЫЙ поиск границ
-    if not data.startswith(START_MARKER):
-        print(f"[ERROR] Packet doesn't start with START_MARKER!")
-        return []
+    if view[:len(START_MARKER)] != START_MARKER:
+        log.error("[ERROR] Packet doesn't start with START_MARKER!")
+        return np.empty(0, dtype=ADC_DTYPE)
 
-    if not data.endswith(END_MARKER):
-        print(f"[ERROR] Packet doesn't end with END_MARKER!")
-        return []
+    if view[len(view) - len(END_MARKER):] != END_MARKER:
+        log.error("[ERROR] Packet doesn't end with END_MARKER!")
+        return np.empty(0, dtype=ADC_DTYPE)
 
-    # Вырезаем РОВНО маркеры
-    payload = data[len(START_MARKER):-len(END_MARKER)]
-
-    if not payload or len(payload) == 0:
-        return []
+    # Полезная нагрузка между маркерами
+    payload_len = len(view) - len(START_MARKER) - len(END_MARKER)
+    if payload_len <= 0:
+        return np.empty(0, dtype=ADC_DTYPE)
 
     # ЗАЩИТА: Проверяем кратность 4
-    remainder = len(payload) % 4
+    remainder = payload_len % 4
     if remainder != 0:
-        print(f"[ByInConvert WARNING] Payload len {len(payload)} not multiple of 4. Trimming {remainder} bytes.")
-        payload = payload[:-remainder]
+        log.warning("[ByInConvert WARNING] Payload len %d not multiple of 4. Trimming %d bytes.", payload_len, remainder)
+        payload_len -= remainder
 
-    if len(payload) == 0:
-        return []
+    if payload_len == 0:
+        return np.empty(0, dtype=ADC_DTYPE)
+
+    # Вырезаем РОВНО маркеры: view без копирования
+    return np.frombuffer(view, dtype=ADC_DTYPE, count=payload_len // 4, offset=len(START_MARKER))
+
+
+def bytesIntsConvert(data):
+    """
+    Конвертирует байты в массив signed int32 (Big-Endian).
+    Входит: полный пакет (с маркерами START и END).
+    Выходит: список int (маркеры уже удалены).
 
-    # Конвертируем: Big-Endian signed int32
-    int_array = []
-    for i in range(0, len(payload), 4):
-        four_bytes = payload[i:i + 4]
-        # byteorder='big' (Big-Endian), signed=True (signed int)
-        value = int.from_bytes(four_bytes, byteorder='big', signed=True)
-        int_array.append(value)
+    Обёртка над bytesArrayConvert для старого кода, которому нужен list.
+    """
+    if not data:
+        return []
 
-    return int_array
+    return bytesArrayConvert(data).tolist()
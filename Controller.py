@@ -2,6 +2,8 @@ import serial, time, threading
 import Menues, Printer
 import Zigbee_Logic as ziglo
 import Uart_Logic as uart
+import Metrics
+import Log_Queue
 
 # ============================================================================
 # КОНСТАНТЫ И КОНФИГУРАЦИЯA
@@ -13,13 +15,66 @@ END_PATTERN = b'\x49' * 10
 PACK_SIZE = 4799
 MAX_PACKETS = 10
 PEAK_THRESHOLD = 150000000
+# Чтение UART: "select" - ожидание на дескрипторе порта, "poll" - старый опрос in_waiting
+READ_MODE = "select"
+# Конвейер: приём, детекция и передача по Zigbee в отдельных потоках
+STAGED_PIPELINE = True
+# Детекция в пуле процессов (кол-во воркеров, 0 - в потоке детекции)
+DETECT_WORKERS = 0
+# Детектор: "stream" - события через границу пакета отдаются один раз, "packet" - каждый пакет отдельно
+DETECTOR = "stream"
+# Передача события: "evt" - один бинарный пакет с метаданными, "pkt" - PKT + текстовая строка
+FRAME_FORMAT = "evt"
+# Кодек формы сигнала: "auto" - самый короткий без потерь (varint/zlib), "raw" - int32 для старых приёмников
+WAVE_CODEC = "auto"
+# Планировщик линка: при перегрузке Zigbee сначала громкие события, остальные грубее/без формы/отброшены
+LINK_SCHEDULER = True
+# Бюджет байт на пакет события (0.5 с линка 9600 бод): шаг прореживания подбирается под него
+FRAME_BUDGET_BYTES = 480
+# Журнал пиков на диске (append-only, переживает перезапуск); в памяти - только последние записи
+PEAK_LOG_PATH = "peak_log.bin"
+PEAK_LOG_CAPACITY = 4096
+# История пакетов в памяти (минута при 5 пакетах/с, ~5.8 МБ int32): pre-trigger и дамп из меню
+PACKET_HISTORY = 300
+# Метрики конвейера в формате Prometheus: HTTP только на 127.0.0.1 и Unix-сокет (None - выключить)
+METRICS_PORT = 9108
+METRICS_SOCKET = "/tmp/mice_metrics.sock"
+# Уровень логов конвейера: "debug" - каждый отправленный пакет, "info" - события, "warning" - только проблемы
+# (вывод в отдельном потоке, повторные предупреждения не чаще раза в Log_Queue.RATE_LIMIT_S)
+LOG_LEVEL = "info"
+# Удаление смещения АЦП: "ema" - оценка по медианам пакетов с переносом между пакетами, "first" - первый сэмпл
+DC_FILTER = "ema"
 
 # Глобальный флаг для остановки
 main_run_flag = True
 
-# Экземпляры классов
-uart_ser = uart.Serial_reader()
-zig_ser = ziglo.ZigbeeSerial()
+# Экземпляры классов: создаются в init_objects() из точки входа, не при импорте.
+# Воркеры Detect_Pool (forkserver/spawn) импортируют этот скрипт заново - при импорте
+# не должно быть ни логирования, ни портов, ни открытия peak_log.bin
+uart_ser = None
+zig_ser = None
+metrics_server = None
+
+
+def init_objects():
+    """Логирование, читатель UART, Zigbee (с журналом пиков) и сервер метрик"""
+    global uart_ser, zig_ser, metrics_server
+
+    Log_Queue.setup(LOG_LEVEL)
+    uart_ser = uart.Serial_reader(
+        read_mode=READ_MODE,
+        staged=STAGED_PIPELINE,
+        detect_workers=DETECT_WORKERS,
+        detector=DETECTOR,
+        frame_format=FRAME_FORMAT,
+        codec=WAVE_CODEC,
+        link_scheduler=LINK_SCHEDULER,
+        frame_budget=FRAME_BUDGET_BYTES,
+        history_packets=PACKET_HISTORY,
+        dc_filter=DC_FILTER,
+    )
+    zig_ser = ziglo.ZigbeeSerial(peak_log_path=PEAK_LOG_PATH, peak_log_capacity=PEAK_LOG_CAPACITY)
+    metrics_server = Metrics.MetricsServer(uart_ser.metrics, port=METRICS_PORT, unix_path=METRICS_SOCKET)
 
 
 # ============================================================================
@@ -51,7 +106,7 @@ def view_buffer_packets():
     print(f"[View Buffer] Recent events (total {len(zig_ser.peak_log)} events):")
     print(Printer.DELIMETER)
 
-    for i, event in enumerate(zig_ser.peak_log[-15:], 1):
+    for i, event in enumerate(zig_ser.peak_log.last(15), 1):
         timestamp = event.get('time', '?')
         packet_num = event.get('packet_num', '?')
         event_num = event.get('event_num', '?')
@@ -63,7 +118,47 @@ def view_buffer_packets():
               f"Event {event_num}/{total_in_packet} | "
               f"Max={max_value:.0f} | Duration={duration}")
 
+    stats = zig_ser.peak_log.stats()
     print(Printer.DELIMETER)
+    print(f"Max p50/p99: {stats['loud_p50']:.0f} / {stats['loud_p99']:.0f} | "
+          f"Events per minute: {stats['per_min']:.1f} (last minute {stats['per_min_recent']:.1f})")
+    print(Printer.DELIMETER)
+
+
+def show_metrics():
+    """Задержки по стадиям конвейера и счётчики (то же, что отдаёт эндпоинт метрик)"""
+    print(f"\n{Printer.DELIMETER}")
+    print("[Metrics] Pipeline latency and counters:")
+    print(Printer.DELIMETER)
+    print(uart_ser.metrics.format())
+    print(Printer.DELIMETER)
+
+
+def set_log_level():
+    """Уровень логов конвейера на лету"""
+    print(f"\n[Log] Level: {Log_Queue.get_level()} | {Log_Queue.stats()}")
+    level = input(f"New level ({'/'.join(Log_Queue.LEVELS)}, Enter - keep): ").strip().lower()
+    if not level:
+        return
+    if level not in Log_Queue.LEVELS:
+        print("\nWrong input, try again")
+        return
+    Log_Queue.set_level(level)
+    print(f"[Log] ✓ Level set to {level}")
+
+
+def dump_packet_history():
+    """Дамп истории пакетов (кольцо в памяти) в .npz для разбора"""
+    if len(uart_ser.main_ring_que) == 0:
+        print("\n[Dump] No packets in history yet.")
+        return
+
+    path = f"packets_{time.strftime('%Y%m%d_%H%M%S')}.npz"
+    try:
+        count = uart_ser.main_ring_que.dump(path)
+        print(f"\n[Dump] ✓ {count} packets -> {path}")
+    except Exception as e:
+        print(f"[ERROR] Unable to dump packet history: {e}")
 
 
 def stop_stream():
@@ -92,6 +187,7 @@ def main_program():
 
     uart_ser.main_ring_que.clear()
     uart_ser.main_packet_info.clear()
+    uart_ser.framer.reset()
     zig_ser.peak_log.clear()
     uart_ser.main_total_packets = 0
     uart_ser.main_run_flag = True
@@ -163,6 +259,8 @@ def main_program():
         except:
             pass
 
+        # Итоги - после всех строк конвейера, ещё стоящих в очереди логов
+        Log_Queue.flush()
         print("\n")
         Printer.print_result(uart_ser.main_total_packets, zig_ser.peak_log, PEAK_THRESHOLD)
 
@@ -172,6 +270,12 @@ def main_program():
 # ============================================================================
 
 if __name__ == "__main__":
+    init_objects()
+    try:
+        metrics_server.start()
+    except OSError as e:
+        print(f"[Warning] Metrics endpoint not started: {e}")
+
     print("Starting program in 3s...\n")
     for i in range(3, 0, -1):
         print(f'{i}...')
@@ -182,4 +286,7 @@ if __name__ == "__main__":
 
     # После основной программы показываем меню
     print("\n[Menu] Starting interactive menu...\n")
-    Menues.main_menu(main_program, check_stream, view_buffer_packets, stop_stream, zig_ser)
+    Menues.main_menu(main_program, check_stream, view_buffer_packets, stop_stream, zig_ser, dump_packet_history,
+                     show_metrics, set_log_level)
+    metrics_server.stop()
+    Log_Queue.shutdown()
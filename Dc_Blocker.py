@@ -0,0 +1,118 @@
+import threading
+
+import numpy as np
+
+# ============================================================================
+# УДАЛЕНИЕ ПОСТОЯННОЙ СОСТАВЛЯЮЩЕЙ (вместо packet -= packet[0])
+# Однополюсный фильтр (EMA) по медиане каждого пакета: состояние переходит из пакета
+# в пакет, один выброс в начале пакета больше не сдвигает весь пакет.
+# Внутри пакета вычитается линейный переход от прошлой оценки к новой - без ступеньки
+# на границе пакетов (потоковый детектор и окна через границу видят непрерывный сигнал).
+# ============================================================================
+DC_ALPHA = 0.2  # вес нового пакета: постоянная времени ~5 пакетов (~1 с при 5 пакетах/с)
+DEFAULT_HISTORY = 512  # пакетов, для которых помнится смещение (окна из истории пакетов)
+MEDIAN_STRIDE = 4  # медиана по каждому 4-му сэмплу: 1200 точек на пакет хватает, в 5 раз дешевле
+
+
+class DcBlocker:
+    """
+    Смещение АЦП для потока пакетов: process() - из стадии приёма (по порядку пакетов),
+    baseline() - смещение уже обработанных пакетов для окон из Packet_Ring (поток передачи).
+    Слоты истории пишутся и читаются под _lock: иначе baseline() мог бы взять номер нового
+    пакета вместе со смещением и длиной прежнего.
+    """
+
+    def __init__(self, alpha=DC_ALPHA, history=DEFAULT_HISTORY):
+        self.alpha = alpha
+        self.history = history
+        self._ramp = np.zeros(0)  # i / n для пакета длины n (пересчитывается при смене длины)
+        self._buf = np.zeros(0)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Новая сессия: оценка смещения - по первому пакету"""
+        self.level = None
+        self.packets = 0
+        # Смещение в начале пакета и его изменение за пакет: слот = номер % history
+        with self._lock:
+            self._numbers = np.full(self.history, -1, dtype=np.int64)
+            self._start = np.zeros(self.history)
+            self._delta = np.zeros(self.history)
+            self._lengths = np.zeros(self.history, dtype=np.int64)
+
+    def process(self, packet_num, samples):
+        """
+        Вычитает смещение из samples (np.int64, на месте).
+        Returns: samples
+        """
+        n = len(samples)
+        if n == 0:
+            return samples
+        sub = samples[::MEDIAN_STRIDE]
+        estimate = float(np.partition(sub, len(sub) // 2)[len(sub) // 2])
+        if self.level is None:
+            start = end = estimate
+        else:
+            start = self.level
+            end = start + self.alpha * (estimate - start)
+        self.level = end
+
+        if n != len(self._ramp):
+            self._ramp = np.arange(n) / n
+            self._buf = np.empty(n)
+        # Смещение сэмпла i: start + (end - start) * i / n
+        np.multiply(self._ramp, end - start, out=self._buf)
+        self._buf += start
+        # Разность в float64 (точно для int32 АЦП), в int64 - отбрасыванием дробной части,
+        # так же, как окна из истории в Uart_Logic.Serial_reader.cross_packet_window
+        np.subtract(samples, self._buf, out=samples, casting="unsafe")
+
+        slot = packet_num % self.history
+        with self._lock:
+            self._numbers[slot] = packet_num
+            self._start[slot] = start
+            self._delta[slot] = end - start
+            self._lengths[slot] = n
+        self.packets += 1
+        return samples
+
+    def _piece(self, packet_num, lo, hi):
+        slot = packet_num % self.history
+        if self._numbers[slot] != packet_num:
+            return None
+        n = self._lengths[slot]
+        return self._start[slot] + self._delta[slot] * (np.arange(lo, hi) / n)
+
+    def baseline(self, packet_num, start, end):
+        """
+        Смещение (np.float64) для сэмплов [start, end) относительно начала пакета packet_num,
+        как в Packet_Ring.PacketRing.window: start < 0 - хвост предыдущего пакета,
+        end > длины - начало следующего. None, если пакет packet_num не обработан (или забыт).
+        """
+        with self._lock:
+            return self._baseline(packet_num, start, end)
+
+    def _baseline(self, packet_num, start, end):
+        slot = packet_num % self.history
+        if self._numbers[slot] != packet_num:
+            return None
+        n = int(self._lengths[slot])
+        pieces = []
+        if start < 0:
+            prev = packet_num - 1
+            if self._numbers[prev % self.history] == prev:
+                prev_len = int(self._lengths[prev % self.history])
+                pieces.append(self._piece(prev, prev_len + start, prev_len))
+            else:
+                # Нет данных о предыдущем пакете - продолжаем смещение начала этого
+                pieces.append(np.full(-start, self._start[slot]))
+        pieces.append(self._piece(packet_num, max(0, start), min(end, n)))
+        if end > n:
+            following = self._piece(packet_num + 1, 0, end - n)
+            pieces.append(following if following is not None
+                          else np.full(end - n, self._start[slot] + self._delta[slot]))
+        return np.concatenate(pieces)
+
+    def stats(self):
+        return {"packets": self.packets, "level": self.level, "alpha": self.alpha}
@@ -0,0 +1,158 @@
+import multiprocessing as mp
+import time
+from collections import deque
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Блоки shared memory, уже открытые в этом процессе: имя -> SharedMemory.
+# В главном процессе - созданные пулом, в воркере - подключённые по имени в _init_worker.
+_ATTACHED = {}
+
+# Воркеры не fork-аются от главного процесса: к созданию пула в нём уже работают потоки
+# (чтение UART, Zigbee writer, логирование), и fork унёс бы в воркер захваченные ими блокировки.
+# forkserver - чистый процесс-родитель, spawn - если forkserver нет (не POSIX).
+# Оба запускают воркер с повторным импортом главного скрипта (как __mp_main__):
+# скрипт не должен ничего создавать при импорте (см. Controller.init_objects)
+START_METHODS = ("forkserver", "spawn")
+# Модули без побочных эффектов при импорте: forkserver загружает их один раз,
+# воркеры получают их готовыми. Точка входа воркера - _analyze_slot этого модуля
+FORKSERVER_PRELOAD = ["Detect_Pool", "Uart_Logic"]
+
+
+def _attach(name):
+    """Подключение к блоку shared memory, созданному главным процессом"""
+    shm = _ATTACHED.get(name)
+    if shm is not None:
+        return shm
+
+    try:
+        shm = shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        # До 3.13 подключение регистрирует блок в resource_tracker. Воркеры forkserver/spawn
+        # работают с трекером главного процесса: повторная регистрация ничего не меняет,
+        # а снятие с учёта здесь сломало бы unlink() владельца в close()
+        shm = shared_memory.SharedMemory(name=name)
+
+    _ATTACHED[name] = shm
+    return shm
+
+
+def _init_worker(slot_names):
+    for name in slot_names:
+        _attach(name)
+
+
+def _analyze_slot(slot_name, n, peak_threshold, min_gap_between_events, window):
+    """Выполняется в воркере: детекция + валидация пакета из shared memory"""
+    import Uart_Logic
+
+    shm = _attach(slot_name)
+    data = np.ndarray((n,), dtype=np.int64, buffer=shm.buf)
+    return Uart_Logic.analyze_packet(data, peak_threshold, min_gap_between_events, window)
+
+
+class DetectionPool:
+    """
+    Детекция в пуле процессов (все ядра Raspberry Pi).
+
+    Пакет копируется в свободный слот shared memory (один memcpy, без pickle массива),
+    воркеру передаётся только имя слота и параметры. Результаты (маленькие списки событий)
+    выдаются строго в порядке отправки пакетов.
+    """
+
+    def __init__(self, workers=2, packet_samples=8192, slots=None):
+        self.workers = workers
+        self.packet_samples = packet_samples
+        slots = slots if slots is not None else workers * 3
+
+        self._slots = []
+        for _ in range(slots):
+            shm = shared_memory.SharedMemory(create=True, size=packet_samples * 8)
+            self._slots.append(shm)
+            _ATTACHED[shm.name] = shm
+        self._free = deque(self._slots)
+        self._pending = deque()  # (slot, meta, AsyncResult) в порядке отправки
+        self._done = deque()  # результаты, которые пришлось дождаться в submit()
+
+        method = next(m for m in START_METHODS if m in mp.get_all_start_methods())
+        context = mp.get_context(method)
+        if method == "forkserver":
+            context.set_forkserver_preload(FORKSERVER_PRELOAD)
+        self._pool = context.Pool(
+            processes=workers,
+            initializer=_init_worker,
+            initargs=([shm.name for shm in self._slots],),
+        )
+
+        self.submitted = 0
+        self.completed = 0
+        self.wait_time = 0.0
+
+    def __len__(self):
+        """Пакетов в обработке (включая невыданные результаты)"""
+        return len(self._pending) + len(self._done)
+
+    def submit(self, meta, data, peak_threshold, min_gap_between_events=1000, window=300):
+        """
+        Отправка пакета на детекцию. meta возвращается вместе с результатом.
+        Если все слоты заняты - ждём самый старый пакет (его результат выдаст collect()).
+        """
+        n = len(data)
+        if n > self.packet_samples:
+            raise ValueError(f"Packet of {n} samples does not fit slot of {self.packet_samples}")
+
+        if not self._free:
+            t0 = time.perf_counter()
+            self._done.append(self._pop_oldest())
+            self.wait_time += time.perf_counter() - t0
+
+        slot = self._free.popleft()
+        np.ndarray((n,), dtype=np.int64, buffer=slot.buf)[:] = data
+        result = self._pool.apply_async(
+            _analyze_slot, (slot.name, n, peak_threshold, min_gap_between_events, window)
+        )
+        self._pending.append((slot, meta, result))
+        self.submitted += 1
+
+    def _pop_oldest(self):
+        slot, meta, result = self._pending.popleft()
+        analysis = result.get()
+        self._free.append(slot)
+        self.completed += 1
+        return meta, analysis
+
+    def collect(self, block=False):
+        """
+        Готовые результаты по порядку: (meta, (кол-во событий, [(event_num, start, end, max_abs, valid), ...])).
+        block=True - дождаться всех отправленных пакетов.
+        """
+        while self._done:
+            yield self._done.popleft()
+
+        while self._pending:
+            if not block and not self._pending[0][2].ready():
+                return
+            yield self._pop_oldest()
+
+    def close(self):
+        """Остановка пула и освобождение shared memory"""
+        self._pool.close()
+        self._pool.join()
+        for shm in self._slots:
+            _ATTACHED.pop(shm.name, None)
+            shm.close()
+            shm.unlink()
+        self._slots = []
+        self._free.clear()
+        self._pending.clear()
+        self._done.clear()
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "in_flight": len(self),
+            "wait_s": self.wait_time,
+        }
@@ -0,0 +1,274 @@
+import struct
+
+import numpy as np
+
+import Wave_Codec
+
+# ============================================================================
+# БИНАРНЫЙ ПАКЕТ СОБЫТИЯ (Zigbee):
+#   b"PKT" + >IiHH (packet_num, offset, compression, length) + payload
+# offset - начало окна внутри пакета packet_num, со знаком: < 0 - окно начинается
+# в хвосте предыдущего пакета (сэмплы до срабатывания)
+# compression = (id кодека << 8) | шаг прореживания, см. Wave_Codec;
+# кодек 0 (raw): payload = length * int32, как раньше
+# ============================================================================
+PKT_MAGIC = b"PKT"
+PKT_HEADER = struct.Struct(">IiHH")
+PKT_HEADER_SIZE = len(PKT_MAGIC) + PKT_HEADER.size  # 15
+
+# ============================================================================
+# СОБЫТИЕ ЦЕЛИКОМ (EVT): метаданные + форма сигнала в одном пакете
+# (заменяет пару PKT + текстовая строка "time | Pack #N | Event i/n | Loud=...")
+#   b"EVT" + >BBHHHHIIIiii + payload (compression/length - как в PKT)
+#   version, header_size (байт заголовка после EVT), event_num, total_events,
+#   compression, length, time_ms (время RPi, мс с полуночи), packet_num,
+#   max_abs, event_start, event_end, offset (начало окна внутри пакета)
+# event_start/event_end/offset - со знаком, как offset в PKT (версия 2; в версии 1
+# отрицательные значения обрезались до 0, положительные кодируются одинаково)
+# Новые версии дописывают поля в конец заголовка: старый приёмник
+# пропускает их по header_size.
+# ============================================================================
+EVT_MAGIC = b"EVT"
+EVT_VERSION = 2
+EVT_HEADER = struct.Struct(">BBHHHHIIIiii")
+EVT_HEADER_SIZE = len(EVT_MAGIC) + EVT_HEADER.size  # 37
+# version + header_size - этого хватает, чтобы узнать полный размер заголовка
+EVT_PREAMBLE = struct.Struct(">BB")
+
+# Защита приёмника от мусора: больше сэмплов в одном пакете не бывает.
+# Это же предел поля length на передаче (сэмплов для raw, байт payload для сжатых кодеков):
+# окно, которое не влезает, прореживается сильнее (см. ZigbeeFrameBuilder._fill)
+MAX_FRAME_SAMPLES = 50000
+
+# Перед пакетом шлём \r: приёмник на ПК закрывает им незаконченную текстовую строку
+FRAME_PREFIX = b"\r"
+
+# Сэмплы в пакете - нативный int32 (как np.int32(...).tobytes() на RPi)
+SAMPLE_DTYPE = np.int32
+
+# Полная шкала АЦП (Loud = max_abs / ADC_FULL_SCALE)
+ADC_FULL_SCALE = 2 ** 31
+
+# ============================================================================
+# КОМАНДЫ УПРАВЛЕНИЯ С ПК (текстовые строки, \r\n в конце)
+#   SET:x             - порог (буква a..t), как раньше, без ответа
+#   CFG:name=value    - изменить параметр -> "ACK:CFG name=value" или "NAK:CFG причина"
+#   GET:name, GET:all - прочитать параметр(ы) -> "ACK:GET name=value ..."
+#   STAT:             - счётчики передачи -> "ACK:STAT key=value ..."
+# Имена и ключи - строчные: в ответе не должно встретиться PKT/EVT (магии пакетов)
+# ============================================================================
+CMD_CFG = "CFG"
+CMD_GET = "GET"
+CMD_STAT = "STAT"
+REPLY_ACK = "ACK"
+REPLY_NAK = "NAK"
+PARAM_ALL = "all"
+
+
+def timestamp_to_ms(timestamp):
+    """"HH:MM:SS.ff" (время пакета на RPi) -> мс с полуночи"""
+    hours, minutes, seconds = timestamp.split(":")
+    return int(round((int(hours) * 3600 + int(minutes) * 60 + float(seconds)) * 1000))
+
+
+def ms_to_timestamp(time_ms):
+    """мс с полуночи -> "HH:MM:SS.ff" (как timestamp в Uart_Logic.convert_package)"""
+    seconds, ms = divmod(int(time_ms), 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{ms // 10:02d}"
+
+
+
+def format_reply(command, values):
+    """ACK-ответ на команду: values - dict name -> значение (float - 1 знак после точки)"""
+    fields = " ".join(
+        f"{name}={value:.1f}" if isinstance(value, float) else f"{name}={value}"
+        for name, value in values.items()
+    )
+    return f"{REPLY_ACK}:{command} {fields}".rstrip()
+
+
+def format_error(command, message):
+    """NAK-ответ на команду (строчными: в тексте ошибки может быть эхо аргумента с ПК)"""
+    return f"{REPLY_NAK}:{command} {message.lower()}"
+
+
+def parse_reply(line):
+    """
+    Строка ответа RPi -> dict (ok, command, values, message) или None, если это не ответ на команду.
+    values - dict name -> str (для ACK), message - текст ошибки (для NAK).
+    """
+    head, _, rest = line.strip().partition(" ")
+    status, sep, command = head.partition(":")
+    if not sep or status not in (REPLY_ACK, REPLY_NAK):
+        return None
+    if status == REPLY_NAK:
+        return {"ok": False, "command": command, "values": {}, "message": rest}
+
+    values = {}
+    for field in rest.split():
+        name, sep, value = field.partition("=")
+        if sep:
+            values[name] = value
+    return {"ok": True, "command": command, "values": values, "message": ""}
+
+def parse_evt(buffer, start=0):
+    """
+    Разбор EVT-пакета, начинающегося с buffer[start:] (с магией EVT).
+
+    Returns:
+        (event dict, сэмплы ndarray (копия), размер пакета в байтах) или None, если пакет ещё не дочитан
+    Raises:
+        ValueError: заголовок не похож на EVT (мусор)
+    """
+    available = len(buffer) - start
+    if available < len(EVT_MAGIC) + EVT_PREAMBLE.size:
+        return None
+
+    version, header_size = EVT_PREAMBLE.unpack_from(buffer, start + len(EVT_MAGIC))
+    if version < 1 or header_size < EVT_HEADER.size:
+        raise ValueError(f"bad EVT header (version={version}, header_size={header_size})")
+
+    payload_start = start + len(EVT_MAGIC) + header_size
+    if len(buffer) < payload_start:
+        return None
+
+    (_, _, event_num, total_events, compression, length, time_ms, packet_num,
+     max_abs, event_start, event_end, offset) = EVT_HEADER.unpack_from(buffer, start + len(EVT_MAGIC))
+    # length = 0 - событие без формы сигнала (только метаданные, перегруженный линк)
+    if length > MAX_FRAME_SAMPLES:
+        raise ValueError(f"bad EVT length {length}")
+
+    codec, step, minmax = Wave_Codec.unpack_compression(compression)
+    frame_end = payload_start + Wave_Codec.payload_size(compression, length)
+    if len(buffer) < frame_end:
+        return None
+
+    try:
+        samples = Wave_Codec.decode(codec, bytes(buffer[payload_start:frame_end]))
+    except Exception as e:
+        raise ValueError(f"bad EVT payload (codec {codec}): {e}")
+    event = {
+        "version": version,
+        "time": ms_to_timestamp(time_ms),
+        "packet_num": packet_num,
+        "event_num": event_num,
+        "total_events": total_events,
+        "max_abs": max_abs,
+        "loud": max_abs / ADC_FULL_SCALE,
+        "event_start": event_start,
+        "event_end": event_end,
+        "offset": offset,
+        "compression": step,
+        "minmax": minmax,
+        "codec": codec,
+    }
+    return event, samples, frame_end - start
+
+
+class ZigbeeFrameBuilder:
+    """
+    Сборка PKT/EVT-пакета без лишних аллокаций.
+
+    Заголовок и сэмплы пишутся в один заранее выделенный bytearray
+    (struct.pack_into + np.copyto прямо из среза ndarray), наружу отдаётся memoryview.
+    View действителен до следующего вызова build_pkt()/build_evt().
+    """
+
+    def __init__(self, max_samples=4096):
+        self._allocate(max_samples)
+
+    def _allocate(self, max_samples):
+        self.max_samples = max_samples
+        itemsize = np.dtype(SAMPLE_DTYPE).itemsize
+        header = len(FRAME_PREFIX) + max(PKT_HEADER_SIZE, EVT_HEADER_SIZE)
+        self._buf = bytearray(header + max_samples * itemsize)
+        self._view = memoryview(self._buf)
+        self._buf[0:len(FRAME_PREFIX)] = FRAME_PREFIX
+        # ndarray-окна на сэмплы для каждого формата (смещение = \r + магия + заголовок)
+        self._payloads = {
+            offset: np.frombuffer(self._buf, dtype=SAMPLE_DTYPE, count=max_samples, offset=offset)
+            for offset in (len(FRAME_PREFIX) + PKT_HEADER_SIZE, len(FRAME_PREFIX) + EVT_HEADER_SIZE)
+        }
+
+    def _fill(self, magic, header, fields, window_data, step, codec, budget=None):
+        magic_at = len(FRAME_PREFIX)
+        payload_offset = magic_at + len(magic) + header.size
+        itemsize = np.dtype(SAMPLE_DTYPE).itemsize
+
+        minmax = False
+        encoded = None
+        if budget is not None:
+            # Шаг и режим прореживания - под бюджет байт на весь пакет
+            step, minmax, (codec, encoded) = Wave_Codec.fit_budget(window_data, budget - payload_offset, codec)
+        elif codec != Wave_Codec.CODEC_RAW:
+            codec, encoded = Wave_Codec.encode(codec, window_data[::step])
+
+        if encoded is not None:
+            payload_bytes = len(encoded)
+            # length: для raw - число сэмплов, для сжатых кодеков - байт payload
+            n = payload_bytes // itemsize if codec == Wave_Codec.CODEC_RAW else payload_bytes
+        else:
+            decimated = window_data[::step]
+            n = len(decimated)
+            payload_bytes = n * itemsize
+
+        if n > MAX_FRAME_SAMPLES:
+            # Длинное окно (событие потокового детектора, CFG win/dec): length не влезает в >H
+            # и приёмник отбросил бы пакет -> min/max-прореживание под предел
+            limit = MAX_FRAME_SAMPLES * itemsize if codec == Wave_Codec.CODEC_RAW else MAX_FRAME_SAMPLES
+            step, minmax, (codec, encoded) = Wave_Codec.fit_budget(window_data, limit, codec)
+            payload_bytes = len(encoded)
+            n = payload_bytes // itemsize if codec == Wave_Codec.CODEC_RAW else payload_bytes
+            if n > MAX_FRAME_SAMPLES:
+                raise ValueError(f"event window of {len(window_data)} samples does not fit a frame")
+
+        if payload_bytes > self.max_samples * itemsize:
+            # Редкий случай: окно длиннее обычного -> увеличиваем буфер один раз
+            self._allocate(max(-(-payload_bytes // itemsize), self.max_samples * 2))
+
+        self._buf[magic_at:magic_at + len(magic)] = magic
+        header.pack_into(self._buf, magic_at + len(magic),
+                         *fields(Wave_Codec.pack_compression(codec, int(step), minmax), n))
+
+        if encoded is not None:
+            self._buf[payload_offset:payload_offset + payload_bytes] = encoded
+        else:
+            np.copyto(self._payloads[payload_offset][:n], decimated, casting="unsafe")
+        return self._view[:payload_offset + payload_bytes]
+
+    def build_pkt(self, window_data, packet_num, offset, compression, codec=Wave_Codec.CODEC_RAW,
+                  budget=None):
+        """
+        window_data - ndarray сэмплов окна события, compression - шаг прореживания,
+        codec - кодек payload (id, имя или "auto", см. Wave_Codec),
+        budget - размер пакета в байтах: шаг подбирается под него (compression игнорируется).
+
+        Returns:
+            memoryview: \\r + PKT-пакет, готовый для ser.write()
+        """
+        return self._fill(
+            PKT_MAGIC, PKT_HEADER,
+            lambda field, n: (int(packet_num), int(offset), field, n),
+            window_data, compression, Wave_Codec.codec_id(codec), budget,
+        )
+
+    def build_evt(self, window_data, time_ms, packet_num, event_num, total_events, max_abs,
+                  event_start, event_end, offset, compression, codec=Wave_Codec.CODEC_RAW, budget=None):
+        """
+        EVT-пакет: метаданные события + прореженное окно. event_start/event_end/offset -
+        индексы внутри пакета packet_num. budget - как в build_pkt().
+
+        Returns:
+            memoryview: \\r + EVT-пакет, готовый для ser.write()
+        """
+        return self._fill(
+            EVT_MAGIC, EVT_HEADER,
+            lambda field, n: (
+                EVT_VERSION, EVT_HEADER.size, int(event_num), int(total_events), field, n,
+                int(time_ms), int(packet_num), min(int(max_abs), 0xFFFFFFFF),
+                int(event_start), int(event_end), int(offset),
+            ),
+            window_data, compression, Wave_Codec.codec_id(codec), budget,
+        )
@@ -0,0 +1,181 @@
+import heapq
+import itertools
+import time
+from collections import deque
+
+import numpy as np
+
+# Уровни передачи события: от полного к отброшенному
+LEVEL_FULL = "full"        # окно с обычным прореживанием и кодеком
+LEVEL_COARSE = "coarse"    # грубее: больший шаг прореживания, int16
+LEVEL_SUMMARY = "summary"  # только метаданные (без формы сигнала)
+LEVEL_DROP = "dropped"
+LEVELS = (LEVEL_FULL, LEVEL_COARSE, LEVEL_SUMMARY)
+
+# 8N1: старт-бит + 8 бит данных + стоп-бит
+BITS_PER_BYTE = 10
+
+# Сколько последних оценок задержки доставки хранится для stats()
+LATENCY_HISTORY = 4096
+
+
+class LinkScheduler:
+    """
+    Планировщик событий для медленного Zigbee-линка.
+
+    События ждут здесь, а не в очереди writer'а: в радио уходит только то, что линк
+    успеет передать за lookahead_s, остальное можно переупорядочить и ужать.
+    - Порядок: громкость (max_abs / полная шкала) + age_weight * возраст (с),
+      т.е. громкое событие идёт первым, но тихое не ждёт вечно.
+    - Уровень: оценка доставки = возраст + (очередь writer'а + кадр) / скорость линка.
+      Не успевает к deadline_s -> грубее, не успевает и так -> только метаданные,
+      старше summary_deadline_s -> отбрасывается.
+    - Скорость: baudrate / 10 или меньше, если writer видит запись медленнее.
+
+    link  - ZigbeeSerial (send_data, baudrate, tx_backlog_bytes(), link_bytes_per_s()).
+    build - build(item, level) -> список bytes для send_data.
+    """
+
+    def __init__(self, link, build, deadline_s=5.0, summary_deadline_s=15.0, lookahead_s=1.0,
+                 age_weight=0.1, max_pending=256):
+        self.link = link
+        self.build = build
+        self.deadline_s = deadline_s
+        self.summary_deadline_s = summary_deadline_s
+        self.lookahead_s = lookahead_s
+        self.age_weight = age_weight
+        self.max_pending = max_pending
+
+        self._heap = []
+        self._seq = itertools.count()
+
+        self.submitted = 0
+        self.sent = {level: 0 for level in LEVELS}
+        self.dropped = 0
+        self.overflow = 0  # отброшено при переполнении max_pending
+        self.failed = 0  # попыток, на которых send_data вернул False (очередь writer'а полна, порт закрыт)
+        self.bytes_sent = 0
+        self._latency = deque(maxlen=LATENCY_HISTORY)  # оценка задержки доставки отправленных событий, с
+
+    def __len__(self):
+        return len(self._heap)
+
+    # ------------------------------------------------------------------
+    def rate(self):
+        """Оценка скорости линка, байт/с"""
+        configured = getattr(self.link, "baudrate", 9600) / BITS_PER_BYTE
+        observed = getattr(self.link, "link_bytes_per_s", None)
+        if observed is not None:
+            observed = observed()
+            if observed:
+                return min(configured, observed)
+        return configured
+
+    def backlog_bytes(self):
+        """Сколько байт уже ждёт в очереди writer'а"""
+        backlog = getattr(self.link, "tx_backlog_bytes", None)
+        return backlog() if backlog is not None else 0
+
+    def submit(self, item, loudness, now=None):
+        """
+        item - то, что потом получит build(); loudness - 0..1.
+        Returns: True если событие принято в очередь
+        """
+        now = time.monotonic() if now is None else now
+        # loud + w * (t - t_submit) убывает одинаково для всех -> ключ можно считать один раз
+        key = self.age_weight * now - loudness
+        self.submitted += 1
+
+        if len(self._heap) >= self.max_pending:
+            worst = max(self._heap)
+            if worst[0] <= key:
+                self.overflow += 1
+                self.dropped += 1
+                return False
+            self._heap.remove(worst)
+            heapq.heapify(self._heap)
+            self.overflow += 1
+            self.dropped += 1
+
+        heapq.heappush(self._heap, (key, next(self._seq), now, item))
+        return True
+
+    def dispatch(self, flush=False):
+        """
+        Отдать writer'у самые важные события, пока линк успевает (flush - отдать/отбросить все).
+
+        Линк не принял кадр (send_data -> False, считается в failed):
+        - не ушло ни одного кадра события - оно возвращается в очередь с прежним ключом
+          и временем постановки (повтор на следующем dispatch, возраст продолжает расти);
+        - часть кадров уже ушла - событие отбрасывается (dropped): повтор задублировал бы их;
+        - flush - ждать следующего dispatch некому: событие и все ждущие отбрасываются (dropped).
+
+        Returns: сколько событий отправлено
+        """
+        sent = 0
+        while self._heap:
+            rate = self.rate()
+            backlog = self.backlog_bytes()
+            if not flush and backlog > rate * self.lookahead_s:
+                break
+
+            entry = heapq.heappop(self._heap)
+            _, _, submitted_at, item = entry
+            level, frames, latency = self._choose_level(item, submitted_at, backlog, rate)
+            if level == LEVEL_DROP:
+                self.dropped += 1
+                continue
+
+            nbytes = 0
+            ok = True
+            for frame in frames:
+                if not self.link.send_data(frame):
+                    ok = False
+                    break
+                nbytes += len(frame)
+            self.bytes_sent += nbytes
+            if not ok:
+                # Не отправлено и без оценки задержки. Линк не принимает - не перебираем очередь дальше
+                self.failed += 1
+                if flush:
+                    self.dropped += 1 + len(self._heap)
+                    self._heap.clear()
+                elif nbytes:
+                    self.dropped += 1
+                else:
+                    heapq.heappush(self._heap, entry)
+                break
+            self.sent[level] += 1
+            self._latency.append(latency)
+            sent += 1
+        return sent
+
+    def _choose_level(self, item, submitted_at, backlog, rate):
+        age = time.monotonic() - submitted_at
+        if age > self.summary_deadline_s:
+            return LEVEL_DROP, None, age
+
+        for level in LEVELS:
+            frames = self.build(item, level)
+            latency = age + (backlog + sum(len(f) for f in frames)) / rate
+            if latency <= self.deadline_s or level == LEVEL_SUMMARY and latency <= self.summary_deadline_s:
+                return level, frames, latency
+        return LEVEL_DROP, None, age
+
+    def stats(self):
+        """Счётчики (dict): сколько событий на каждом уровне, отброшено, оценка задержки доставки"""
+        latency = np.fromiter(self._latency, dtype=float)
+        return {
+            "submitted": self.submitted,
+            "pending": len(self._heap),
+            **{f"sent_{level}": count for level, count in self.sent.items()},
+            "downgraded": self.sent[LEVEL_COARSE] + self.sent[LEVEL_SUMMARY],
+            "dropped": self.dropped,
+            "overflow": self.overflow,
+            "failed": self.failed,
+            "bytes_sent": self.bytes_sent,
+            "rate_bytes_per_s": self.rate(),
+            "latency_s_mean": float(latency.mean()) if latency.size else 0.0,
+            "latency_s_max": float(latency.max()) if latency.size else 0.0,
+            "latency_samples": latency.size,
+        }
@@ -0,0 +1,182 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+
+# ============================================================================
+# ЛОГИРОВАНИЕ БЕЗ БЛОКИРОВКИ ГОРЯЧЕГО ПУТИ
+# Потоки конвейера только кладут запись в очередь (QueueHandler); строку собирает
+# и пишет в консоль (serial-консоль Pi / SSH) отдельный поток QueueListener.
+# Очередь ограничена: если консоль не успевает, записи отбрасываются, а не тормозят чтение UART.
+#
+#   log = Log_Queue.get_logger("UART")
+#   log.debug("[Zigbee] Bin sent: Pack#%d (%d bytes)", packet_num, size)  # строка - только если уровень включён
+# ============================================================================
+LOGGER_NAME = "mice"
+DEFAULT_LEVEL = logging.INFO
+LOG_FORMAT = "%(message)s"  # как прежние print: теги [UART] / [Zigbee] уже в тексте
+
+QUEUE_SIZE = 10000
+
+# Повторы одного и того же WARNING/ERROR (один шаблон сообщения) - не чаще раза в RATE_LIMIT_S
+RATE_LIMIT_S = 5.0
+RATE_LIMIT_LEVEL = logging.WARNING
+
+LEVELS = ("debug", "info", "warning", "error")
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Повторы записи с тем же логгером, уровнем и шаблоном (msg без аргументов) -
+    не чаще раза в period_s. Следующая пропущенная запись сообщает, сколько подавлено.
+    """
+
+    def __init__(self, period_s=RATE_LIMIT_S, min_level=RATE_LIMIT_LEVEL):
+        super().__init__()
+        self.period_s = period_s
+        self.min_level = min_level
+        self._last = {}  # ключ -> (время последней пропущенной, подавлено с тех пор)
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def filter(self, record):
+        if record.levelno < self.min_level:
+            return True
+        key = (record.name, record.levelno, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            last, skipped = self._last.get(key, (None, 0))
+            if last is not None and now - last < self.period_s:
+                self._last[key] = (last, skipped + 1)
+                self.suppressed += 1
+                return False
+            self._last[key] = (now, 0)
+        if skipped:
+            record.msg = f"{record.msg} [+{skipped} similar suppressed]"
+        return True
+
+
+class DropQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler без форматирования в потоке вызывающего и без блокировки:
+    полная очередь - запись отбрасывается (считается в dropped).
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Строку соберёт поток QueueListener. Аргументы записей - числа/строки/свежие dict,
+        # после вызова логгера их никто не меняет
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # Штатный put_nowait упал бы на полной очереди: ждём, пока поток вывода освободит место
+        self.queue.put(self._sentinel)
+
+
+_handler = None
+_listener = None
+_rate_filter = None
+
+
+def get_logger(name):
+    """Логгер модуля: mice.<name> (уровень и вывод - общие, см. setup)"""
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+
+def _level(level):
+    return getattr(logging, level.upper()) if isinstance(level, str) else level
+
+
+def setup(level=DEFAULT_LEVEL, stream=None, queued=True, rate_limit_s=RATE_LIMIT_S, queue_size=QUEUE_SIZE):
+    """
+    Настройка вывода логгеров mice.* (повторный вызов заменяет прежнюю настройку).
+
+    Args:
+        level: уровень (logging.INFO или "info"/"debug"/...)
+        stream: куда писать (sys.stdout по умолчанию)
+        queued: False - писать прямо из потока вызывающего (как прежние print; для сравнения)
+        rate_limit_s: период подавления повторных WARNING/ERROR, 0 - без подавления
+    """
+    global _handler, _listener, _rate_filter
+    shutdown()
+
+    console = logging.StreamHandler(stream if stream is not None else sys.stdout)
+    console.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    if queued:
+        _handler = DropQueueHandler(queue.Queue(queue_size))
+        _listener = _Listener(_handler.queue, console, respect_handler_level=True)
+        _listener.start()
+    else:
+        _handler = console
+
+    _rate_filter = RateLimitFilter(rate_limit_s) if rate_limit_s > 0 else None
+    if _rate_filter is not None:
+        _handler.addFilter(_rate_filter)
+
+    root = logging.getLogger(LOGGER_NAME)
+    root.addHandler(_handler)
+    root.setLevel(_level(level))
+    root.propagate = False
+
+
+def set_level(level):
+    """Уровень на лету (из меню): без перезапуска потока вывода"""
+    logging.getLogger(LOGGER_NAME).setLevel(_level(level))
+
+
+def get_level():
+    return logging.getLevelName(logging.getLogger(LOGGER_NAME).getEffectiveLevel()).lower()
+
+
+def flush(timeout=2.0):
+    """Дождаться, пока поток вывода напишет всё из очереди (перед итоговой печатью отчётов)"""
+    if _listener is None:
+        return True
+    deadline = time.monotonic() + timeout
+    while _handler.queue.unfinished_tasks:
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+def shutdown():
+    """Остановить поток вывода (очередь дописывается до конца) и снять обработчик"""
+    global _handler, _listener, _rate_filter
+    if _handler is not None:
+        logging.getLogger(LOGGER_NAME).removeHandler(_handler)
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    if _handler is not None:
+        _handler.flush()
+        _handler = None
+    _rate_filter = None
+
+
+def stats():
+    """Счётчики логирования (dict): в очереди, отброшено при переполнении, подавлено повторов"""
+    return {
+        "level": get_level(),
+        "queued": _handler.queue.qsize() if isinstance(_handler, DropQueueHandler) else 0,
+        "dropped": getattr(_handler, "dropped", 0),
+        "suppressed": _rate_filter.suppressed if _rate_filter is not None else 0,
+    }
+
+
+atexit.register(shutdown)
@@ -1,7 +1,8 @@
 import Printer
 
 """Главное меню программы"""
-def main_menu(main_prog, check_stream, view_buffer_packets, stop_stream, zig_ser):
+def main_menu(main_prog, check_stream, view_buffer_packets, stop_stream, zig_ser, dump_history=None,
+              show_metrics=None, set_log_level=None):
     while True:
         Printer.menu_print()
         choice = input("Your choice: ").strip()
@@ -13,6 +14,12 @@ def main_menu(main_prog, check_stream, view_buffer_packets, stop_stream, zig_ser
             view_buffer_packets()
         elif choice == "4":
             stop_stream()
+        elif choice == "6" and dump_history is not None:
+            dump_history()
+        elif choice == "7" and show_metrics is not None:
+            show_metrics()
+        elif choice == "8" and set_log_level is not None:
+            set_log_level()
         elif choice == "5":
             print("\nClosing all ports...")
             zig_ser.close_serial()
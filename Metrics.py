@@ -0,0 +1,228 @@
+import os
+import stat
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+
+import Log_Queue
+
+log = Log_Queue.get_logger("Metrics")
+
+# ============================================================================
+# МЕТРИКИ КОНВЕЙЕРА RPi: задержки по стадиям + счётчики, текст в формате Prometheus
+# (меню и локальный HTTP / Unix-сокет, см. MetricsServer)
+# ============================================================================
+METRICS_PREFIX = "mice_"
+
+# Стадии (гистограмма задержки на каждую):
+#   read     - от пробуждения потока чтения (poll/select, in_waiting) до байт в буфере фреймера
+#   frame    - поиск пакета START...END в буфере
+#   convert  - конвертация и удаление смещения
+#   detect   - поиск событий
+#   validate - валидация окон событий
+#   transmit - сборка и постановка пакета события в очередь Zigbee
+STAGES = ("read", "frame", "convert", "detect", "validate", "transmit")
+
+# Границы корзин задержки, с (100 мкс .. 2.5 с)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5)
+
+# Счётчики, которые увеличивает сам конвейер: имя -> описание
+COUNTERS = {
+    "bytes_read": "Bytes read from the ADC UART",
+    "undersized_packets": "Packets dropped as too small",
+    "invalid_events": "Detected events rejected by validation",
+    "events": "Events passed to the transmit stage",
+}
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами (кумулятивные счётчики считаются при выводе)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # последняя - +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Верхняя граница корзины, в которую попадает квантиль q (max для +Inf)"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return self.buckets[i] if i < len(self.buckets) else self.max
+        return self.max
+
+
+class PipelineMetrics:
+    """
+    Метрики одного Serial_reader. observe()/inc() - из потоков конвейера,
+    render()/format() - из меню и потока MetricsServer.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {stage: Histogram() for stage in STAGES}
+        self.counters = {name: 0 for name in COUNTERS}
+        # Значения, которые уже считает кто-то другой (фреймер, Zigbee): имя -> (тип, описание, fn)
+        self._sources = {}
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            self.stages[stage].observe(seconds)
+
+    @contextmanager
+    def timed(self, stage):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - t0)
+
+    def inc(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def add_source(self, name, kind, description, fn):
+        """Внешнее значение: kind - "counter" или "gauge", fn() -> число (вызывается при выводе)"""
+        self._sources[name] = (kind, description, fn)
+
+    def _source_values(self):
+        values = {}
+        for name, (kind, description, fn) in list(self._sources.items()):
+            try:
+                values[name] = (kind, description, fn())
+            except Exception:
+                continue  # источник уже закрыт (порт/сессия) - просто пропускаем
+        return values
+
+    def render(self):
+        """Текст в формате Prometheus (text exposition 0.0.4)"""
+        name = f"{METRICS_PREFIX}stage_latency_seconds"
+        lines = [
+            f"# HELP {name} Per-stage latency of the RPi pipeline",
+            f"# TYPE {name} histogram",
+        ]
+        with self._lock:
+            for stage, hist in self.stages.items():
+                cumulative = 0
+                for bound, count in zip(hist.buckets + ("+Inf",), hist.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {hist.sum:.9f}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {hist.count}')
+            counters = dict(self.counters)
+
+        for counter, value in counters.items():
+            metric = f"{METRICS_PREFIX}{counter}_total"
+            lines += [f"# HELP {metric} {COUNTERS[counter]}", f"# TYPE {metric} counter", f"{metric} {value}"]
+
+        for source, (kind, description, value) in self._source_values().items():
+            metric = f"{METRICS_PREFIX}{source}" + ("_total" if kind == "counter" else "")
+            lines += [f"# HELP {metric} {description}", f"# TYPE {metric} {kind}", f"{metric} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def format(self):
+        """Таблица для меню: задержки по стадиям и счётчики"""
+        lines = [f"{'stage':<10}{'count':>9}{'mean ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+        with self._lock:
+            for stage, hist in self.stages.items():
+                mean = hist.sum / hist.count * 1000 if hist.count else 0.0
+                lines.append(f"{stage:<10}{hist.count:>9}{mean:>10.3f}{hist.quantile(0.99) * 1000:>10.3f}"
+                             f"{hist.max * 1000:>10.3f}")
+            counters = dict(self.counters)
+        counters.update({name: value for name, (_, _, value) in self._source_values().items()})
+        lines.append(" | ".join(f"{name}={value}" for name, value in counters.items()))
+        return "\n".join(lines)
+
+
+# ============================================================================
+# ЛОКАЛЬНЫЙ ЭНДПОИНТ: GET /metrics по HTTP (127.0.0.1) и/или по Unix-сокету
+#   curl http://127.0.0.1:9108/metrics
+#   curl --unix-socket /tmp/mice_metrics.sock http://localhost/metrics
+# ============================================================================
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.server.metrics.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # У Unix-сокета нет адреса клиента
+        return str(self.client_address[0]) if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        pass  # без строки в stdout на каждый опрос
+
+
+class _UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+
+def _remove_socket(path):
+    """Удалить path, только если это сокет (прошлого запуска); чужой файл не трогаем"""
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(f"{path} exists and is not a socket")
+    os.unlink(path)
+
+
+class MetricsServer:
+    """HTTP-эндпоинт метрик в фоновых потоках: TCP только на 127.0.0.1 и/или Unix-сокет"""
+
+    def __init__(self, metrics, port=None, unix_path=None, host="127.0.0.1"):
+        self.metrics = metrics
+        self.port = port
+        self.unix_path = unix_path
+        self.host = host
+        self._servers = []
+
+    def start(self):
+        if self.port is not None:
+            server = ThreadingHTTPServer((self.host, self.port), _MetricsHandler)
+            self._serve(server, f"http://{self.host}:{server.server_address[1]}/metrics")
+        if self.unix_path is not None:
+            _remove_socket(self.unix_path)  # сокет прошлого запуска
+            self._serve(_UnixHTTPServer(self.unix_path, _MetricsHandler), f"unix:{self.unix_path}")
+
+    def _serve(self, server, where):
+        server.metrics = self.metrics
+        threading.Thread(target=server.serve_forever, daemon=True, name="MetricsServer").start()
+        self._servers.append(server)
+        log.info("[Metrics] ✓ Serving %s", where)
+
+    def stop(self):
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        self._servers = []
+        if self.unix_path is not None:
+            _remove_socket(self.unix_path)
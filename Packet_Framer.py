@@ -0,0 +1,157 @@
+import ByInConvert
+
+
+class PacketFramer:
+    """
+    Инкрементальный поиск пакетов АЦП (START ... END) в потоке байт.
+
+    - Буфер выделяется один раз (bytearray фиксированной ёмкости).
+    - Курсор поиска END сохраняется между вызовами: недочитанный пакет
+      не сканируется заново после каждого read().
+    - Пакеты отдаются как memoryview на буфер, без копирования.
+      View действителен до следующего feed()/commit() (буфер может быть уплотнён).
+    - Уплотнение (перенос хвоста в начало) делается только когда
+      места в конце буфера не хватает.
+    """
+
+    def __init__(self, start_marker=ByInConvert.START_MARKER, end_marker=ByInConvert.END_MARKER,
+                 capacity=1 << 18):
+        self.start_marker = bytes(start_marker)
+        self.end_marker = bytes(end_marker)
+        self.capacity = capacity
+
+        self._buf = bytearray(capacity)
+        self._view = memoryview(self._buf)
+        self._head = 0  # начало необработанных данных
+        self._tail = 0  # конец записанных данных
+        self._scan = 0  # откуда продолжать поиск END
+
+        # Счётчики
+        self.frames = 0
+        self.bytes_in = 0
+        self.bytes_scanned = 0
+        self.garbage_bytes = 0
+        self.overflow_bytes = 0
+        self.compactions = 0
+
+    def __len__(self):
+        """Количество необработанных байт в буфере"""
+        return self._tail - self._head
+
+    def reset(self):
+        """Сброс буфера и счётчиков"""
+        self._head = self._tail = self._scan = 0
+        self.frames = 0
+        self.bytes_in = 0
+        self.bytes_scanned = 0
+        self.garbage_bytes = 0
+        self.overflow_bytes = 0
+        self.compactions = 0
+
+    # ------------------------------------------------------------------
+    # ЗАПИСЬ
+    # ------------------------------------------------------------------
+    def _make_room(self, size):
+        """Гарантирует size свободных байт в конце буфера"""
+        size = min(size, self.capacity)
+        if self.capacity - self._tail >= size:
+            return
+
+        # Уплотнение: переносим необработанный хвост в начало
+        pending = self._tail - self._head
+        if pending > 0:
+            self._buf[0:pending] = self._buf[self._head:self._tail]
+        self._scan -= self._head
+        self._head = 0
+        self._tail = pending
+        self.compactions += 1
+
+        # Всё ещё не хватает места -> в буфере только мусор без END, выкидываем старое
+        if self.capacity - self._tail < size:
+            drop = size - (self.capacity - self._tail)
+            self._buf[0:pending - drop] = self._buf[drop:pending]
+            self._tail -= drop
+            self._scan = max(0, self._scan - drop)
+            self.overflow_bytes += drop
+
+    def write_view(self, size):
+        """
+        Свободное место в конце буфера для readinto().
+        После чтения нужно вызвать commit(n).
+        """
+        self._make_room(size)
+        return self._view[self._tail:min(self.capacity, self._tail + size)]
+
+    def commit(self, n):
+        """Подтверждает n байт, записанных через write_view()"""
+        self._tail += n
+        self.bytes_in += n
+
+    def feed(self, data):
+        """Копирует data в буфер"""
+        offset = 0
+        total = len(data)
+        while offset < total:
+            chunk = min(total - offset, self.capacity)
+            dst = self.write_view(chunk)
+            n = len(dst)
+            dst[:] = data[offset:offset + n]
+            self.commit(n)
+            offset += n
+
+    # ------------------------------------------------------------------
+    # ЧТЕНИЕ ПАКЕТОВ
+    # ------------------------------------------------------------------
+    def next_frame(self):
+        """
+        Следующий полный пакет (memoryview с маркерами START и END) или None.
+        """
+        end_len = len(self.end_marker)
+
+        while True:
+            idx_end = self._buf.find(self.end_marker, self._scan, self._tail)
+            if idx_end == -1:
+                # END не найден: в следующий раз начнём с конца (минус длина маркера)
+                new_scan = max(self._scan, self._tail - end_len + 1, self._head)
+                self.bytes_scanned += new_scan - self._scan
+                self._scan = new_scan
+                return None
+
+            self.bytes_scanned += idx_end + end_len - self._scan
+            idx_start = self._buf.rfind(self.start_marker, self._head, idx_end)
+            end_pos = idx_end + end_len
+
+            if idx_start == -1:
+                # Маркер конца найден, а начала нет -> мусор
+                self.bytes_scanned += idx_end - self._head
+                self.garbage_bytes += end_pos - self._head
+                self._head = self._scan = end_pos
+                continue
+
+            self.bytes_scanned += idx_end - idx_start
+            self.garbage_bytes += idx_start - self._head
+            self._head = self._scan = end_pos
+            self.frames += 1
+            return self._view[idx_start:end_pos]
+
+    def iter_frames(self):
+        """Все полные пакеты, которые сейчас есть в буфере"""
+        while True:
+            frame = self.next_frame()
+            if frame is None:
+                return
+            yield frame
+
+    def stats(self):
+        """Счётчики фреймера (dict)"""
+        return {
+            "frames": self.frames,
+            "bytes_in": self.bytes_in,
+            "bytes_scanned": self.bytes_scanned,
+            "scanned_per_frame": self.bytes_scanned / self.frames if self.frames else 0.0,
+            "scanned_per_byte": self.bytes_scanned / self.bytes_in if self.bytes_in else 0.0,
+            "garbage_bytes": self.garbage_bytes,
+            "overflow_bytes": self.overflow_bytes,
+            "compactions": self.compactions,
+            "pending": len(self),
+        }
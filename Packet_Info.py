@@ -0,0 +1,98 @@
+import threading
+
+import numpy as np
+
+# ============================================================================
+# МЕТАДАННЫЕ ПРИНЯТЫХ ПАКЕТОВ (вместо списка dict в Serial_reader.main_packet_info)
+# Заранее выделенное кольцо structured array: память не растёт, сводка - векторно
+# ============================================================================
+PACKET_INFO_DTYPE = np.dtype([
+    ("global_number", "<u8"),  # номер пакета с начала сессии (main_total_packets)
+    ("monotonic", "<f8"),      # time.monotonic() приёма
+    ("time_ms", "<u4"),        # время пакета, мс с полуночи (timestamp в записях о пиках)
+    ("size", "<u4"),           # байт пакета вместе с маркерами
+    ("events", "<u2"),         # сколько событий записано по этому пакету
+])
+
+DEFAULT_CAPACITY = 4096  # ~14 минут при 5 пакетах/с
+
+
+class PacketInfoRing:
+    """
+    Кольцо метаданных последних capacity пакетов.
+    append() - из стадии приёма, add_events() - из детекции (другой поток).
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._ring = np.zeros(capacity, dtype=PACKET_INFO_DTYPE)
+        self._lock = threading.Lock()
+        self._written = 0
+
+    def __len__(self):
+        return min(self._written, self.capacity)
+
+    def clear(self):
+        with self._lock:
+            self._written = 0
+
+    def append(self, global_number, monotonic, time_ms, size):
+        with self._lock:
+            row = self._ring[self._written % self.capacity]
+            row["global_number"] = global_number
+            row["monotonic"] = monotonic
+            row["time_ms"] = time_ms
+            row["size"] = size
+            row["events"] = 0
+            self._written += 1
+
+    def add_events(self, global_number, count=1):
+        """Событие в пакете global_number. Returns: False если пакет уже вытеснен из кольца"""
+        with self._lock:
+            if self._written == 0:
+                return False
+            # Номера идут подряд: слот пакета - на (newest - global_number) позиций раньше последнего
+            newest = self._ring[(self._written - 1) % self.capacity]["global_number"]
+            back = int(newest) - int(global_number)
+            if not 0 <= back < min(self._written, self.capacity):
+                return False
+            row = self._ring[(self._written - 1 - back) % self.capacity]
+            if row["global_number"] != global_number:
+                return False
+            row["events"] = min(0xFFFF, int(row["events"]) + count)
+            return True
+
+    def last(self, n=None):
+        """Последние n пакетов (structured array, от старых к новым, копия); None - все в кольце"""
+        with self._lock:
+            count = min(self._written, self.capacity)
+            n = count if n is None else min(n, count)
+            end = self._written % self.capacity
+            if n == 0:
+                return np.zeros(0, dtype=PACKET_INFO_DTYPE)
+            if n <= end:
+                return self._ring[end - n:end].copy()
+            return np.concatenate((self._ring[end - n:], self._ring[:end]))
+
+    def summary(self, n=None):
+        """
+        Сводка по последним n пакетам (dict): пакеты/с, средний размер, события,
+        пакеты с событиями, максимальный интервал между пакетами.
+        """
+        rows = self.last(n)
+        count = len(rows)
+        if count == 0:
+            return {"packets": 0, "total_packets": self._written}
+
+        span = float(rows["monotonic"][-1] - rows["monotonic"][0])
+        gaps = np.diff(rows["monotonic"])
+        events = rows["events"]
+        return {
+            "packets": count,
+            "total_packets": self._written,
+            "packets_per_s": (count - 1) / span if span > 0 else 0.0,
+            "size_mean": float(rows["size"].mean()),
+            "events": int(events.sum()),
+            "packets_with_events": int(np.count_nonzero(events)),
+            "gap_s_max": float(gaps.max()) if gaps.size else 0.0,
+        }
@@ -0,0 +1,150 @@
+import threading
+
+import numpy as np
+
+# ============================================================================
+# ИСТОРИЯ ПАКЕТОВ (вместо deque(maxlen=10) копий пакетов в Serial_reader.main_ring_que)
+# Один заранее выделенный массив (depth, samples) int32: строка на пакет,
+# get()/latest() - view на строки без копирования, window() - копия окна под блокировкой.
+# Для pre-trigger окон и дампов по запросу.
+# ============================================================================
+PACKET_SAMPLES = 4800  # сэмплов в пакете АЦП (19220 байт с маркерами)
+DEFAULT_DEPTH = 10
+SAMPLE_DTYPE = np.int32
+
+
+class PacketRing:
+    """
+    Кольцо последних depth пакетов.
+
+    View из get()/latest() действителен, пока пакет не вытеснен (depth следующих append)
+    и пока кольцо не расширено пакетом длиннее samples.
+    """
+
+    def __init__(self, depth=DEFAULT_DEPTH, samples=PACKET_SAMPLES):
+        self.depth = depth
+        # Condition: window() может ждать следующий пакет из потока передачи
+        self._lock = threading.Condition()
+        self._allocate(samples)
+        self.clear()
+
+    def _allocate(self, samples, keep=False):
+        data = np.zeros((self.depth, samples), dtype=SAMPLE_DTYPE)
+        if keep:
+            data[:, :self.samples] = self._data
+        self.samples = samples
+        self._data = data
+
+    def clear(self):
+        with self._lock:
+            self._numbers = np.zeros(self.depth, dtype=np.int64)
+            self._lengths = np.zeros(self.depth, dtype=np.int64)
+            self._written = 0
+
+    def __len__(self):
+        return min(self._written, self.depth)
+
+    def append(self, packet_num, samples):
+        """
+        Копия сэмплов пакета в следующую строку (с переводом в нативный int32, например из '>i4').
+        Returns: view на сохранённый пакет
+        """
+        n = len(samples)
+        with self._lock:
+            if n > self.samples:
+                # Редкий случай: пакет длиннее обычного -> расширяем кольцо один раз
+                self._allocate(max(n, self.samples * 2), keep=True)
+            slot = self._written % self.depth
+            row = self._data[slot, :n]
+            np.copyto(row, samples, casting="unsafe")
+            self._numbers[slot] = packet_num
+            self._lengths[slot] = n
+            self._written += 1
+            self._lock.notify_all()
+            return row
+
+    def _slot(self, packet_num):
+        # Номера пакетов идут подряд: слот - на (последний - packet_num) позиций раньше последнего
+        if self._written == 0:
+            return None
+        back = int(self._numbers[(self._written - 1) % self.depth]) - int(packet_num)
+        if not 0 <= back < min(self._written, self.depth):
+            return None
+        slot = (self._written - 1 - back) % self.depth
+        return slot if self._numbers[slot] == packet_num else None
+
+    def get(self, packet_num):
+        """View на пакет packet_num или None, если его уже нет в кольце"""
+        with self._lock:
+            slot = self._slot(packet_num)
+            if slot is None:
+                return None
+            return self._data[slot, :self._lengths[slot]]
+
+    def latest(self, n=1):
+        """Последние n пакетов: список (номер, view), от старых к новым"""
+        with self._lock:
+            n = min(n, self._written, self.depth)
+            slots = [(self._written - n + i) % self.depth for i in range(n)]
+            return [(int(self._numbers[s]), self._data[s, :self._lengths[s]]) for s in slots]
+
+    def window(self, packet_num, start, end, timeout=0.0, dtype=SAMPLE_DTYPE):
+        """
+        Сэмплы [start, end) относительно начала пакета packet_num, через границы пакетов:
+        start < 0 - хвост предыдущего пакета, end > длины - начало следующего
+        (его ждём не дольше timeout). Чего нет в кольце - обрезается.
+
+        Окно копируется под блокировкой (сразу в dtype, одна копия): view на строки
+        кольца поток приёма перезаписал бы, пока вызывающий поток их копирует.
+
+        Returns:
+            (сэмплы dtype, фактический start, первый сэмпл пакета packet_num) или None,
+            если пакета уже нет в кольце
+        """
+        with self._lock:
+            slot = self._slot(packet_num)
+            if slot is None:
+                return None
+            if end > self._lengths[slot] and timeout > 0:
+                self._lock.wait_for(lambda: self._slot(packet_num + 1) is not None, timeout)
+                slot = self._slot(packet_num)
+                if slot is None:
+                    return None
+
+            n = int(self._lengths[slot])
+            pieces = []  # (слот, от, до)
+            actual_start = max(0, start)
+            if start < 0:
+                prev = self._slot(packet_num - 1)
+                if prev is not None:
+                    prev_len = int(self._lengths[prev])
+                    take = min(-start, prev_len)
+                    pieces.append((prev, prev_len - take, prev_len))
+                    actual_start = -take
+            pieces.append((slot, max(0, start), min(end, n)))
+            if end > n:
+                nxt = self._slot(packet_num + 1)
+                if nxt is not None:
+                    pieces.append((nxt, 0, min(end - n, int(self._lengths[nxt]))))
+
+            samples = np.empty(sum(hi - lo for _, lo, hi in pieces), dtype=dtype)
+            pos = 0
+            for s, lo, hi in pieces:
+                samples[pos:pos + hi - lo] = self._data[s, lo:hi]
+                pos += hi - lo
+            return samples, actual_start, int(self._data[slot, 0])
+
+    def dump(self, path, n=None):
+        """
+        Дамп последних n пакетов (все в кольце при None) в .npz: packet_num, lengths, samples.
+        Returns: сколько пакетов записано
+        """
+        with self._lock:
+            n = min(self._written, self.depth) if n is None else min(n, self._written, self.depth)
+            slots = [(self._written - n + i) % self.depth for i in range(n)]
+            np.savez(path, packet_num=self._numbers[slots], lengths=self._lengths[slots],
+                     samples=self._data[slots])
+        return n
+
+    def memory_bytes(self):
+        return self._data.nbytes
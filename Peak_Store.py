@@ -0,0 +1,230 @@
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+import Frame_Protocol
+import Log_Queue
+import Session_Stats
+
+log = Log_Queue.get_logger("PeakStore")
+
+# ============================================================================
+# ХРАНИЛИЩЕ ЗАПИСЕЙ О ПИКАХ (вместо бесконечного списка dict в ZigbeeSerial.peak_log)
+# - кольцо последних capacity записей в памяти (компактный structured array)
+# - весь журнал - в append-only бинарном файле: заголовок + записи фиксированного размера
+# - разреженный индекс времени (каждая INDEX_EVERY-я запись): поиск по диапазону
+#   времени читает с диска только нужный кусок файла
+# - wall_time не убывает (шаг NTP назад не ломает поиск по индексу): если часы ушли
+#   назад, записи получают время последней записи, пока часы её не догонят
+# ============================================================================
+PEAK_DTYPE = np.dtype([
+    ("wall_time", "<f8"),       # время записи на RPi, с (Unix)
+    ("time_ms", "<u4"),         # время пакета, мс с полуночи ("time" в записи о пике)
+    ("packet_num", "<u4"),
+    ("event_num", "<u2"),
+    ("total_events", "<u2"),
+    ("event_start", "<i4"),
+    ("event_end", "<i4"),
+    ("duration", "<i4"),
+    ("max_value", "<f8"),
+])
+
+# Заголовок файла: магия, версия формата, размер записи
+FILE_HEADER = struct.Struct("<4sHH")
+FILE_MAGIC = b"PEAK"
+FILE_VERSION = 1
+
+DEFAULT_CAPACITY = 4096
+INDEX_EVERY = 256
+# Сколько записей максимум отдаёт between() (защита меню от многонедельного диапазона)
+MAX_QUERY_RECORDS = 100000
+
+
+class PeakStore:
+    """
+    Журнал пиков: append() из потока детекции, last()/between()/stats() из меню и Printer.
+
+    len() и stats() - по текущей сессии (после clear()), за O(1): статистика
+    (Session_Stats) обновляется при добавлении.
+    Файл не очищается: clear() начинает новую сессию, история остаётся на диске.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, path=None):
+        self.capacity = capacity
+        self.path = path
+        self._ring = np.zeros(capacity, dtype=PEAK_DTYPE)
+        self._lock = threading.Lock()
+        self._file = None
+        self._file_records = 0  # записей в файле (включая прошлые запуски)
+        self._index_times = []  # wall_time каждой INDEX_EVERY-й записи файла
+        self._last_wall = 0.0  # wall_time последней записи (кольцо или файл)
+        self._reset_session()
+
+        if path is not None:
+            self._open_file(path)
+
+    def _reset_session(self):
+        self._written = 0  # записей в кольце за сессию (позиция записи = _written % capacity)
+        self.session = Session_Stats.SessionStats()
+
+    # ------------------------------------------------------------------
+    # ФАЙЛ
+    # ------------------------------------------------------------------
+    def _open_file(self, path):
+        if os.path.exists(path) and os.path.getsize(path) >= FILE_HEADER.size:
+            with open(path, "rb") as f:
+                magic, version, record_size = FILE_HEADER.unpack(f.read(FILE_HEADER.size))
+            if magic != FILE_MAGIC or version != FILE_VERSION or record_size != PEAK_DTYPE.itemsize:
+                raise ValueError(f"{path}: not a peak log v{FILE_VERSION} file")
+            self._file_records = (os.path.getsize(path) - FILE_HEADER.size) // PEAK_DTYPE.itemsize
+            # Недописанная запись (обрыв питания) отрезается, иначе сместились бы все следующие
+            with open(path, "r+b") as f:
+                f.truncate(FILE_HEADER.size + self._file_records * PEAK_DTYPE.itemsize)
+            self._index_times = self._read_index()
+            if self._file_records:
+                self._last_wall = float(self._memmap()["wall_time"][-1])
+            self._file = open(path, "ab")
+        else:
+            self._file = open(path, "wb")
+            self._file.write(FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION, PEAK_DTYPE.itemsize))
+        log.info("[PeakStore] %s: %d records on disk", path, self._file_records)
+
+    def _memmap(self):
+        return np.memmap(self.path, dtype=PEAK_DTYPE, mode="r", offset=FILE_HEADER.size,
+                         shape=(self._file_records,))
+
+    def _read_index(self):
+        """wall_time каждой INDEX_EVERY-й записи файла: с диска читаются только эти записи"""
+        if not self._file_records:
+            return []
+        return self._memmap()["wall_time"][::INDEX_EVERY].tolist()
+
+    def _read_file(self, start, stop):
+        """Записи файла [start, stop) - memmap, копируется только нужный кусок"""
+        if stop <= start:
+            return np.zeros(0, dtype=PEAK_DTYPE)
+        return np.array(self._memmap()[start:stop])
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # ------------------------------------------------------------------
+    # ЗАПИСЬ
+    # ------------------------------------------------------------------
+    def append(self, record):
+        """record - dict записи о пике (как Uart_Logic.Serial_reader.make_peak_record)"""
+        with self._lock:
+            row = self._ring[self._written % self.capacity]
+            self._last_wall = max(time.time(), self._last_wall)
+            row["wall_time"] = self._last_wall
+            row["time_ms"] = Frame_Protocol.timestamp_to_ms(record["time"])
+            row["packet_num"] = record["packet_num"]
+            row["event_num"] = record["event_num"]
+            row["total_events"] = record["total_events_in_packet"]
+            row["event_start"] = record["event_start_idx"]
+            row["event_end"] = record["event_end_idx"]
+            row["duration"] = record["duration"]
+            row["max_value"] = record["max_value"]
+            self._written += 1
+
+            self.session.add(record["max_value"], record["duration"])
+
+            if self._file is not None:
+                if self._file_records % INDEX_EVERY == 0:
+                    self._index_times.append(row["wall_time"])
+                self._file.write(row.tobytes())
+                self._file_records += 1
+
+    def clear(self):
+        """Новая сессия: кольцо и агрегаты с нуля (файл не трогаем)"""
+        with self._lock:
+            self._reset_session()
+        log.info("[PeakStore] Session cleared")
+
+    # ------------------------------------------------------------------
+    # ЧТЕНИЕ
+    # ------------------------------------------------------------------
+    def __len__(self):
+        return self._written
+
+    def __iter__(self):
+        return iter(self.last(self.capacity))
+
+    def _ring_ordered(self):
+        """Записи сессии из кольца, от старых к новым (копия)"""
+        n = min(self._written, self.capacity)
+        start = (self._written - n) % self.capacity
+        return np.roll(self._ring, -start)[:n] if n == self.capacity else self._ring[start:start + n].copy()
+
+    def last_array(self, n):
+        """Последние n записей (structured array, от старых к новым); n <= capacity"""
+        with self._lock:
+            n = min(n, self._written, self.capacity)
+            end = self._written % self.capacity
+            if n == 0:
+                return np.zeros(0, dtype=PEAK_DTYPE)
+            if n <= end:
+                return self._ring[end - n:end].copy()
+            return np.concatenate((self._ring[end - n:], self._ring[:end]))
+
+    def last(self, n):
+        """Последние n записей в виде dict (как записи о пиках), от старых к новым"""
+        return to_records(self.last_array(n))
+
+    def between_array(self, t_from, t_to, limit=MAX_QUERY_RECORDS):
+        """
+        Записи с wall_time в [t_from, t_to) (structured array, не больше limit).
+        Из кольца, если диапазон в нём помещается, иначе - из файла через индекс времени.
+        """
+        with self._lock:
+            ring = self._ring_ordered()
+            if self._file is None or (len(ring) and ring["wall_time"][0] <= t_from) or not self._file_records:
+                lo, hi = np.searchsorted(ring["wall_time"], (t_from, t_to))
+                return ring[lo:min(hi, lo + limit)]
+
+            self._file.flush()
+            index = np.asarray(self._index_times)
+            # Блоки индекса, в которые попадает диапазон
+            first = max(0, int(np.searchsorted(index, t_from, side="right")) - 1) * INDEX_EVERY
+            last = min(self._file_records, int(np.searchsorted(index, t_to, side="right")) * INDEX_EVERY)
+            chunk = self._read_file(first, min(last, first + limit + 2 * INDEX_EVERY))
+        lo, hi = np.searchsorted(chunk["wall_time"], (t_from, t_to))
+        return chunk[lo:min(hi, lo + limit)]
+
+    def between(self, t_from, t_to, limit=MAX_QUERY_RECORDS):
+        """Записи за интервал времени (Unix, с) в виде dict"""
+        return to_records(self.between_array(t_from, t_to, limit))
+
+    def stats(self):
+        """Статистика сессии (dict, см. Session_Stats.SessionStats.summary) + записей в файле"""
+        with self._lock:
+            return {**self.session.summary(), "file_records": self._file_records}
+
+
+def to_records(rows):
+    """structured array PEAK_DTYPE -> список dict с ключами записи о пике"""
+    return [
+        {
+            "time": Frame_Protocol.ms_to_timestamp(row["time_ms"]),
+            "wall_time": float(row["wall_time"]),
+            "packet_num": int(row["packet_num"]),
+            "event_num": int(row["event_num"]),
+            "total_events_in_packet": int(row["total_events"]),
+            "event_start_idx": int(row["event_start"]),
+            "event_end_idx": int(row["event_end"]),
+            "max_value": float(row["max_value"]),
+            "duration": int(row["duration"]),
+        }
+        for row in rows
+    ]
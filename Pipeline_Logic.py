@@ -0,0 +1,177 @@
+import threading
+import time
+from collections import deque
+
+import Log_Queue
+
+log = Log_Queue.get_logger("Pipeline")
+
+# Политики переполнения очереди
+POLICY_BLOCK = "block"              # ждать место (с таймаутом), потом отбросить новый элемент
+POLICY_DROP_NEW = "drop_new"        # сразу отбросить новый элемент
+POLICY_DROP_OLDEST = "drop_oldest"  # выкинуть самый старый элемент, положить новый
+
+OVERFLOW_POLICIES = (POLICY_BLOCK, POLICY_DROP_NEW, POLICY_DROP_OLDEST)
+
+
+class Empty(Exception):
+    """Очередь пуста (таймаут get)"""
+
+
+class StageQueue:
+    """
+    Ограниченная очередь между стадиями конвейера.
+    Считает занятость (текущую и максимальную) и отброшенные элементы.
+    """
+
+    def __init__(self, name, maxsize, policy=POLICY_DROP_OLDEST, block_timeout=0.05):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy!r} (expected one of {OVERFLOW_POLICIES})")
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+
+        self.name = name
+        self.maxsize = maxsize
+        self.policy = policy
+        self.block_timeout = block_timeout
+
+        self._items = deque()
+        self._cond = threading.Condition()
+
+        self.put_count = 0
+        self.get_count = 0
+        self.dropped = 0
+        self.high_water = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, item):
+        """
+        Кладёт элемент. Returns: True если элемент принят, False если отброшен.
+        """
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                if self.policy == POLICY_DROP_OLDEST:
+                    self._items.popleft()
+                    self.dropped += 1
+                elif self.policy == POLICY_DROP_NEW:
+                    self.dropped += 1
+                    return False
+                else:
+                    deadline = time.monotonic() + self.block_timeout
+                    while len(self._items) >= self.maxsize:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.dropped += 1
+                            return False
+                        self._cond.wait(remaining)
+
+            self._items.append(item)
+            self.put_count += 1
+            if len(self._items) > self.high_water:
+                self.high_water = len(self._items)
+            self._cond.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        """Забирает самый старый элемент. Бросает Empty по таймауту."""
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+                if not self._items:
+                    raise Empty()
+            item = self._items.popleft()
+            self.get_count += 1
+            self._cond.notify_all()
+            return item
+
+    def clear(self):
+        with self._cond:
+            self._items.clear()
+            self._cond.notify_all()
+
+    def stats(self):
+        """Счётчики очереди (dict)"""
+        return {
+            "name": self.name,
+            "policy": self.policy,
+            "size": len(self._items),
+            "maxsize": self.maxsize,
+            "high_water": self.high_water,
+            "put": self.put_count,
+            "get": self.get_count,
+            "dropped": self.dropped,
+        }
+
+
+class PipelineStage:
+    """
+    Стадия конвейера в отдельном потоке: берёт элементы из входной очереди
+    и вызывает handler(item). Работает, пока run_flag() истинно
+    или во входной очереди ещё что-то есть. finish_hook() вызывается перед выходом потока.
+    """
+
+    def __init__(self, name, in_queue, handler, run_flag, idle_hook=None, finish_hook=None,
+                 poll_timeout=0.05):
+        self.name = name
+        self.in_queue = in_queue
+        self.handler = handler
+        self.run_flag = run_flag
+        self.idle_hook = idle_hook
+        self.finish_hook = finish_hook
+        self.poll_timeout = poll_timeout
+
+        self.processed = 0
+        self.errors = 0
+        self.busy_time = 0.0
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True, name=self.name)
+        self._thread.start()
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        while self.run_flag() or len(self.in_queue) > 0:
+            if self.idle_hook is not None:
+                try:
+                    self.idle_hook()
+                except Exception as e:
+                    log.error("[%s] ERROR in idle hook: %s", self.name, e)
+
+            try:
+                item = self.in_queue.get(timeout=self.poll_timeout)
+            except Empty:
+                continue
+
+            t0 = time.perf_counter()
+            try:
+                self.handler(item)
+            except Exception as e:
+                self.errors += 1
+                log.error("[%s] ERROR: %s", self.name, e)
+            self.busy_time += time.perf_counter() - t0
+            self.processed += 1
+
+        if self.finish_hook is not None:
+            try:
+                self.finish_hook()
+            except Exception as e:
+                log.error("[%s] ERROR in finish hook: %s", self.name, e)
+
+    def stats(self):
+        """Счётчики стадии (dict)"""
+        return {
+            "name": self.name,
+            "processed": self.processed,
+            "errors": self.errors,
+            "busy_s": self.busy_time,
+            "queue": self.in_queue.stats(),
+        }
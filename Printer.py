@@ -18,11 +18,17 @@ def menu_print():
     print("3 - Check packets in buffer")
     print("4 - Stop flow")
     print("5 - Exit program")
+    print("6 - Dump packet history")
+    print("7 - Pipeline metrics")
+    print("8 - Log level")
     print(DELIMETER)
 
 
 def print_result(main_total_packets, zigbee_peak_log, peak_threshold):
-    """Вывод итогов работы - каждое событие как отдельная запись"""
+    """
+    Вывод итогов работы - каждое событие как отдельная запись.
+    zigbee_peak_log - Peak_Store.PeakStore: последние записи и агрегаты без прохода по всему журналу.
+    """
 
     print(f'\n\n{DELIMETER}')
     print(EN_DELIMETER)
@@ -40,7 +46,7 @@ def print_result(main_total_packets, zigbee_peak_log, peak_threshold):
     if total_events > 0:
         print("\n\t\t-- Event Log (Last 30) --\n")
 
-        for i, event in enumerate(zigbee_peak_log[-30:], 1):
+        for i, event in enumerate(zigbee_peak_log.last(30), 1):
             timestamp = event.get('time', '?')
             packet_num = event.get('packet_num', '?')
             event_num = event.get('event_num', '?')
@@ -55,15 +61,18 @@ def print_result(main_total_packets, zigbee_peak_log, peak_threshold):
         print(DELIMETER)
 
         # Статистика
-        max_values = [e['max_value'] for e in zigbee_peak_log]
-        durations = [e['duration'] for e in zigbee_peak_log]
+        stats = zigbee_peak_log.stats()
 
         print(f"\nStatistics:")
         print(f"  • Total events: {total_events}")
-        print(f"  • Max value overall: {max(max_values):.0f}")
-        print(f"  • Min value overall: {min(max_values):.0f}")
-        print(f"  • Avg value: {sum(max_values) / len(max_values):.0f}")
-        print(f"  • Avg duration: {sum(durations) / len(durations):.0f} samples")
+        print(f"  • Max value overall: {stats['loud_max']:.0f}")
+        print(f"  • Min value overall: {stats['loud_min']:.0f}")
+        print(f"  • Avg value: {stats['loud_mean']:.0f} ± {stats['loud_std']:.0f}")
+        print(f"  • Value p50/p95/p99: {stats['loud_p50']:.0f} / {stats['loud_p95']:.0f} / {stats['loud_p99']:.0f}")
+        print(f"  • Avg duration: {stats['duration_mean']:.0f} ± {stats['duration_std']:.0f} samples")
+        print(f"  • Duration p50/p95/p99: {stats['duration_p50']:.0f} / {stats['duration_p95']:.0f} / "
+              f"{stats['duration_p99']:.0f} samples")
+        print(f"  • Events per minute: {stats['per_min']:.1f} (last minute {stats['per_min_recent']:.1f})")
         print(DELIMETER)
     else:
         print("No events were detected during the session.")
@@ -11,16 +11,21 @@ from serial.tools import list_ports
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                              QHBoxLayout, QLabel, QPushButton, QComboBox,
                              QGroupBox, QTreeWidget, QTreeWidgetItem,
-                             QMessageBox, QSplitter)
+                             QMessageBox, QSplitter, QLineEdit)
 from PyQt6.QtCore import QTimer, pyqtSignal, QObject, Qt
 from PyQt6.QtGui import QFont, QColor, QBrush
 
 import pyqtgraph as pg
 
+import Frame_Protocol
+import Wave_Codec
+
 # ============================================================================
 # ГЛОБАЛЬНЫЕ НАСТРОЙКИ
 # ============================================================================
 BAUDRATES = [4800, 9600, 19200, 38400, 57600, 115200, 256000, 460800]
+# Параметры RPi, меняемые командой CFG:name=value (см. Uart_Logic.RUNTIME_PARAMS)
+REMOTE_PARAMS = ["thr", "gap", "win", "dec", "budget", "codec"]
 
 # Настройка стиля графиков (белый фон, черные оси)
 pg.setConfigOption('background', 'w')
@@ -36,9 +41,11 @@ class UartWorker(QObject):
     Воркер работает в отдельном потоке.
     Логика чтения 1-в-1 повторяет твой Tkinter скрипт (read_uart_thread).
     """
-    sig_packet_received = pyqtSignal(int, object, int)  # packet_num, data(np.array), offset
+    sig_packet_received = pyqtSignal(int, object, object, int)  # packet_num, data(np.array), x(np.array), offset
+    sig_event_received = pyqtSignal(object, object, object)  # event(dict из EVT-пакета), data, x(np.array)
     sig_log_message = pyqtSignal(str)  # текстовое сообщение
     sig_threshold_update = pyqtSignal(int)  # обновление порога
+    sig_reply_received = pyqtSignal(object)  # ответ RPi на CFG/GET/STAT (dict, см. Frame_Protocol.parse_reply)
     sig_status_update = pyqtSignal(str)  # статус
     sig_connection_error = pyqtSignal(str)  # ошибка
 
@@ -115,6 +122,10 @@ class UartWorker(QObject):
 
                 while len(buffer) > 0:
                     idx_pkt = buffer.find(b'PKT')
+                    idx_evt = buffer.find(Frame_Protocol.EVT_MAGIC)
+                    is_evt = idx_evt != -1 and (idx_pkt == -1 or idx_evt < idx_pkt)
+                    if is_evt:
+                        idx_pkt = idx_evt
                     idx_n = buffer.find(b'\n')
                     idx_r = buffer.find(b'\r')
 
@@ -131,10 +142,32 @@ class UartWorker(QObject):
                         if idx_pkt > 0:
                             buffer = buffer[idx_pkt:]  # отбрасываем мусор до PKT
 
-                        if len(buffer) >= 15:
+                        if is_evt:
+                            # Событие целиком: метаданные + окно, без текстовой строки
+                            try:
+                                parsed = Frame_Protocol.parse_evt(buffer)
+                            except (ValueError, struct.error):
+                                buffer = buffer[1:]
+                                continue
+                            if parsed is None:
+                                break  # Ждем данные
+
+                            event, data, total_size = parsed
+                            # Позиции сэмплов вместо np.repeat: данные остаются прореженными.
+                            # Отсчёт от начала события: сэмплы до срабатывания - слева от нуля
+                            x = Wave_Codec.sample_positions(len(data), event['compression'], event['minmax'])
+                            x = x + (event['offset'] - event['event_start'])
+
+                            self.sig_event_received.emit(event, data, x)
+                            buffer = buffer[total_size:]
+
+                        elif len(buffer) >= 15:
                             try:
-                                packet_num, offset, compression, length = struct.unpack('>IIHH', buffer[3:15])
-                                total_size = 15 + length * 4
+                                # offset со знаком: < 0 - окно начинается в предыдущем пакете
+                                packet_num, offset, compression, length = Frame_Protocol.PKT_HEADER.unpack_from(buffer, 3)
+                                # compression: старший байт - кодек, младший - шаг прореживания (+ флаг min/max)
+                                codec, step, minmax = Wave_Codec.unpack_compression(compression)
+                                total_size = 15 + Wave_Codec.payload_size(compression, length)
 
                                 # Защита от мусора (как в Tkinter)
                                 if total_size <= 15 or total_size > 200000:
@@ -143,15 +176,15 @@ class UartWorker(QObject):
 
                                 if len(buffer) >= total_size:
                                     # Полный пакет собран
-                                    data_bytes = buffer[15:total_size]
-                                    data_compressed = np.frombuffer(data_bytes, dtype=np.int32)
-
-                                    if compression > 1:
-                                        data = np.repeat(data_compressed, compression)
-                                    else:
-                                        data = data_compressed
+                                    data_bytes = bytes(buffer[15:total_size])
+                                    try:
+                                        data = Wave_Codec.decode(codec, data_bytes)
+                                    except Exception:
+                                        buffer = buffer[1:]
+                                        continue
 
-                                    self.sig_packet_received.emit(packet_num, data, offset)
+                                    x = Wave_Codec.sample_positions(len(data), step, minmax)
+                                    self.sig_packet_received.emit(packet_num, data, x, offset)
                                     buffer = buffer[total_size:]
                                 else:
                                     break  # Ждем данные
@@ -180,8 +213,11 @@ class UartWorker(QObject):
                                     alnum_count = sum(c.isalnum() for c in line_str)
                                     if alnum_count < len(line_str) * 0.3: continue
 
+                                reply = Frame_Protocol.parse_reply(line_str)
+                                if reply is not None:
+                                    self.sig_reply_received.emit(reply)
                                 # Проверка на THRESHOLD=...
-                                if line_str.startswith('THRESHOLD='):
+                                elif line_str.startswith('THRESHOLD='):
                                     try:
                                         val = int(line_str.split('=')[1])
                                         self.sig_threshold_update.emit(val)
@@ -214,6 +250,7 @@ class MainWindow(QMainWindow):
         self.resize(1600, 800)
 
         # Данные
+        self.remote_params = {}  # последние значения параметров RPi (из ACK:GET / ACK:CFG)
         self.packets_storage = {}
         self.events_storage = {}
         self.pending_events = {}
@@ -331,6 +368,42 @@ class MainWindow(QMainWindow):
         grp_thr.setLayout(grp_thr_layout)
         right_layout.addWidget(grp_thr)
 
+        # Параметры RPi (CFG/GET/STAT)
+        grp_params = QGroupBox("Параметры RPi")
+        grp_params_layout = QVBoxLayout()
+        hbox_param = QHBoxLayout()
+        self.combo_param = QComboBox()
+        self.combo_param.addItems(REMOTE_PARAMS)
+        self.combo_param.currentTextChanged.connect(self.on_param_selected)
+        self.edit_param = QLineEdit()
+        hbox_param.addWidget(self.combo_param)
+        hbox_param.addWidget(self.edit_param)
+        grp_params_layout.addLayout(hbox_param)
+
+        btn_set_param = QPushButton("Установить")
+        btn_set_param.setStyleSheet("background-color: #90EE90;")
+        btn_set_param.clicked.connect(self.send_param_cmd)
+        grp_params_layout.addWidget(btn_set_param)
+
+        hbox_query = QHBoxLayout()
+        btn_get_params = QPushButton("Прочитать")
+        btn_get_params.clicked.connect(lambda: self.worker.send_command(
+            f"{Frame_Protocol.CMD_GET}:{Frame_Protocol.PARAM_ALL}\r\n"))
+        btn_get_stats = QPushButton("Счётчики")
+        btn_get_stats.clicked.connect(lambda: self.worker.send_command(f"{Frame_Protocol.CMD_STAT}:\r\n"))
+        hbox_query.addWidget(btn_get_params)
+        hbox_query.addWidget(btn_get_stats)
+        grp_params_layout.addLayout(hbox_query)
+
+        self.lbl_params = QLabel("—")
+        self.lbl_params.setWordWrap(True)
+        grp_params_layout.addWidget(self.lbl_params)
+        self.lbl_remote_stats = QLabel("")
+        self.lbl_remote_stats.setWordWrap(True)
+        grp_params_layout.addWidget(self.lbl_remote_stats)
+        grp_params.setLayout(grp_params_layout)
+        right_layout.addWidget(grp_params)
+
         # Кнопки
         self.btn_start = QPushButton("▶ НАЧАТЬ")
         self.btn_start.setStyleSheet("background-color: #90EE90; font-weight: bold; padding: 6px;")
@@ -395,8 +468,10 @@ class MainWindow(QMainWindow):
         # Подключаем сигналы
         try:
             self.worker.sig_packet_received.connect(self.on_packet_received)
+            self.worker.sig_event_received.connect(self.on_event_received)
             self.worker.sig_log_message.connect(self.on_log_message)
             self.worker.sig_threshold_update.connect(self.on_threshold_update_from_uart)
+            self.worker.sig_reply_received.connect(self.on_reply_received)
             self.worker.sig_status_update.connect(self.status_bar.showMessage)
             self.worker.sig_connection_error.connect(self.on_connection_error)
 
@@ -414,7 +489,9 @@ class MainWindow(QMainWindow):
         self.worker.stop()
         try:
             self.worker.sig_packet_received.disconnect()
+            self.worker.sig_event_received.disconnect()
             self.worker.sig_log_message.disconnect()
+            self.worker.sig_reply_received.disconnect()
         except:
             pass
 
@@ -430,15 +507,33 @@ class MainWindow(QMainWindow):
     # ------------------------------------------------------------------------
     # ЛОГИКА ДАННЫХ (1-в-1 с Tkinter версией)
     # ------------------------------------------------------------------------
-    def on_packet_received(self, packet_num, data, offset):
-        self.packets_storage[packet_num] = {'data': data, 'offset': offset}
+    def on_packet_received(self, packet_num, data, x, offset):
+        self.packets_storage[packet_num] = {'data': data, 'x': x, 'offset': offset}
         # Если были события, ждущие этот пакет
         if packet_num in self.pending_events:
             events_list = self.pending_events.pop(packet_num)
             for evt in events_list:
-                self.store_and_update_event(packet_num, evt['event_num'], data, evt['timestamp'], evt['tree_item'])
+                self.store_and_update_event(packet_num, evt['event_num'], data, evt['timestamp'], evt['tree_item'], x)
             self.status_bar.showMessage(f"Получен пакет #{packet_num}")
 
+    def on_event_received(self, event, data, x):
+        # EVT-пакет: всё нужное уже в нём, ждать текстовую строку не надо
+        pack_num = event['packet_num']
+        event_num = event['event_num']
+
+        item = QTreeWidgetItem(self.tree)
+        item.setText(0, event['time'])
+        item.setText(1, datetime.now().strftime('%H:%M:%S'))
+        item.setText(2, f"Pck #{pack_num} Event {event_num}/{event['total_events']} | "
+                        f"Loud={event['loud']:.4f}")
+        item.setText(3, self.combo_thr.currentText())
+        item.setData(0, Qt.ItemDataRole.UserRole, pack_num)
+        item.setData(1, Qt.ItemDataRole.UserRole, event_num)
+
+        self.store_and_update_event(pack_num, event_num, data, event['time'], item, x)
+        self.tree.scrollToBottom()
+        self.status_bar.showMessage(f"Получено событие #{pack_num}.{event_num}")
+
     def on_log_message(self, text):
         # Парсинг строки "Time | Time | Pack #... | ..."
         item = QTreeWidgetItem(self.tree)
@@ -481,8 +576,8 @@ class MainWindow(QMainWindow):
 
                 if pack_num in self.packets_storage:
                     # Пакет уже есть
-                    data = self.packets_storage[pack_num]['data']
-                    self.store_and_update_event(pack_num, event_num, data, time_rpi, item)
+                    packet = self.packets_storage[pack_num]
+                    self.store_and_update_event(pack_num, event_num, packet['data'], time_rpi, item, packet['x'])
                 else:
                     # Ждем пакет
                     if pack_num not in self.pending_events:
@@ -503,9 +598,9 @@ class MainWindow(QMainWindow):
 
         self.tree.scrollToBottom()
 
-    def store_and_update_event(self, pack_num, ev_num, data, ts, item):
+    def store_and_update_event(self, pack_num, ev_num, data, ts, item, x=None):
         key = (pack_num, ev_num)
-        self.events_storage[key] = {'data': data, 'ts': ts}
+        self.events_storage[key] = {'data': data, 'x': x, 'ts': ts}
 
         if item:
             item.setForeground(0, QBrush(QColor("black")))
@@ -538,14 +633,18 @@ class MainWindow(QMainWindow):
 
         key = (pack_num, event_num)
         if key in self.events_storage:
-            self.plot_event(self.events_storage[key]['data'])
+            self.plot_event(self.events_storage[key]['data'], self.events_storage[key]['x'])
             self.stats_label.setText(f"Pack #{pack_num}.{event_num}")
         elif pack_num in self.packets_storage:
-            self.plot_event(self.packets_storage[pack_num]['data'])
+            self.plot_event(self.packets_storage[pack_num]['data'], self.packets_storage[pack_num]['x'])
             self.stats_label.setText(f"Pack #{pack_num} (Raw)")
 
-    def plot_event(self, data):
-        self.plot_data_item.setData(data)
+    def plot_event(self, data, x=None):
+        # x - позиции прореженных сэмплов (в сэмплах окна)
+        if x is None:
+            self.plot_data_item.setData(data)
+        else:
+            self.plot_data_item.setData(x, data)
         self.plot_widget.enableAutoRange()
 
     # ------------------------------------------------------------------------
@@ -580,6 +679,40 @@ class MainWindow(QMainWindow):
         if 1 <= mult <= 20:
             self.combo_thr.setCurrentText(str(mult))
 
+    # ------------------------------------------------------------------------
+    # ПАРАМЕТРЫ RPi (CFG / GET / STAT)
+    # ------------------------------------------------------------------------
+    def on_param_selected(self, name):
+        self.edit_param.setText(self.remote_params.get(name, ""))
+
+    def send_param_cmd(self):
+        name = self.combo_param.currentText()
+        value = self.edit_param.text().strip()
+        if not value:
+            QMessageBox.warning(self, "Ошибка", "Введите значение параметра!")
+            return
+        self.worker.send_command(f"{Frame_Protocol.CMD_CFG}:{name}={value}\r\n")
+        self.status_bar.showMessage(f"Отправка: {name}={value}")
+
+    def on_reply_received(self, reply):
+        command = reply['command']
+        if not reply['ok']:
+            self.status_bar.showMessage(f"RPi отклонил {command}: {reply['message']}")
+            return
+
+        if command == Frame_Protocol.CMD_STAT:
+            self.lbl_remote_stats.setText("\n".join(f"{k}: {v}" for k, v in reply['values'].items()))
+            return
+
+        # CFG/GET - подтверждённые значения параметров
+        self.remote_params.update(reply['values'])
+        self.lbl_params.setText(" | ".join(f"{k}={v}" for k, v in self.remote_params.items()))
+        self.on_param_selected(self.combo_param.currentText())
+        if 'thr' in reply['values']:
+            self.on_threshold_update_from_uart(int(reply['values']['thr']))
+        if command == Frame_Protocol.CMD_CFG:
+            self.status_bar.showMessage(f"RPi подтвердил: {reply['values']}")
+
     def update_plot_threshold_lines(self):
         self.line_thr_pos.setValue(self.current_threshold)
         self.line_thr_neg.setValue(-self.current_threshold)
@@ -0,0 +1,282 @@
+"""
+Регрессионные проверки исправлений конвейера RPi (без железа: заглушки портов, pty, временные файлы).
+Проверки пользуются только публичным API и счётчиками (stats(), tx_stats(), ...).
+
+Запуск:
+    python Regression_Checks.py [имя_проверки ...]
+    (код выхода 1, если хоть одна проверка не прошла)
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+import serial
+
+import Frame_Protocol
+import Link_Scheduler
+import Log_Queue
+import Packet_Framer
+import Peak_Store
+import Stream_Detect
+import Uart_Ingest
+import Uart_Logic
+import Zigbee_Logic
+
+
+class FakeSerial:
+    """Порт-заглушка: read() отдаёт incoming, всё записанное - в written"""
+
+    def __init__(self, incoming=b""):
+        self.incoming = bytearray(incoming)
+        self.written = bytearray()
+        self.is_open = True
+
+    @property
+    def in_waiting(self):
+        return len(self.incoming)
+
+    def read(self, size=1):
+        data = bytes(self.incoming[:size])
+        del self.incoming[:size]
+        return data
+
+    def write(self, data):
+        self.written += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.is_open = False
+
+
+def check_rx_reply_without_reader():
+    """Команда GET без потока приёма (async_tx=False): ответ из обработчика не должен зависать на _rx_lock"""
+    zigbee = Zigbee_Logic.ZigbeeSerial(async_tx=False)
+    zigbee.ser = FakeSerial(b"GET:all\r\n")
+    reader = Uart_Logic.Serial_reader()
+    reader.register_zigbee_commands(zigbee)
+    thread = threading.Thread(target=zigbee.check_incoming_threshold, daemon=True)
+    thread.start()
+    thread.join(2.0)
+    if thread.is_alive():
+        return "check_incoming_threshold() hung while replying to GET:all"
+    if b"ACK:GET" not in zigbee.ser.written:
+        return f"no ACK:GET reply, wrote {bytes(zigbee.ser.written)!r}"
+    return None
+
+
+def check_scheduler_failed_sends():
+    """
+    Link_Scheduler: неудачный send_data - не "отправлено" и без задержки; событие без ушедших
+    кадров ждёт повтора, частично ушедшее и всё при flush - в dropped; история задержек ограничена
+    """
+
+    class Link:
+        baudrate = 9600
+        accept = 0  # сколько кадров ещё примет
+
+        def send_data(self, frame):
+            self.accept -= 1
+            return self.accept >= 0
+
+    link = Link()
+    scheduler = Link_Scheduler.LinkScheduler(link, lambda item, level: [b"x" * 10] * item)
+    for frames in (1, 1, 1):
+        scheduler.submit(frames, 0.5)
+    scheduler.dispatch()
+    stats = scheduler.stats()
+    if stats["failed"] != 1 or stats["pending"] != 3 or stats["dropped"] or stats["latency_samples"]:
+        return f"failed send not kept for retry: {stats}"
+
+    scheduler.dispatch(flush=True)
+    stats = scheduler.stats()
+    if stats["pending"] or stats["dropped"] != 3 or stats["sent_full"]:
+        return f"flush left events unaccounted: {stats}"
+
+    link.accept = 1
+    scheduler.submit(2, 0.5)
+    scheduler.dispatch()
+    stats = scheduler.stats()
+    if stats["pending"] or stats["dropped"] != 4 or stats["bytes_sent"] != 10:
+        return f"partly sent event retried or lost: {stats}"
+
+    link.accept = Link_Scheduler.LATENCY_HISTORY + 10
+    for _ in range(Link_Scheduler.LATENCY_HISTORY + 10):
+        scheduler.submit(1, 0.5)
+        scheduler.dispatch(flush=True)
+    stats = scheduler.stats()
+    if stats["latency_samples"] != Link_Scheduler.LATENCY_HISTORY:
+        return f"latency history grows: {stats['latency_samples']} entries"
+    return None
+
+
+def check_writer_stop():
+    """ZigbeeWriter: после drain_timeout поток завершается, остаток отбрасывается, порт закрыт после join"""
+
+    class SlowSerial(FakeSerial):
+        def write(self, data):
+            if not self.is_open:
+                raise OSError("write to a closed port")
+            time.sleep(0.02)
+            return super().write(data)
+
+    zigbee = Zigbee_Logic.ZigbeeSerial(baudrate=1000000)
+    zigbee.ser = SlowSerial()
+    zigbee.start_writer()
+    for _ in range(50):
+        zigbee.send_data(b"x" * 16)
+    if not zigbee.stop_writer(drain_timeout=0.1):
+        return "stop_writer() did not stop the writer"
+    zigbee.close_serial()
+    stats = zigbee.tx_stats()
+    if zigbee.writer_running() or stats["errors"] or not stats["dropped_on_stop"]:
+        return f"writer kept running after stop: running={zigbee.writer_running()} {stats}"
+    if stats["frames"] + stats["dropped_on_stop"] != 50:
+        return f"frames lost without being counted: {stats}"
+    return None
+
+
+def check_large_window_frame():
+    """Окно длиннее 13k сэмплов (win=20000, dec=1) с varint: пакет собирается и разбирается, length в пределе"""
+    rng = np.random.default_rng(13)
+    window = rng.integers(-2 ** 30, 2 ** 30, 20000 * 2 + 19200).astype(np.int64)
+    builder = Frame_Protocol.ZigbeeFrameBuilder()
+    try:
+        pkt = bytes(builder.build_pkt(window, 1, 0, 1, "varint"))
+        evt = bytes(builder.build_evt(window, 0, 1, 1, 1, 2 ** 30, 20000, 39200, 0, 1, "varint"))
+    except Exception as e:
+        return f"large window frame failed: {e!r}"
+    prefix = len(Frame_Protocol.FRAME_PREFIX)
+    length = Frame_Protocol.PKT_HEADER.unpack_from(pkt, prefix + len(Frame_Protocol.PKT_MAGIC))[3]
+    if length > Frame_Protocol.MAX_FRAME_SAMPLES:
+        return f"PKT length {length} over MAX_FRAME_SAMPLES"
+    try:
+        event, samples, size = Frame_Protocol.parse_evt(evt, prefix)
+    except ValueError as e:
+        return f"EVT frame rejected by parser: {e}"
+    if size != len(evt) - prefix or not event["minmax"] or len(samples) == 0:
+        return f"EVT frame not decimated: size={size}/{len(evt) - prefix} {event}"
+    return None
+
+
+def check_negative_window_offset():
+    """Окно со сэмплами до срабатывания из предыдущего пакета: отрицательное смещение доходит до приёмника"""
+    window = np.arange(600, dtype=np.int64)
+    builder = Frame_Protocol.ZigbeeFrameBuilder()
+    prefix = len(Frame_Protocol.FRAME_PREFIX)
+    pkt = bytes(builder.build_pkt(window, 7, -300, 1))
+    offset = Frame_Protocol.PKT_HEADER.unpack_from(pkt, prefix + len(Frame_Protocol.PKT_MAGIC))[1]
+    if offset != -300:
+        return f"PKT offset {offset}, expected -300"
+    evt = bytes(builder.build_evt(window, 0, 7, 1, 1, 599, -20, 100, -300, 1))
+    event, _, _ = Frame_Protocol.parse_evt(evt, prefix)
+    if (event["event_start"], event["event_end"], event["offset"]) != (-20, 100, -300):
+        return f"EVT offsets lost their sign: {event}"
+    return None
+
+
+def check_stream_window_context():
+    """Потоковый детектор: событие у конца пакета (min_gap < window) отдаётся с полным окном справа"""
+    detector = Stream_Detect.StreamingPeakDetector(100, min_gap_between_events=100, window=300)
+    packet = np.zeros(1000, dtype=np.int64)
+    packet[880:891] = 1000
+    early = detector.process(packet, 1)
+    late = detector.process(np.zeros(1000, dtype=np.int64), 2)
+    if early or len(late) != 1:
+        return f"event emitted before its right context: first packet {len(early)}, second {len(late)}"
+    if len(late[0]["window"]) != 300 + 11 + 300:
+        return f"event window cut to {len(late[0]['window'])} samples"
+
+    packet = np.zeros(1000, dtype=np.int64)
+    packet[900:] = 1000
+    detector.reset()
+    flushed = detector.process(packet, 1) + detector.flush()
+    if len(flushed) != 1 or flushed[0]["end"] != 999:
+        return f"flush() lost the waiting event: {flushed}"
+    return None
+
+
+def check_peak_store_clock_step():
+    """Peak_Store: шаг часов назад (NTP) не ломает поиск по разреженному индексу времени"""
+    record = {"time": "12:00:00.00", "packet_num": 1, "event_num": 1, "total_events_in_packet": 1,
+              "event_start_idx": 0, "event_end_idx": 10, "duration": 11, "max_value": 1.0}
+    real_time = time.time
+    with tempfile.TemporaryDirectory() as tmp:
+        store = Peak_Store.PeakStore(capacity=16, path=os.path.join(tmp, "peaks.bin"))
+        try:
+            for _ in range(Peak_Store.INDEX_EVERY * 2):
+                store.append(record)
+            time.time = lambda: real_time() - 3600
+            for _ in range(Peak_Store.INDEX_EVERY * 2):
+                store.append(record)
+        finally:
+            time.time = real_time
+        found = len(store.between(real_time() - 60, real_time() + 1))
+        store.close()
+    if found != Peak_Store.INDEX_EVERY * 4:
+        return f"{found} of {Peak_Store.INDEX_EVERY * 4} records found after a clock step back"
+    return None
+
+
+def check_select_ingest_hangup():
+    """SelectIngest: обрыв порта (закрыт master pty) - PortClosedError, а не пустые пробуждения без сна"""
+    master, slave = os.openpty()
+    ser = serial.Serial(os.ttyname(slave), 256000, timeout=0)
+    ingest = Uart_Ingest.make_ingest("select", ser, Packet_Framer.PacketFramer(), 256000)
+    os.write(master, b"x" * 16)
+    os.close(master)
+    error = None
+    try:
+        for _ in range(5):
+            ingest.read_once()
+    except Uart_Ingest.PortClosedError:
+        pass
+    else:
+        error = f"hang-up treated as idle: {ingest.stats.summary()}"
+    finally:
+        ser.close()
+        os.close(slave)
+    return error
+
+
+CHECKS = (
+    check_rx_reply_without_reader,
+    check_scheduler_failed_sends,
+    check_writer_stop,
+    check_large_window_frame,
+    check_negative_window_offset,
+    check_stream_window_context,
+    check_peak_store_clock_step,
+    check_select_ingest_hangup,
+)
+
+
+def run_checks(names=None):
+    """Проверки (все или только names): {имя: None или текст ошибки}"""
+    unknown = set(names or ()) - {check.__name__ for check in CHECKS}
+    if unknown:
+        raise SystemExit(f"[ERROR] Unknown check(s): {', '.join(sorted(unknown))}")
+    return {check.__name__: check() for check in CHECKS if not names or check.__name__ in names}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pi-side regression checks")
+    parser.add_argument("names", nargs="*", help="checks to run (all by default)")
+    args = parser.parse_args()
+
+    Log_Queue.setup("warning")
+    failures = 0
+    for name, error in run_checks(args.names).items():
+        print(f"[{'FAIL' if error else ' OK '}] {name}" + (f": {error}" if error else ""))
+        failures += error is not None
+    if failures:
+        raise SystemExit(f"[ERROR] {failures} check(s) failed")
+
+
+if __name__ == "__main__":
+    main()
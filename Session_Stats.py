@@ -0,0 +1,135 @@
+import math
+import time
+
+import numpy as np
+
+# ============================================================================
+# ПОТОКОВАЯ СТАТИСТИКА СЕССИИ: обновляется на каждом событии, память и время
+# запроса не зависят от длины сессии
+# ============================================================================
+QUANTILE_ACCURACY = 0.01  # относительная ошибка квантилей (1%)
+QUANTILE_MAX_VALUE = 2 ** 32  # больше не бывает: полная шкала АЦП
+RATE_WINDOW_S = 60
+
+
+class RunningStats:
+    """Среднее и дисперсия по Уэлфорду + min/max"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        value = float(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def variance(self):
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def std(self):
+        return math.sqrt(self.variance())
+
+
+class QuantileSketch:
+    """
+    Квантили по логарифмической гистограмме (как DDSketch): корзина i - значения
+    в (gamma^(i-1), gamma^i], ответ с относительной ошибкой relative_accuracy.
+    Фиксированная память: ~1100 корзин на диапазон 1..2^32 при 1%.
+    Значения < 1 (и отрицательные) - в отдельной корзине "0".
+    """
+
+    def __init__(self, relative_accuracy=QUANTILE_ACCURACY, max_value=QUANTILE_MAX_VALUE):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self._counts = np.zeros(int(math.ceil(math.log(max_value) / self._log_gamma)) + 1, dtype=np.int64)
+        self._zero = 0
+        self.count = 0
+
+    def add(self, value):
+        self.count += 1
+        if value < 1:
+            self._zero += 1
+            return
+        index = int(math.ceil(math.log(value) / self._log_gamma))
+        self._counts[min(index, len(self._counts) - 1)] += 1
+
+    def quantile(self, q):
+        """Значение квантиля q (0..1) или None, если данных нет"""
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        if rank < self._zero:
+            return 0.0
+        index = int(np.searchsorted(np.cumsum(self._counts), rank - self._zero, side="right"))
+        # Середина корзины (в смысле относительной ошибки)
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+
+class RateCounter:
+    """События в минуту: за всю сессию и за последние RATE_WINDOW_S секунд (корзины по секунде)"""
+
+    def __init__(self, window_s=RATE_WINDOW_S):
+        self.window_s = window_s
+        self._counts = np.zeros(window_s, dtype=np.int64)
+        self._seconds = np.full(window_s, -1, dtype=np.int64)
+        self.started = time.monotonic()
+        self.count = 0
+
+    def add(self, now=None):
+        second = int(time.monotonic() if now is None else now)
+        slot = second % self.window_s
+        if self._seconds[slot] != second:
+            self._seconds[slot] = second
+            self._counts[slot] = 0
+        self._counts[slot] += 1
+        self.count += 1
+
+    def per_minute(self, now=None):
+        """(событий/мин за сессию, событий/мин за последнее окно)"""
+        now = time.monotonic() if now is None else now
+        elapsed = max(1e-9, now - self.started)
+        recent = self._counts[int(now) - self._seconds < self.window_s].sum()
+        window = min(self.window_s, elapsed)
+        return self.count * 60.0 / elapsed, float(recent) * 60.0 / window
+
+
+class SessionStats:
+    """Громкость (max_value) и длительность событий сессии: Уэлфорд, p50/p95/p99, события/мин"""
+
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self):
+        self.loudness = RunningStats()
+        self.duration = RunningStats()
+        self.loudness_sketch = QuantileSketch()
+        self.duration_sketch = QuantileSketch()
+        self.rate = RateCounter()
+
+    def add(self, max_value, duration, now=None):
+        self.loudness.add(max_value)
+        self.duration.add(duration)
+        self.loudness_sketch.add(max_value)
+        self.duration_sketch.add(duration)
+        self.rate.add(now)
+
+    def summary(self):
+        """dict для Printer/меню: count, <name>_{min,max,mean,std,p50,p95,p99}, per_min, per_min_recent"""
+        out = {"count": self.loudness.count}
+        for name, running, sketch in (("loud", self.loudness, self.loudness_sketch),
+                                      ("duration", self.duration, self.duration_sketch)):
+            out[f"{name}_min"] = running.min
+            out[f"{name}_max"] = running.max
+            out[f"{name}_mean"] = running.mean if running.count else None
+            out[f"{name}_std"] = running.std()
+            for q in self.QUANTILES:
+                out[f"{name}_p{int(q * 100)}"] = sketch.quantile(q)
+        out["per_min"], out["per_min_recent"] = self.rate.per_minute()
+        return out
@@ -0,0 +1,163 @@
+import numpy as np
+from collections import deque
+
+
+class StreamingPeakDetector:
+    """
+    Потоковый детектор событий: состояние сохраняется между пакетами.
+
+    - Открытое событие (ещё может продолжиться в следующем пакете) не отдаётся,
+      пока после его конца не прошло min_gap_between_events сэмплов без превышения порога.
+    - Звук на границе пакетов отдаётся ОДИН раз, с глобальными индексами сэмплов.
+    - Хвост предыдущих сэмплов хранится, чтобы окно window слева/справа
+      от события собиралось и через границу пакета.
+    - Закрытое событие ждёт, пока придут window сэмплов после его конца
+      (закрытие по max_event_samples, min_gap < window): окно справа не обрезается.
+      В конце сессии flush() отдаёт ждущие события с тем, что есть.
+    """
+
+    def __init__(self, peak_threshold, min_gap_between_events=1000, window=300,
+                 max_event_samples=4800 * 4):
+        self.peak_threshold = peak_threshold
+        self.min_gap_between_events = min_gap_between_events
+        self.window = window
+        self.max_event_samples = max_event_samples
+        self.reset()
+
+    def reset(self):
+        self._pos = 0  # глобальный индекс первого сэмпла следующего пакета
+        self._open = None  # [start, end, max_abs] открытого события (глобальные индексы)
+        self._closed = deque()  # (start, end, max_abs) закрытых, ждущих окна справа
+        self._history = np.empty(0, dtype=np.int64)
+        self._history_start = 0  # глобальный индекс self._history[0]
+        self._packets = deque()  # (глобальный индекс начала, номер пакета, timestamp)
+
+        self.events_emitted = 0
+        self.events_merged = 0  # сколько раз событие продолжилось в следующем пакете
+        self.events_forced = 0  # закрыто по max_event_samples
+
+    # ------------------------------------------------------------------
+    def _packet_of(self, global_idx):
+        """(номер пакета, индекс внутри пакета, timestamp) для глобального индекса"""
+        for start, packet_num, timestamp in reversed(self._packets):
+            if global_idx >= start:
+                return packet_num, global_idx - start, timestamp
+        start, packet_num, timestamp = self._packets[0]
+        return packet_num, global_idx - start, timestamp
+
+    def _emit(self, start, end, max_abs):
+        w_start = max(self._history_start, start - self.window)
+        w_end = min(self._history_start + len(self._history), end + self.window + 1)
+        packet_num, start_in_packet, timestamp = self._packet_of(start)
+        self.events_emitted += 1
+        return {
+            "start": start,
+            "end": end,
+            "max_abs": float(max_abs),
+            "packet_num": packet_num,
+            "start_in_packet": start_in_packet,
+            "timestamp": timestamp,
+            "window_start": w_start,
+            # Копия: история будет обрезана на следующем пакете
+            "window": self._history[w_start - self._history_start:w_end - self._history_start].copy(),
+        }
+
+    def process(self, packet, packet_num=None, timestamp=None, peak_threshold=None):
+        """
+        Обработка очередного пакета.
+
+        Returns:
+            список закрытых событий (dict): start/end (глобальные), max_abs, packet_num и
+            start_in_packet пакета начала, window (сэмплы с окном) и window_start (глобальный)
+        """
+        if peak_threshold is not None:
+            self.peak_threshold = peak_threshold
+
+        gap = self.min_gap_between_events
+        base = self._pos
+        n = len(packet)
+
+        self._packets.append((base, packet_num, timestamp))
+        self._history = np.concatenate((self._history, packet))
+
+        abs_data = np.abs(packet)
+        idx = np.flatnonzero(abs_data > self.peak_threshold)
+
+        closed = []
+        if idx.size > 0:
+            # Группы превышений: новая группа, если разрыв >= min_gap
+            breaks = np.flatnonzero(np.diff(idx) >= gap)
+            first = np.concatenate(([0], breaks + 1))
+            last = np.concatenate((breaks, [idx.size - 1]))
+            starts = idx[first] + base
+            ends = idx[last] + base
+            maxes = np.maximum.reduceat(abs_data[idx], first)
+
+            for start, end, max_abs in zip(starts.tolist(), ends.tolist(), maxes.tolist()):
+                if self._open is not None and start - self._open[1] < gap:
+                    # Продолжение открытого события (в т.ч. из прошлого пакета)
+                    if self._open[1] < base:
+                        self.events_merged += 1
+                    self._open[1] = end
+                    self._open[2] = max(self._open[2], max_abs)
+                else:
+                    if self._open is not None:
+                        closed.append(tuple(self._open))
+                    self._open = [start, end, max_abs]
+
+        packet_end = base + n - 1
+        if self._open is not None:
+            # Дальше сэмплов ближе min_gap к концу события уже не будет -> закрываем
+            if packet_end + 1 - self._open[1] >= gap:
+                closed.append(tuple(self._open))
+                self._open = None
+            elif self._open[1] - self._open[0] + 1 >= self.max_event_samples:
+                self.events_forced += 1
+                closed.append(tuple(self._open))
+                self._open = None
+
+        self._closed.extend(closed)
+        self._pos = base + n
+
+        # Отдаём события, для которых окно справа уже в истории
+        events = []
+        while self._closed and self._closed[0][1] + self.window < self._pos:
+            events.append(self._emit(*self._closed.popleft()))
+
+        self._trim_history()
+        return events
+
+    def flush(self):
+        """Отдать ждущие события и закрыть открытое (конец сессии): окно справа - сколько есть"""
+        if self._open is not None:
+            self._closed.append(tuple(self._open))
+            self._open = None
+        events = [self._emit(start, end, max_abs) for start, end, max_abs in self._closed]
+        self._closed.clear()
+        return events
+
+    def _trim_history(self):
+        # Нужны сэмплы для окна слева от ждущего/открытого события или от будущего события
+        keep_from = self._pos - self.window
+        if self._closed:
+            keep_from = min(keep_from, self._closed[0][0] - self.window)
+        if self._open is not None:
+            keep_from = min(keep_from, self._open[0] - self.window)
+
+        drop = keep_from - self._history_start
+        if drop > 0:
+            self._history = self._history[drop:]
+            self._history_start += drop
+
+        while len(self._packets) > 1 and self._packets[1][0] <= keep_from:
+            self._packets.popleft()
+
+    def stats(self):
+        return {
+            "events_emitted": self.events_emitted,
+            "events_merged": self.events_merged,
+            "events_forced": self.events_forced,
+            "open_event": self._open is not None,
+            "events_waiting": len(self._closed),
+            "history_samples": len(self._history),
+        }
@@ -0,0 +1,237 @@
+import os
+import select
+import time
+from collections import deque
+
+# 8N1: старт-бит + 8 бит данных + стоп-бит
+BITS_PER_BYTE = 10
+
+
+class PortClosedError(OSError):
+    """Порт закрыт на той стороне: дескриптор готов к чтению (POLLHUP/POLLERR, EOF), а данных нет"""
+
+
+class IngestStats:
+    """
+    Статистика чтения UART (замеры, не оценки):
+    - доля времени, которую поток провёл в ожидании данных, и CPU на это ожидание;
+    - время от пробуждения (вернулся poll()/select(), in_waiting > 0) до байт в буфере фреймера.
+
+    Сколько байты пролежали в UART до пробуждения, на стороне приёма не измерить
+    (нет метки времени прихода) - это меряет Benchmarks.py ingest через pty.
+    backlog - объём одного чтения в пересчёте на время линии (n * BITS_PER_BYTE / baud):
+    верхняя граница ожидания первого байта, не задержка.
+    """
+
+    def __init__(self, mode, baud_rate, window=4096):
+        self.mode = mode
+        self.baud_rate = baud_rate
+        self.read_times = deque(maxlen=window)
+        self.read_sizes = deque(maxlen=window)
+        self.reset()
+
+    def reset(self):
+        self.wakeups = 0
+        self.empty_wakeups = 0
+        self.reads = 0
+        self.bytes = 0
+        self.idle_wall = 0.0
+        self.idle_cpu = 0.0
+        self.last_read_s = 0.0
+        self.started = time.perf_counter()
+        self.read_times.clear()
+        self.read_sizes.clear()
+
+    def on_idle(self, wall, cpu):
+        """Пробуждение без данных (таймаут / пустой опрос)"""
+        self.wakeups += 1
+        self.empty_wakeups += 1
+        self.idle_wall += wall
+        self.idle_cpu += cpu
+
+    def on_data(self, n, wait_wall, wait_cpu, read_wall):
+        """Пробуждение с данными: n байт прочитано, read_wall - от пробуждения до байт во фреймере"""
+        self.wakeups += 1
+        self.reads += 1
+        self.bytes += n
+        self.idle_wall += wait_wall
+        self.idle_cpu += wait_cpu
+        self.last_read_s = read_wall
+        self.read_times.append(read_wall)
+        self.read_sizes.append(n)
+
+    @staticmethod
+    def _spread(values):
+        """(среднее, p99, максимум)"""
+        ordered = sorted(values)
+        if not ordered:
+            return 0.0, 0.0, 0.0
+        return (sum(ordered) / len(ordered), ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+                ordered[-1])
+
+    def summary(self):
+        """Сводка (dict)"""
+        elapsed = time.perf_counter() - self.started
+        read_mean, read_p99, read_max = self._spread(self.read_times)
+        size_mean, _, size_max = self._spread(self.read_sizes)
+        line_ms = BITS_PER_BYTE / self.baud_rate * 1000
+
+        return {
+            "mode": self.mode,
+            "wakeups": self.wakeups,
+            "empty_wakeups": self.empty_wakeups,
+            "reads": self.reads,
+            "bytes": self.bytes,
+            "blocked_pct": 100.0 * self.idle_wall / elapsed if elapsed > 0 else 0.0,
+            "idle_cpu_pct": 100.0 * self.idle_cpu / self.idle_wall if self.idle_wall > 0 else 0.0,
+            "read_ms_mean": read_mean * 1000,
+            "read_ms_p99": read_p99 * 1000,
+            "read_ms_max": read_max * 1000,
+            "bytes_per_read_mean": size_mean,
+            "backlog_ms_mean": size_mean * line_ms,
+            "backlog_ms_max": size_max * line_ms,
+        }
+
+    def format(self):
+        s = self.summary()
+        return (f"[{s['mode']}] wakeups={s['wakeups']} (empty {s['empty_wakeups']}) | "
+                f"bytes={s['bytes']} | blocked={s['blocked_pct']:.1f}% idle CPU={s['idle_cpu_pct']:.1f}% | "
+                f"wakeup->framer mean={s['read_ms_mean']:.3f} ms p99={s['read_ms_p99']:.3f} ms | "
+                f"backlog mean={s['backlog_ms_mean']:.2f} ms max={s['backlog_ms_max']:.2f} ms")
+
+
+class PollingIngest:
+    """
+    Старый режим: опрос in_waiting, при пустом порте sleep 2 мс.
+    """
+    mode = "poll"
+
+    def __init__(self, ser, framer, baud_rate, idle_sleep=0.002):
+        self.ser = ser
+        self.framer = framer
+        self.idle_sleep = idle_sleep
+        self.stats = IngestStats(self.mode, baud_rate)
+
+    def read_once(self):
+        """Одна итерация чтения. Возвращает кол-во прочитанных байт."""
+        t0 = time.perf_counter()
+        c0 = time.thread_time()
+
+        n = self.ser.in_waiting
+        if n == 0:
+            # Если данных нет, спим чуть-чуть, чтобы не грузить ЦП
+            time.sleep(self.idle_sleep)
+            self.stats.on_idle(time.perf_counter() - t0, time.thread_time() - c0)
+            return 0
+
+        t_wake = time.perf_counter()
+        wait_wall = t_wake - t0
+        wait_cpu = time.thread_time() - c0
+        data = self.ser.read(n)
+        self.framer.feed(data)
+        self.stats.on_data(len(data), wait_wall, wait_cpu, time.perf_counter() - t_wake)
+        return len(data)
+
+
+class SelectIngest:
+    """
+    Событийный режим: поток спит в poll()/select() на дескрипторе порта
+    и просыпается, когда пришли байты (или по таймауту).
+    Данные читаются readinto-способом прямо в буфер PacketFramer.
+    """
+    mode = "select"
+
+    def __init__(self, ser, framer, baud_rate, timeout=0.1, chunk=8192):
+        self.ser = ser
+        self.framer = framer
+        self.timeout = timeout
+        self.chunk = chunk
+        self.stats = IngestStats(self.mode, baud_rate)
+
+        self.fd = None
+        try:
+            self.fd = ser.fileno()
+        except Exception:
+            self.fd = None  # Не POSIX-порт или заглушка без дескриптора
+
+        self._poller = None
+        if self.fd is not None and hasattr(select, "poll"):
+            self._poller = select.poll()
+            self._poller.register(self.fd, select.POLLIN | select.POLLPRI)
+
+    def _wait_readable(self):
+        if self._poller is not None:
+            events = self._poller.poll(self.timeout * 1000)
+            if events and events[0][1] & select.POLLNVAL:
+                raise PortClosedError(f"UART fd {self.fd}: descriptor is closed (POLLNVAL)")
+            # POLLHUP/POLLERR без POLLIN - тоже "готов": read() вернёт EOF или ошибку
+            return bool(events)
+        if self.fd is not None:
+            return bool(select.select([self.fd], [], [], self.timeout)[0])
+        if hasattr(self.ser, "wait_readable"):
+            return self.ser.wait_readable(self.timeout)
+
+        # Последний вариант: нет ни дескриптора, ни ожидания -> опрос
+        if self.ser.in_waiting > 0:
+            return True
+        time.sleep(0.002)
+        return self.ser.in_waiting > 0
+
+    def _readinto(self, view):
+        if self.fd is not None:
+            try:
+                n = os.readv(self.fd, [view])
+            except BlockingIOError:
+                return 0  # ложное пробуждение
+            if n == 0:
+                # poll()/select() вернули готовность, read() - EOF: без этого цикл крутился бы
+                # на 100% CPU, принимая обрыв за пустое пробуждение
+                raise PortClosedError(f"UART fd {self.fd}: readable but no data (hang-up / EOF)")
+            return n
+
+        n = min(self.ser.in_waiting, len(view))
+        if n == 0:
+            return 0
+        data = self.ser.read(n)
+        view[:len(data)] = data
+        return len(data)
+
+    def read_once(self):
+        """Одна итерация чтения. Возвращает кол-во прочитанных байт."""
+        t0 = time.perf_counter()
+        c0 = time.thread_time()
+
+        if not self._wait_readable():
+            self.stats.on_idle(time.perf_counter() - t0, time.thread_time() - c0)
+            return 0
+
+        t_wake = time.perf_counter()
+        wait_wall = t_wake - t0
+        wait_cpu = time.thread_time() - c0
+
+        view = self.framer.write_view(self.chunk)
+        try:
+            n = self._readinto(view)
+        finally:
+            view.release()
+
+        if n == 0:
+            self.stats.on_idle(time.perf_counter() - t0, time.thread_time() - c0)
+            return 0
+
+        self.framer.commit(n)
+        self.stats.on_data(n, wait_wall, wait_cpu, time.perf_counter() - t_wake)
+        return n
+
+
+READ_MODES = {
+    PollingIngest.mode: PollingIngest,
+    SelectIngest.mode: SelectIngest,
+}
+
+
+def make_ingest(mode, ser, framer, baud_rate):
+    """Создаёт читатель UART по имени режима ('poll' или 'select')"""
+    if mode not in READ_MODES:
+        raise ValueError(f"Unknown read mode: {mode!r} (expected one of {sorted(READ_MODES)})")
+    return READ_MODES[mode](ser, framer, baud_rate)
@@ -4,14 +4,78 @@ import select
 import time
 import numpy as np
 import ByInConvert
-from collections import deque
+import Dc_Blocker
+import Packet_Framer
+import Uart_Ingest
+import Pipeline_Logic
+import Detect_Pool
+import Stream_Detect
+import Frame_Protocol
+import Wave_Codec
+import Link_Scheduler
+import Packet_Info
+import Packet_Ring
+import Metrics
+import Log_Queue
 from datetime import datetime
 
+log = Log_Queue.get_logger("UART")
+
 # ============================================================================
 # ДИНАМИЧЕСКИЙ ПОРОГ (обновляется по Zigbee)
 # ============================================================================
 PEAK_THRESHOLD_FROM_PC = 150000000
 
+# ============================================================================
+# ОЧЕРЕДИ КОНВЕЙЕРА приём -> детекция -> передача: (размер, политика переполнения)
+# ============================================================================
+PIPELINE_QUEUES = {
+    "packets": (32, Pipeline_Logic.POLICY_DROP_OLDEST),
+    "events": (16, Pipeline_Logic.POLICY_DROP_OLDEST),
+}
+
+# ============================================================================
+# ПЕРЕДАЧА СОБЫТИЯ ПО ZIGBEE
+# ============================================================================
+FRAME_PKT = "pkt"  # PKT-пакет + текстовая строка (старые приёмники)
+FRAME_EVT = "evt"  # один EVT-пакет с метаданными
+FRAME_FORMATS = (FRAME_PKT, FRAME_EVT)
+
+EVENT_WINDOW = 300     # сэмплов слева и справа от события
+EVENT_COMPRESSION = 4  # шаг прореживания окна
+# Грубая передача при перегрузке линка (Link_Scheduler.LEVEL_COARSE)
+COARSE_COMPRESSION = 16
+COARSE_CODEC = Wave_Codec.CODEC_INT16
+COARSE_BUDGET_DIVISOR = 4  # при frame_budget: грубый пакет в 4 раза меньше
+# Событие должно дойти до ПК за столько секунд, иначе передаётся грубее
+LINK_DEADLINE_S = 5.0
+
+# Минимальная пауза между событиями (сэмплов): ближе - одно событие
+MIN_GAP_BETWEEN_EVENTS = 1000
+
+# Удаление смещения АЦП: "first" - вычесть первый сэмпл пакета (выброс в нём сдвигает весь пакет),
+# "ema" - Dc_Blocker (оценка по медианам пакетов, состояние между пакетами)
+DC_FILTER_FIRST = "first"
+DC_FILTER_EMA = "ema"
+DC_FILTERS = (DC_FILTER_FIRST, DC_FILTER_EMA)
+
+# Окно у края пакета добирается из соседних пакетов (история main_ring_que);
+# следующий пакет ждём не дольше (пакет АЦП приходит раз в ~0.2 с)
+WINDOW_WAIT_S = 0.3
+
+# ============================================================================
+# ПАРАМЕТРЫ, МЕНЯЕМЫЕ С ПК ПО ZIGBEE (CFG:name=value / GET:name, см. Frame_Protocol)
+# name -> (атрибут Serial_reader, min, max); codec - имя кодека, budget=0 - без бюджета
+# ============================================================================
+RUNTIME_PARAMS = {
+    "thr": ("peak_threshold", 1, 2 ** 31 - 1),
+    "gap": ("min_gap_between_events", 0, 1000000),
+    "win": ("event_window_samples", 1, 20000),
+    "dec": ("event_compression", 1, Wave_Codec.MAX_STEP),
+    "budget": ("frame_budget", 0, 65535),
+    "codec": ("codec", None, None),
+}
+
 
 # ════════════════════════════════════════════════════════════════════════════════
 # ВАЛИДАЦИЯ ПАКЕТОВ (быстрая версия для RPi)
@@ -61,6 +125,159 @@ def is_packet_valid_lite(data):
     return False
 
 
+def is_packet_valid_np(data):
+    """
+    NumPy-версия is_packet_valid_lite: принимает ndarray (срез пакета) напрямую,
+    без tolist(). Решения те же, что у is_packet_valid_lite.
+    """
+    if len(data) == 0:
+        return False
+
+    abs_data = np.abs(data)
+    max_abs = int(abs_data.max())
+
+    # Проверка 1 и 2: слишком тихо (шум) / нереально громко (глюк АЦП)
+    if max_abs < 1000 or max_abs > 4000000000:
+        return False
+
+    # Проверка 3: хотя бы 2% точек громче 20% от максимума
+    return int(np.count_nonzero(abs_data > max_abs * 0.2)) > len(data) * 0.02
+
+
+def validate_windows(data, starts, ends, abs_data=None):
+    """
+    Пакетная валидация: все окна [starts[i], ends[i]) одного пакета за один вызов.
+    abs_data - уже посчитанный np.abs(data) (если есть).
+
+    Returns:
+        np.ndarray bool - те же решения, что is_packet_valid_lite для каждого окна
+    """
+    starts = np.asarray(starts, dtype=np.intp)
+    ends = np.asarray(ends, dtype=np.intp)
+    valid = np.zeros(len(starts), dtype=bool)
+    if len(starts) == 0:
+        return valid
+
+    if abs_data is None:
+        abs_data = np.abs(data)
+
+    # Максимумы всех окон одним reduceat (последний элемент - заглушка для ends == len)
+    padded = np.append(abs_data, 0)
+    bounds = np.empty(2 * len(starts), dtype=np.intp)
+    bounds[0::2] = starts
+    bounds[1::2] = ends
+    non_empty = ends > starts
+    maxima = np.maximum.reduceat(padded, np.minimum(bounds, len(abs_data)))[0::2]
+
+    candidates = non_empty & (maxima >= 1000) & (maxima <= 4000000000)
+    for i in np.flatnonzero(candidates):
+        window = abs_data[starts[i]:ends[i]]
+        valid[i] = int(np.count_nonzero(window > int(maxima[i]) * 0.2)) > len(window) * 0.02
+
+    return valid
+
+
+
+# ════════════════════════════════════════════════════════════════════════════════
+# ДЕТЕКЦИЯ СОБЫТИЙ (чистые функции: используются и в потоке, и в процессах Detect_Pool)
+# ════════════════════════════════════════════════════════════════════════════════
+def detect_peaks(data, peak_threshold, min_gap_between_events=1000):
+    """
+    Детектирование отдельных звуковых событий в пакете.
+    Returns: список (start, end) индексов внутри пакета.
+    """
+    abs_data = np.abs(data)
+    above_threshold = abs_data > peak_threshold
+
+    if not np.any(above_threshold):
+        return []
+
+    transitions = np.diff(above_threshold.astype(int))
+    event_starts = np.where(transitions == 1)[0]
+    event_ends = np.where(transitions == -1)[0]
+
+    if len(event_starts) == 0 and len(event_ends) == 0:
+        return [(0, len(data) - 1)]
+
+    if len(event_starts) > 0 and len(event_ends) == 0:
+        return [(int(event_starts[0]), len(data) - 1)]
+
+    if len(event_starts) == 0 and len(event_ends) > 0:
+        return [(0, int(event_ends[-1]))]
+
+    events = []
+    if len(event_starts) > 0 and len(event_ends) > 0:
+        if event_starts[0] < event_ends[0]:
+            for i, start in enumerate(event_starts):
+                start = int(start)
+                end = int(event_ends[i]) if i < len(event_ends) else len(data) - 1
+                events.append((start, end))
+        else:
+            events.append((0, int(event_ends[0])))
+            for i in range(1, len(event_starts)):
+                start = int(event_starts[i])
+                end = int(event_ends[i]) if i < len(event_ends) else len(data) - 1
+                events.append((start, end))
+
+    if len(events) <= 1:
+        return events
+
+    final_events = [events[0]]
+    for i in range(1, len(events)):
+        curr_start, curr_end = events[i]
+        last_start, last_end = final_events[-1]
+
+        if (curr_start - last_end) < min_gap_between_events:
+            final_events[-1] = (last_start, curr_end)
+        else:
+            final_events.append((curr_start, curr_end))
+
+    return final_events
+
+
+def analyze_packet(data, peak_threshold, min_gap_between_events=1000, window=300, metrics=None):
+    """
+    Детекция + валидация событий одного пакета.
+    metrics - Metrics.PipelineMetrics для задержек detect/validate (None - без замеров, как в пуле).
+
+    Returns:
+        (кол-во найденных событий, [(event_num, start, end, max_abs, valid), ...])
+    """
+    t0 = time.perf_counter()
+    events_list = detect_peaks(data, peak_threshold, min_gap_between_events)
+    if metrics is not None:
+        t1 = time.perf_counter()
+        metrics.observe("detect", t1 - t0)
+    if not events_list:
+        return 0, []
+
+    starts = np.array([start for start, _ in events_list], dtype=np.intp)
+    ends = np.array([end for _, end in events_list], dtype=np.intp)
+    abs_data = np.abs(data)
+
+    # ВАЛИДАЦИЯ (Lite) всех событий пакета одним вызовом
+    valid = validate_windows(
+        data,
+        np.maximum(0, starts - window),
+        np.minimum(len(data), ends + window),
+        abs_data=abs_data,
+    )
+    padded = np.append(abs_data, 0)
+    bounds = np.empty(2 * len(starts), dtype=np.intp)
+    bounds[0::2] = starts
+    bounds[1::2] = np.minimum(ends + 1, len(data))
+    event_max = np.maximum.reduceat(padded, bounds)[0::2]
+
+    results = []
+    for i, (event_start, event_end) in enumerate(zip(starts.tolist(), ends.tolist())):
+        if event_end < event_start:
+            continue
+        results.append((i + 1, event_start, event_end, float(event_max[i]), bool(valid[i])))
+
+    if metrics is not None:
+        metrics.observe("validate", time.perf_counter() - t1)
+    return len(events_list), results
+
 
 class Serial_reader:
     """
@@ -82,16 +299,86 @@ class Serial_reader:
             main_last_packet_peak_detected=False,
             main_ser=None,
             main_ring_que=None,
+            read_mode="poll",
+            staged=False,
+            pipeline_queues=None,
+            detect_workers=0,
+            detector="packet",
+            frame_format=FRAME_PKT,
+            codec=Wave_Codec.CODEC_RAW,
+            link_scheduler=False,
+            frame_budget=None,
+            history_packets=Packet_Ring.DEFAULT_DEPTH,
+            window_wait_s=WINDOW_WAIT_S,
+            metrics=None,
+            dc_filter=DC_FILTER_FIRST,
     ):
         self.baud_rate = baud_rate
         self.serial_port = serial_port
         self.main_ser = main_ser
-        self.main_ring_que = main_ring_que if main_ring_que is not None else deque(maxlen=10)
+        # История пакетов: кольцо (history_packets, сэмплы) int32, для pre-trigger окон и дампов
+        self.main_ring_que = main_ring_que if main_ring_que is not None else Packet_Ring.PacketRing(history_packets)
         self.main_total_packets = main_total_packets
-        self.main_packet_info = main_packet_info if main_packet_info is not None else []
+        # Метаданные пакетов: кольцо фиксированного размера (номер, время приёма, размер, события)
+        self.main_packet_info = main_packet_info if main_packet_info is not None else Packet_Info.PacketInfoRing()
         self.main_run_flag = main_runflag
         self.main_last_packet_peak_detected = main_last_packet_peak_detected
-        self.buffer = bytearray()
+        # Инкрементальный поиск пакетов START...END (без копирования хвоста буфера)
+        self.framer = Packet_Framer.PacketFramer(self.START_MARKER, self.END_MARKER)
+        # Режим чтения UART: "poll" (опрос in_waiting) или "select" (ожидание на дескрипторе)
+        self.read_mode = read_mode
+        self.ingest = None
+
+        # Конвейер: приём UART -> детекция -> передача по Zigbee (каждая стадия в своём потоке)
+        self.staged = staged
+        self.pipeline_queues = dict(PIPELINE_QUEUES)
+        if pipeline_queues:
+            self.pipeline_queues.update(pipeline_queues)
+        self.peak_threshold = PEAK_THRESHOLD_FROM_PC
+        self.packet_queue = None
+        self.event_queue = None
+        self.stages = []
+        # Детекция в пуле процессов (только в режиме конвейера, 0 - в потоке детекции)
+        self.detect_workers = detect_workers
+        self.detect_pool = None
+        # Детектор: "packet" - каждый пакет отдельно, "stream" - с состоянием между пакетами
+        self.detector = detector
+        self.stream_detector = None
+        # Переиспользуемый буфер PKT/EVT-пакетов для Zigbee
+        self.frame_builder = Frame_Protocol.ZigbeeFrameBuilder()
+        # Формат передачи события: "pkt" - PKT + текстовая строка, "evt" - один EVT-пакет
+        if frame_format not in FRAME_FORMATS:
+            raise ValueError(f"Unknown frame format: {frame_format!r} (expected one of {FRAME_FORMATS})")
+        self.frame_format = frame_format
+        # Кодек формы сигнала в PKT/EVT: "raw" (int32, старые приёмники), "varint", "int16", "zlib",
+        # "lzma" или "auto" (самый короткий без потерь)
+        self.codec = Wave_Codec.codec_id(codec)
+        # Планировщик линка: при перегрузке радио важные события первыми, остальные ужимаются/отбрасываются
+        self.link_scheduler = link_scheduler
+        # Бюджет байт на пакет события: шаг прореживания (min/max) подбирается под него,
+        # None - фиксированный EVENT_COMPRESSION
+        self.frame_budget = frame_budget
+        self.scheduler = None
+        # Порог с ПК: callback из потока приёма Zigbee вместо опроса порта в цикле UART
+        self.zigbee_rx_listener = False
+        # Параметры детекции и передачи (меняются с ПК командой CFG, см. RUNTIME_PARAMS)
+        self.min_gap_between_events = MIN_GAP_BETWEEN_EVENTS
+        self.event_window_samples = EVENT_WINDOW
+        self.event_compression = EVENT_COMPRESSION
+        self.zigbee_commands = False
+        self.events_transmitted = 0
+        # Сколько ждать следующий пакет для окна события у конца пакета (только в режиме конвейера:
+        # в одном потоке следующий пакет не придёт, пока мы ждём)
+        self.window_wait_s = window_wait_s
+        self.windows_extended = 0
+        # Задержки по стадиям и счётчики (меню, эндпоинт Metrics.MetricsServer)
+        self.metrics = metrics if metrics is not None else Metrics.PipelineMetrics()
+        # Удаление смещения: смещение пакетов помнится не меньше, чем пакетов в истории (окна из кольца)
+        if dc_filter not in DC_FILTERS:
+            raise ValueError(f"Unknown DC filter: {dc_filter!r} (expected one of {DC_FILTERS})")
+        self.dc_filter = dc_filter
+        self.dc_blocker = (Dc_Blocker.DcBlocker(history=max(Dc_Blocker.DEFAULT_HISTORY, history_packets))
+                           if dc_filter == DC_FILTER_EMA else None)
 
     def detect_multiple_peaks(self, data, peak_threshold=None, min_gap_between_events=1000):
         """
@@ -101,101 +388,665 @@ class Serial_reader:
         if peak_threshold is None:
             peak_threshold = PEAK_THRESHOLD_FROM_PC
 
-        abs_data = np.abs(data)
-        above_threshold = abs_data > peak_threshold
+        return detect_peaks(data, peak_threshold, min_gap_between_events)
 
-        if not np.any(above_threshold):
-            return []
+    def send_packet_via_zigbee(
+            self, zigbee_serial, packet_data, packet_num, event_start=None, event_end=None, offset_base=0
+    ):
+        """
+        packet_data - ndarray сэмплов пакета (или окна), без конвертации в list.
+        offset_base - индекс packet_data[0] внутри пакета packet_num
+        (для окна, собранного потоковым детектором, может быть отрицательным).
+        """
+        # ← БЕЗ проверки валидации (пакет уже валидирован раньше)
 
-        transitions = np.diff(above_threshold.astype(int))
-        event_starts = np.where(transitions == 1)[0]
-        event_ends = np.where(transitions == -1)[0]
+        if event_start is None or event_end is None:
+            return False
 
-        if len(event_starts) == 0 and len(event_ends) == 0:
-            return [(0, len(data) - 1)]
+        data_start, window_data = self.event_window(packet_data, event_start, event_end, self.event_window_samples)
+        if len(window_data) == 0:
+            return False
 
-        if len(event_starts) > 0 and len(event_ends) == 0:
-            return [(int(event_starts[0]), len(data) - 1)]
+        try:
+            # \r + заголовок + сэмплы в одном переиспользуемом буфере
+            frame = self.frame_builder.build_pkt(
+                window_data, packet_num, int(offset_base) + data_start, self.event_compression, self.codec,
+                self.frame_budget,
+            )
+            # При работающем writer кадр копируется в очередь передачи, пауза по скорости линка - там же
+            if zigbee_serial.send_data(frame):
+                log.debug("[Zigbee] Bin sent: Pack#%d (%d bytes)", packet_num,
+                          len(frame) - len(Frame_Protocol.FRAME_PREFIX))
+                return True
+            else:
+                return False
+        except Exception as e:
+            log.error("[Zigbee ERROR] %s", e)
+            return False
 
-        if len(event_starts) == 0 and len(event_ends) > 0:
-            return [(0, int(event_ends[-1]))]
+    @staticmethod
+    def event_window(packet_data, event_start, event_end, window=EVENT_WINDOW):
+        """(начало окна, сэмплы окна) вокруг события: window сэмплов слева и справа"""
+        data_start = max(0, int(event_start) - window)
+        data_end = min(len(packet_data), int(event_end) + window)
+        return data_start, packet_data[data_start:data_end]
 
-        events = []
-        if len(event_starts) > 0 and len(event_ends) > 0:
-            if event_starts[0] < event_ends[0]:
-                for i, start in enumerate(event_starts):
-                    start = int(start)
-                    end = int(event_ends[i]) if i < len(event_ends) else len(data) - 1
-                    events.append((start, end))
-            else:
-                events.append((0, int(event_ends[0])))
-                for i in range(1, len(event_starts)):
-                    start = int(event_starts[i])
-                    end = int(event_ends[i]) if i < len(event_ends) else len(data) - 1
-                    events.append((start, end))
-
-        if len(events) <= 1:
-            return events
-
-        final_events = [events[0]]
-        for i in range(1, len(events)):
-            curr_start, curr_end = events[i]
-            last_start, last_end = final_events[-1]
-
-            if (curr_start - last_end) < min_gap_between_events:
-                final_events[-1] = (last_start, curr_end)
-            else:
-                final_events.append((curr_start, curr_end))
+    def send_event_via_zigbee(self, zigbee_serial, peak_record, packet_data, data_start=0):
+        """
+        Событие одним EVT-пакетом: метаданные (время, номер пакета/события, громкость,
+        начало/конец) + окно сэмплов. packet_data[0] - сэмпл data_start пакета события.
+        """
+        window_start, window_data = self.event_window(
+            packet_data, peak_record["event_start_idx"] - data_start, peak_record["event_end_idx"] - data_start,
+            self.event_window_samples,
+        )
+        if len(window_data) == 0:
+            return False
 
-        return final_events
+        try:
+            frame = self.build_event_frame(peak_record, window_data, data_start + window_start)
+            if zigbee_serial.send_data(frame):
+                log.debug("[Zigbee] Event sent: Pack#%d Event %d/%d (%d bytes)", peak_record["packet_num"],
+                          peak_record["event_num"], peak_record["total_events_in_packet"],
+                          len(frame) - len(Frame_Protocol.FRAME_PREFIX))
+                return True
+            return False
+        except Exception as e:
+            log.error("[Zigbee ERROR] %s", e)
+            return False
 
-    def send_packet_via_zigbee(
-            self, zigbee_serial, packet_data, packet_num, event_start=None, event_end=None
-    ):
-        import struct
+    def build_event_frame(self, peak_record, window_data, window_offset, compression=None,
+                          codec=None, budget=None):
+        """
+        EVT-пакет события (memoryview переиспользуемого буфера). window_offset - начало окна в пакете,
+        compression/codec/budget - по умолчанию текущие параметры (self.event_compression, ...).
+        """
+        return self.frame_builder.build_evt(
+            window_data,
+            Frame_Protocol.timestamp_to_ms(peak_record["time"]),
+            peak_record["packet_num"],
+            peak_record["event_num"],
+            peak_record["total_events_in_packet"],
+            peak_record["max_value"],
+            peak_record["event_start_idx"],
+            peak_record["event_end_idx"],
+            window_offset,
+            self.event_compression if compression is None else compression,
+            self.codec if codec is None else codec,
+            self.frame_budget if budget is None else budget,
+        )
 
-        # ← БЕЗ проверки валидации (пакет уже валидирован раньше)
+    def cross_packet_window(self, peak_record, data):
+        """
+        Окно события через границы пакетов (детектор "packet"): если EVENT_WINDOW слева/справа
+        выходит за пакет, сэмплы берутся из предыдущего/следующего пакета в истории.
 
-        if event_start is None or event_end is None:
-            return False
+        Returns:
+            (сэмплы, индекс сэмплы[0] внутри пакета события) - как элемент очереди событий
+        """
+        window = self.event_window_samples
+        start = int(peak_record["event_start_idx"]) - window
+        end = int(peak_record["event_end_idx"]) + window
+        if start >= 0 and end <= len(data):
+            return data, 0
+
+        found = self.main_ring_que.window(
+            peak_record["packet_num"], start, end, self.window_wait_s if self.staged else 0.0, dtype=np.int64
+        )
+        if found is None:
+            return data, 0  # пакет уже вытеснен из истории - окно по текущему пакету
+        # Копия окна (int64) сделана под блокировкой кольца: поток приёма её уже не перезапишет
+        out, actual_start, base = found
+        baseline = None
+        if self.dc_blocker is not None:
+            baseline = self.dc_blocker.baseline(peak_record["packet_num"], actual_start, actual_start + len(out))
+        if baseline is not None:
+            np.subtract(out, baseline, out=out, casting="unsafe")
+        else:
+            out -= base
+        if len(out) > len(data):
+            self.windows_extended += 1
+        return out, actual_start
+
+    @staticmethod
+    def event_message(peak_record):
+        """Текстовая строка события (формат "pkt")"""
+        loud_value = peak_record["max_value"] / Frame_Protocol.ADC_FULL_SCALE
+        return (
+            f"{peak_record['time']} | "
+            f"Pack #{peak_record['packet_num']} | "
+            f"Event {peak_record['event_num']}/{peak_record['total_events_in_packet']} | "
+            f"Loud={loud_value:.4f}"
+        )
 
-        window_left = 300
-        window_right = 300
-        data_start = max(0, int(event_start) - window_left)
-        data_end = min(len(packet_data), int(event_end) + window_right)
-        window_data = packet_data[data_start:data_end]
+    def scheduled_frames(self, item, level):
+        """
+        Байты события для Link_Scheduler на уровне level (копии: буфер сборщика переиспользуется).
+        item - (peak_record, data, data_start), как в очереди событий.
+        """
+        peak_record, data, data_start = item
+        budget = self.frame_budget
+        if level == Link_Scheduler.LEVEL_COARSE:
+            compression, codec = COARSE_COMPRESSION, COARSE_CODEC
+            if budget is not None:
+                budget //= COARSE_BUDGET_DIVISOR
+        else:
+            compression, codec = self.event_compression, self.codec
+
+        window_start, window_data = self.event_window(
+            data, peak_record["event_start_idx"] - data_start, peak_record["event_end_idx"] - data_start,
+            self.event_window_samples,
+        )
+        summary = level == Link_Scheduler.LEVEL_SUMMARY
+        if summary:
+            # Только метаданные: EVT с пустым payload (в формате "pkt" - одна текстовая строка)
+            window_data, codec = window_data[:0], Wave_Codec.CODEC_RAW
+
+        if self.frame_format == FRAME_EVT:
+            return [bytes(self.build_event_frame(peak_record, window_data, data_start + window_start,
+                                                 compression, codec, budget))]
+
+        frames = []
+        if not summary and len(window_data):
+            frames.append(bytes(self.frame_builder.build_pkt(
+                window_data, peak_record["packet_num"], data_start + window_start, compression, codec, budget
+            )))
+        frames.append((self.event_message(peak_record) + "\r\n").encode("ascii", errors="replace"))
+        return frames
+
+    def dispatch_scheduled(self, flush=False):
+        """Отдать writer'у Zigbee события из планировщика (если он включён)"""
+        if self.scheduler is not None:
+            self.scheduler.dispatch(flush=flush)
+
+    def convert_package(self, package):
+        """
+        Стадия приёма: конвертация пакета АЦП и удаление смещения.
+        package - полный пакет с маркерами (bytes или memoryview из PacketFramer).
 
-        if len(window_data) == 0:
-            return False
+        Returns:
+            (номер пакета, timestamp, np.int64 массив) или None
+        """
+        with self.metrics.timed("convert"):
+            return self._convert_package(package)
+
+    def _convert_package(self, package):
+        # Проверка размера пакета (грубая)
+        if len(package) <= 19000:
+            log.warning("[WARNING] Packet too small: %d bytes", len(package))
+            self.metrics.inc("undersized_packets")
+            return None
+
+        try:
+            converted_Pck = ByInConvert.bytesArrayConvert(package)
+        except Exception as e:
+            log.error("[ERROR] Failed to convert package: %s", e)
+            return None
+
+        if len(converted_Pck) == 0:
+            log.warning("[WARNING] Conversion returned empty package")
+            return None
+
+        self.main_total_packets += 1
+        # Сохраняем в кольцо истории. Копия: converted_Pck - view на буфер фреймера,
+        # он будет перезаписан; заодно '>i4' -> нативный int32
+        stored = self.main_ring_que.append(self.main_total_packets, converted_Pck)
+
+        timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-4]
+
+        self.main_packet_info.append(
+            self.main_total_packets, time.monotonic(), Frame_Protocol.timestamp_to_ms(timestamp), len(package)
+        )
+
+        # Нативный int32 из кольца -> int64 (нужен для вычитания смещения)
+        current_packet = stored.astype(np.int64)
+
+        # === УДАЛЕНИЕ СМЕЩЕНИЯ ===
+        if self.dc_blocker is not None:
+            self.dc_blocker.process(self.main_total_packets, current_packet)
+        elif len(current_packet) > 0:
+            current_packet -= current_packet[0]
+
+        return self.main_total_packets, timestamp, current_packet
+
+    def detect_events(self, zigbee_serial, packet_num, timestamp, current_packet, peak_treshold):
+        """
+        Стадия детекции: поиск событий в пакете и валидация.
+
+        Returns:
+            список (запись о пике, сэмплы, индекс сэмплов[0] внутри пакета события)
+        """
+        # 4. ДЕТЕКЦИЯ СОБЫТИЙ (Используем актуальный peak_treshold!)
+        if self.detector == "stream":
+            with self.metrics.timed("detect"):
+                events = self.stream_detector.process(current_packet, packet_num, timestamp, peak_treshold)
+            return self.record_stream_events(zigbee_serial, events, peak_treshold)
+
+        analysis = analyze_packet(current_packet, peak_treshold, self.min_gap_between_events,
+                                  window=self.event_window_samples, metrics=self.metrics)
+        return [
+            (peak_record, current_packet, 0)
+            for peak_record in self.record_events(zigbee_serial, packet_num, timestamp, analysis, peak_treshold)
+        ]
+
+    def make_peak_record(self, zigbee_serial, timestamp, packet_num, event_num, total_events,
+                         event_start, event_end, event_max_abs):
+        """Запись о пике (и в peak_log для меню: Peak_Store.PeakStore или список)"""
+        peak_record = {
+            "time": timestamp,
+            "packet_num": packet_num,
+            "event_num": event_num,
+            "total_events_in_packet": total_events,
+            "event_start_idx": event_start,
+            "event_end_idx": event_end,
+            "max_value": event_max_abs,
+            "duration": event_end - event_start + 1,
+        }
+        if hasattr(zigbee_serial, "peak_log"):
+            zigbee_serial.peak_log.append(peak_record)
+        self.main_packet_info.add_events(packet_num)
+        return peak_record
+
+    def record_events(self, zigbee_serial, packet_num, timestamp, analysis, peak_treshold):
+        """
+        Превращает результат analyze_packet в записи о пиках (и пишет их в peak_log).
+        """
+        total_events, results = analysis
+        if total_events == 0:
+            return []
+
+        self.main_last_packet_peak_detected = True
+        log.info("[Packet #%d] %s - Detected %d event(s) (Thr=%d)", packet_num, timestamp, total_events,
+                 peak_treshold)
+
+        records = []
+        for event_num, event_start, event_end, event_max_abs, valid in results:
+            if not valid:
+                log.warning("[WARNING] Event %d in Pack#%d SKIPPED (invalid)", event_num, packet_num)
+                self.metrics.inc("invalid_events")
+                continue
+
+            records.append(self.make_peak_record(
+                zigbee_serial, timestamp, packet_num, event_num, total_events,
+                event_start, event_end, event_max_abs,
+            ))
+
+        return records
+
+    def record_stream_events(self, zigbee_serial, events, peak_treshold):
+        """
+        Валидация и запись событий StreamingPeakDetector.
+        Индексы событий - внутри пакета, где событие началось (конец может быть за его пределами).
+        """
+        if not events:
+            return []
 
-        compression = 4
-        compressed = window_data[::compression]
-        arr = np.array(compressed, dtype=np.int32)
-        payload = arr.tobytes()
+        self.main_last_packet_peak_detected = True
+        log.info("[Stream] Closed %d event(s) (Thr=%d)", len(events), peak_treshold)
+
+        out = []
+        for event_num, event in enumerate(events, 1):
+            with self.metrics.timed("validate"):
+                valid = is_packet_valid_np(event["window"])
+            if not valid:
+                log.warning("[WARNING] Event %d in Pack#%d SKIPPED (invalid)", event_num, event["packet_num"])
+                self.metrics.inc("invalid_events")
+                continue
+
+            event_start = event["start_in_packet"]
+            event_end = event_start + event["end"] - event["start"]
+            peak_record = self.make_peak_record(
+                zigbee_serial, event["timestamp"], event["packet_num"], event_num, len(events),
+                event_start, event_end, event["max_abs"],
+            )
+            # Окно начинается раньше события на (start - window_start) сэмплов
+            data_start = event_start - (event["start"] - event["window_start"])
+            out.append((peak_record, event["window"], data_start))
+
+        return out
+
+    def flush_stream_events(self, zigbee_serial):
+        """Конец сессии: отдать ждущие окна события и закрыть открытое событие потокового детектора"""
+        if self.stream_detector is None:
+            return []
+        return self.record_stream_events(zigbee_serial, self.stream_detector.flush(), self.peak_threshold)
 
-        header = b"PKT" + struct.pack(
-            ">IIHH", int(packet_num), int(data_start), compression, len(arr)
+    def transmit_event(self, zigbee_serial, peak_record, data, data_start=0):
+        """
+        Стадия передачи: бинарный пакет + текстовая строка события через Zigbee.
+        data - сэмплы пакета (или окна), data_start - индекс data[0] внутри пакета события.
+        """
+        self.metrics.inc("events")
+        with self.metrics.timed("transmit"):
+            self._transmit_event(zigbee_serial, peak_record, data, data_start)
+
+    def _transmit_event(self, zigbee_serial, peak_record, data, data_start):
+        packet_num = peak_record["packet_num"]
+        event_num = peak_record["event_num"]
+        event_start = peak_record["event_start_idx"]
+        event_end = peak_record["event_end_idx"]
+        event_max_abs = peak_record["max_value"]
+        self.events_transmitted += 1
+
+        if self.detector != "stream":
+            # Потоковый детектор уже собирает окно через границу пакетов
+            data, data_start = self.cross_packet_window(peak_record, data)
+
+        if self.scheduler is not None:
+            # Порядок, уровень (полное/грубое/только метаданные) и отправку решает планировщик линка
+            self.scheduler.submit((peak_record, data, data_start), event_max_abs / Frame_Protocol.ADC_FULL_SCALE)
+            self.scheduler.dispatch()
+            log.info("   └─ Event %d: Start=%d, End=%d, Max=%.0f (scheduled, pending %d)",
+                     event_num, event_start, event_end, event_max_abs, len(self.scheduler))
+            return
+
+        if self.frame_format == FRAME_EVT:
+            # 5. ОТПРАВКА СОБЫТИЯ ОДНИМ ПАКЕТОМ (Zigbee)
+            self.send_event_via_zigbee(zigbee_serial, peak_record, data, data_start)
+            log.info("   └─ Event %d: Start=%d, End=%d, Max=%.0f", event_num, event_start, event_end,
+                     event_max_abs)
+            return
+
+        # 5. ОТПРАВКА БИНАРНИКА (Zigbee)
+        self.send_packet_via_zigbee(
+            zigbee_serial,
+            data,
+            packet_num,
+            event_start=event_start - data_start,
+            event_end=event_end - data_start,
+            offset_base=data_start,
         )
 
-        frame = header + payload
+        # 6. ОТПРАВКА ТЕКСТА (Zigbee)
+        message = self.event_message(peak_record)
 
         try:
-            if zigbee_serial.ser and zigbee_serial.ser.is_open:
-                time.sleep(0.01)
-                zigbee_serial.ser.write(b"\r")
-                zigbee_serial.ser.write(frame)
-                zigbee_serial.ser.flush()
-                print(f"[Zigbee] Bin sent: Pack#{packet_num} ({len(frame)} bytes)")
-                return True
-            else:
-                return False
+            zigbee_serial.send_command(message)
         except Exception as e:
-            print(f"[Zigbee ERROR] {e}")
-            return False
+            log.warning("[WARNING] Failed to send text via Zigbee: %s", e)
+
+        log.info("   └─ Event %d: Start=%d, End=%d, Max=%.0f", event_num, event_start, event_end, event_max_abs)
+
+    def process_package(self, package, zigbee_serial, peak_treshold):
+        """
+        Обработка одного пакета АЦП в одном потоке: конвертация, детекция, валидация, отправка.
+        """
+        converted = self.convert_package(package)
+        if converted is None:
+            return
+
+        packet_num, timestamp, current_packet = converted
+        for peak_record, data, data_start in self.detect_events(zigbee_serial, packet_num, timestamp,
+                                                                current_packet, peak_treshold):
+            self.transmit_event(zigbee_serial, peak_record, data, data_start)
+
+    def poll_threshold_update(self, zigbee_serial):
+        """
+        Проверка обновления порога через Zigbee (команда SET:x).
+        Быстрая, не блокирует поток.
+        """
+        if zigbee_serial is None or self.zigbee_rx_listener:
+            return  # порог приходит из потока приёма Zigbee (set_peak_threshold)
+
+        # Спрашиваем: "Пришла ли команда SET:x?"
+        new_val = zigbee_serial.check_incoming_threshold()
+
+        if new_val is not None:
+            self.set_peak_threshold(new_val)
+
+    def set_peak_threshold(self, new_val):
+        """Новый порог детекции (из команды SET:x)"""
+        self.peak_threshold = new_val
+        log.info("\n[UART] === THRESHOLD UPDATED: %d ===\n", self.peak_threshold)
+
+    # ------------------------------------------------------------------
+    # ПАРАМЕТРЫ С ПК (CFG / GET / STAT по Zigbee)
+    # ------------------------------------------------------------------
+    def get_param(self, name):
+        """Текущее значение параметра RUNTIME_PARAMS (codec - имя, budget без бюджета - 0)"""
+        if name not in RUNTIME_PARAMS:
+            raise ValueError(f"unknown parameter {name!r}")
+        value = getattr(self, RUNTIME_PARAMS[name][0])
+        if name == "codec":
+            return Wave_Codec.CODEC_NAMES.get(value, value)
+        return 0 if value is None else value
+
+    def set_param(self, name, text):
+        """
+        Изменение параметра RUNTIME_PARAMS на лету (из потока приёма Zigbee).
+        Действует с ближайшего пакета/события.
+
+        Returns:
+            новое значение (как в get_param)
+        Raises:
+            ValueError: неизвестный параметр или значение вне диапазона
+        """
+        if name not in RUNTIME_PARAMS:
+            raise ValueError(f"unknown parameter {name!r}")
+        attr, low, high = RUNTIME_PARAMS[name]
+
+        if name == "codec":
+            value = Wave_Codec.codec_id(text.strip().lower())
+        else:
+            try:
+                value = int(text)
+            except ValueError:
+                raise ValueError(f"{name} must be an integer, got {text!r}")
+            if not low <= value <= high:
+                raise ValueError(f"{name} must be {low}..{high}, got {value}")
+
+        if name == "thr":
+            self.set_peak_threshold(value)
+        elif name == "budget":
+            self.frame_budget = value or None
+        else:
+            setattr(self, attr, value)
+            if self.stream_detector is not None:
+                # Потоковый детектор читает параметры на каждом пакете
+                self.stream_detector.min_gap_between_events = self.min_gap_between_events
+                self.stream_detector.window = self.event_window_samples
+        log.info("[UART] Parameter %s = %s (from PC)", name, self.get_param(name))
+        return self.get_param(name)
+
+    def runtime_stats(self, zigbee_serial=None):
+        """Счётчики для команды STAT: пакеты, события, передача по Zigbee, планировщик"""
+        stats = {
+            "pkts": self.main_total_packets,
+            "pkt_rate": self.main_packet_info.summary().get("packets_per_s", 0.0),
+            "evts": self.events_transmitted,
+            "thr": self.peak_threshold,
+        }
+        if hasattr(zigbee_serial, "tx_stats"):
+            tx = zigbee_serial.tx_stats()
+            stats.update({
+                "tx_bytes": tx["bytes"],
+                "tx_bps": tx["bytes_per_s"],
+                "link_pct": tx["link_utilization_pct"],
+                "queue": tx["queue_size"],
+                "tx_dropped": tx["dropped"],
+            })
+        if self.scheduler is not None:
+            sched = self.scheduler.stats()
+            stats.update({
+                "pending": sched["pending"],
+                "downgraded": sched["downgraded"],
+                "sched_dropped": sched["dropped"],
+                "sched_failed": sched["failed"],
+            })
+        return stats
+
+    def register_zigbee_commands(self, zigbee_serial):
+        """Обработчики CFG/GET/STAT (вызываются из потока приёма Zigbee), ответ - ACK/NAK"""
+        def reply(line):
+            zigbee_serial.send_reply(line)
+
+        def on_cfg(arg):
+            name, sep, value = arg.strip().partition("=")
+            try:
+                if not sep:
+                    raise ValueError("expected name=value")
+                new_value = self.set_param(name, value)
+            except ValueError as e:
+                reply(Frame_Protocol.format_error(Frame_Protocol.CMD_CFG, str(e)))
+                return
+            reply(Frame_Protocol.format_reply(Frame_Protocol.CMD_CFG, {name: new_value}))
+
+        def on_get(arg):
+            name = arg.strip() or Frame_Protocol.PARAM_ALL
+            names = list(RUNTIME_PARAMS) if name == Frame_Protocol.PARAM_ALL else [name]
+            try:
+                values = {n: self.get_param(n) for n in names}
+            except ValueError as e:
+                reply(Frame_Protocol.format_error(Frame_Protocol.CMD_GET, str(e)))
+                return
+            reply(Frame_Protocol.format_reply(Frame_Protocol.CMD_GET, values))
+
+        def on_stat(arg):
+            reply(Frame_Protocol.format_reply(Frame_Protocol.CMD_STAT, self.runtime_stats(zigbee_serial)))
+
+        zigbee_serial.register_command(Frame_Protocol.CMD_CFG, on_cfg)
+        zigbee_serial.register_command(Frame_Protocol.CMD_GET, on_get)
+        zigbee_serial.register_command(Frame_Protocol.CMD_STAT, on_stat)
+        self.zigbee_commands = True
+
+    def unregister_zigbee_commands(self, zigbee_serial):
+        for name in (Frame_Protocol.CMD_CFG, Frame_Protocol.CMD_GET, Frame_Protocol.CMD_STAT):
+            zigbee_serial.unregister_command(name)
+        self.zigbee_commands = False
+
+    def add_metric_sources(self, zigbee_serial):
+        """Счётчики, которые уже ведут фреймер, очереди и Zigbee - в метрики без дублирования"""
+        framer = self.framer
+        self.metrics.add_source("garbage_bytes", "counter", "Bytes dropped by the packet framer",
+                                lambda: framer.garbage_bytes + framer.overflow_bytes)
+        self.metrics.add_source("packets_queue", "gauge", "Packets waiting for the detect stage",
+                                lambda: len(self.packet_queue) if self.packet_queue is not None else 0)
+        self.metrics.add_source("events_queue", "gauge", "Events waiting for the transmit stage",
+                                lambda: len(self.event_queue) if self.event_queue is not None else 0)
+        if hasattr(zigbee_serial, "tx_stats"):
+            self.metrics.add_source("zigbee_bytes_sent", "counter", "Bytes written to the Zigbee port",
+                                    lambda: zigbee_serial.tx_bytes)
+            self.metrics.add_source("zigbee_tx_queue_bytes", "gauge", "Bytes waiting in the Zigbee Tx queue",
+                                    zigbee_serial.tx_backlog_bytes)
+
+    def start_pipeline(self, zigbee_serial):
+        """
+        Запуск стадий детекции и передачи в отдельных потоках.
+        Стадия приёма остаётся в потоке main_serial_reader и никогда не ждёт радио.
+        """
+        size, policy = self.pipeline_queues["packets"]
+        self.packet_queue = Pipeline_Logic.StageQueue("packets", size, policy)
+        size, policy = self.pipeline_queues["events"]
+        self.event_queue = Pipeline_Logic.StageQueue("events", size, policy)
+
+        def emit_events(events):
+            for event in events:
+                self.event_queue.put(event)
+
+        def detect_handler(item):
+            packet_num, timestamp, current_packet = item
+            emit_events(
+                self.detect_events(zigbee_serial, packet_num, timestamp, current_packet, self.peak_threshold)
+            )
+
+        def detect_finish():
+            emit_events(self.flush_stream_events(zigbee_serial))
+
+        def pool_collect(block=False):
+            for (packet_num, timestamp, current_packet, threshold), analysis in self.detect_pool.collect(block):
+                emit_events(
+                    (peak_record, current_packet, 0)
+                    for peak_record in self.record_events(zigbee_serial, packet_num, timestamp, analysis,
+                                                          threshold)
+                )
+
+        def pool_handler(item):
+            packet_num, timestamp, current_packet = item
+            threshold = self.peak_threshold
+            self.detect_pool.submit(
+                (packet_num, timestamp, current_packet, threshold), current_packet, threshold,
+                min_gap_between_events=self.min_gap_between_events, window=self.event_window_samples,
+            )
+            pool_collect()
+
+        def pool_finish():
+            pool_collect(block=True)
+            log.info("[UART] Detection pool: %s", self.detect_pool.stats())
+            self.detect_pool.close()
+            self.detect_pool = None
+
+        def transmit_handler(item):
+            peak_record, data, data_start = item
+            self.transmit_event(zigbee_serial, peak_record, data, data_start)
+
+        if self.detect_workers > 0 and self.detector == "stream":
+            log.info("[UART] Stream detector keeps state between packets -> detection pool disabled")
+
+        if self.detect_workers > 0 and self.detector != "stream":
+            self.detect_pool = Detect_Pool.DetectionPool(workers=self.detect_workers)
+            detector = Pipeline_Logic.PipelineStage(
+                "DetectorThread", self.packet_queue, pool_handler, lambda: self.main_run_flag,
+                idle_hook=pool_collect, finish_hook=pool_finish
+            )
+        else:
+            detector = Pipeline_Logic.PipelineStage(
+                "DetectorThread", self.packet_queue, detect_handler, lambda: self.main_run_flag,
+                finish_hook=detect_finish
+            )
+
+        # Передача работает, пока жива детекция: иначе последние события потерялись бы
+        def transmit_idle():
+            self.poll_threshold_update(zigbee_serial)
+            self.dispatch_scheduled()
+
+        transmitter = Pipeline_Logic.PipelineStage(
+            "ZigbeeTxThread", self.event_queue, transmit_handler,
+            lambda: self.main_run_flag or detector.is_alive(),
+            idle_hook=transmit_idle,
+            finish_hook=lambda: self.dispatch_scheduled(flush=True),
+        )
+
+        self.stages = [detector, transmitter]
+        for stage in self.stages:
+            stage.start()
+
+    def stop_pipeline(self, timeout=2.0):
+        """Ожидание завершения стадий и вывод их счётчиков"""
+        for stage in self.stages:
+            stage.join(timeout)
+
+        for stage in self.stages:
+            st = stage.stats()
+            q = st["queue"]
+            log.info("[UART] Stage %s: processed=%d errors=%d busy=%.2fs | queue '%s' (%s): "
+                     "size=%d/%d high=%d dropped=%d", st["name"], st["processed"], st["errors"], st["busy_s"],
+                     q["name"], q["policy"], q["size"], q["maxsize"], q["high_water"], q["dropped"])
+        self.stages = []
 
     def main_serial_reader(self, zigbee_serial, peak_treshold, stop_byte):
+        self.peak_threshold = peak_treshold
+        if self.dc_blocker is not None:
+            self.dc_blocker.reset()
+        if self.detector == "stream":
+            self.stream_detector = Stream_Detect.StreamingPeakDetector(
+                self.peak_threshold, self.min_gap_between_events, self.event_window_samples
+            )
+        if self.link_scheduler and zigbee_serial is not None:
+            self.scheduler = Link_Scheduler.LinkScheduler(
+                zigbee_serial, self.scheduled_frames, deadline_s=LINK_DEADLINE_S
+            )
+        if hasattr(zigbee_serial, "add_threshold_listener") and zigbee_serial.reader_running():
+            zigbee_serial.add_threshold_listener(self.set_peak_threshold)
+            self.zigbee_rx_listener = True
+        if hasattr(zigbee_serial, "register_command"):
+            # Без потока приёма команды разбираются при опросе порога (poll_threshold_update)
+            self.register_zigbee_commands(zigbee_serial)
+        self.add_metric_sources(zigbee_serial)
         try:
-            print("[UART] main_serial_reader started")
+            log.info("[UART] main_serial_reader started")
+
+            if self.staged:
+                self.start_pipeline(zigbee_serial)
 
             # Определяем ОС для корректной работы ввода (опционально)
             try:
@@ -209,14 +1060,10 @@ class Serial_reader:
                 # -------------------------------------------------------------
                 # 1. ПРОВЕРКА ОБНОВЛЕНИЯ ПОРОГА ЧЕРЕЗ ZIGBEE (НОВОЕ)
                 # -------------------------------------------------------------
-                # Этот блок работает быстро и не блокирует поток
-                if zigbee_serial is not None:
-                    # Спрашиваем: "Пришла ли команда SET:x?"
-                    new_val = zigbee_serial.check_incoming_threshold()
-
-                    if new_val is not None:
-                        peak_treshold = new_val
-                        print(f"\n[UART] === THRESHOLD UPDATED: {peak_treshold} ===\n")
+                # В режиме конвейера порог проверяет стадия передачи; с потоком приёма Zigbee опроса нет вовсе
+                if not self.staged:
+                    self.poll_threshold_update(zigbee_serial)
+                    self.dispatch_scheduled()
                 # -------------------------------------------------------------
 
                 # Обработка выхода по Enter (для Linux/консоли)
@@ -232,178 +1079,84 @@ class Serial_reader:
                 #         pass
 
                 if self.main_ser is None or not self.main_ser.is_open:
-                    print("[ERROR] Serial port is not initialized!")
+                    log.error("[ERROR] Serial port is not initialized!")
                     self.main_run_flag = False
                     break
 
                 # 2. ЧТЕНИЕ ДАННЫХ С МИКРОФОНА
-                n = self.main_ser.in_waiting
-                if n > 0:
-                    try:
-                        data = self.main_ser.read(n)
-                        self.buffer.extend(data)
-                    except Exception as e:
-                        print(f"[ERROR] Failed to read: {e}")
-                        time.sleep(0.01)
-                        continue
-                else:
-                    # Если данных нет, спим чуть-чуть, чтобы не грузить ЦП
-                    time.sleep(0.002)
+                if self.ingest is None or self.ingest.ser is not self.main_ser:
+                    self.ingest = Uart_Ingest.make_ingest(
+                        self.read_mode, self.main_ser, self.framer, self.baud_rate
+                    )
+
+                try:
+                    n = self.ingest.read_once()
+                except Uart_Ingest.PortClosedError as e:
+                    # Обрыв порта не пройдёт сам: повторять чтение бессмысленно
+                    log.error("[ERROR] UART port closed: %s", e)
+                    self.main_run_flag = False
+                    break
+                except Exception as e:
+                    log.error("[ERROR] Failed to read: %s", e)
+                    time.sleep(0.01)
                     continue
 
-                # 3. ПОИСК И ОБРАБОТКА ПАКЕТОВ
-                idx_end = self.buffer.find(self.END_MARKER)
-                if idx_end != -1:
-                    packet_candidate = self.buffer[:idx_end]
-                    idx_start = packet_candidate.rfind(self.START_MARKER)
-
-                    if idx_start != -1:
-                        # Пакет найден корректно
-                        end_pos = idx_end + len(self.END_MARKER)
-                        package = self.buffer[idx_start:end_pos]
-
-                        # print(f"[Pck #{self.main_total_packets}] - [Sz={len(package)}]")
-
-                        # Удаляем обработанное из буфера
-                        self.buffer = self.buffer[end_pos:]
-
-                        # Проверка размера пакета (грубая)
-                        if len(package) > 19000:
-                            try:
-                                converted_Pck = ByInConvert.bytesIntsConvert(package)
-                            except Exception as e:
-                                print(f"[ERROR] Failed to convert package: {e}")
-                                continue
-
-                            if not converted_Pck:
-                                print("[WARNING] Conversion returned empty package")
-                                continue
-
-                            # Сохраняем в кольцевой буфер (для истории/дебага)
-                            self.main_ring_que.append(converted_Pck)
-                            self.main_total_packets += 1
-
-                            timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-4]
-
-                            packet_info = {
-                                "buffer_index": len(self.main_ring_que),
-                                "global_number": self.main_total_packets,
-                                "timestamp": timestamp,
-                                "packet_size": len(package),
-                            }
-                            self.main_packet_info.append(packet_info)
-
-                            current_packet = np.array(converted_Pck, dtype=np.int64)
-
-                            # === УДАЛЕНИЕ СМЕЩЕНИЯ ===
-                            # Вычисляем среднее значение (уровень тишины) и вычитаем его
-
-                            #dc_offset = np.mean(current_packet)
-                            #current_packet = current_packet - dc_offset
-
-                            if len(current_packet) > 0:
-                                current_packet -= current_packet[0]
-
-                            # 4. ДЕТЕКЦИЯ СОБЫТИЙ (Используем актуальный peak_treshold!)
-                            events_list = self.detect_multiple_peaks(
-                                current_packet, peak_treshold, min_gap_between_events=1000
-                            )
-
-                            if len(events_list) > 0:
-                                self.main_last_packet_peak_detected = True
-                                print(
-                                    f"[Packet #{self.main_total_packets}] {timestamp} - "
-                                    f"Detected {len(events_list)} event(s) (Thr={peak_treshold})"
-                                )
-
-                                for event_num, (event_start, event_end) in enumerate(events_list, 1):
-                                    event_start = int(event_start)
-                                    event_end = int(event_end)
-
-                                    event_data = current_packet[event_start:event_end + 1]
-                                    if event_data.size == 0:
-                                        continue
-
-                                    # ВАЛИДАЦИЯ (Lite)
-                                    window_data_check = current_packet[
-                                        max(0, event_start - 300):min(len(current_packet), event_end + 300)
-                                    ]
-
-                                    if not is_packet_valid_lite(window_data_check.tolist()):
-                                        print(
-                                            f"[WARNING] Event {event_num} in Pack#{self.main_total_packets} SKIPPED (invalid)")
-                                        continue
-
-                                    event_max_abs = float(np.max(np.abs(event_data)))
-                                    event_duration = event_end - event_start + 1
-
-                                    # Логирование пика (для меню)
-                                    peak_record = {
-                                        "time": timestamp,
-                                        "packet_num": self.main_total_packets,
-                                        "event_num": event_num,
-                                        "total_events_in_packet": len(events_list),
-                                        "event_start_idx": event_start,
-                                        "event_end_idx": event_end,
-                                        "max_value": event_max_abs,
-                                        "duration": event_duration,
-                                    }
-                                    if hasattr(zigbee_serial, "peak_log"):
-                                        zigbee_serial.peak_log.append(peak_record)
-
-                                    # 5. ОТПРАВКА БИНАРНИКА (Zigbee)
-                                    self.send_packet_via_zigbee(
-                                        zigbee_serial,
-                                        current_packet.tolist(),
-                                        self.main_total_packets,
-                                        event_start=event_start,
-                                        event_end=event_end,
-                                    )
-
-                                    # 6. ОТПРАВКА ТЕКСТА (Zigbee)
-                                    SCALE = 2 ** 31
-                                    loud_value = event_max_abs / SCALE
-
-                                    message = (
-                                        f"{timestamp} | "
-                                        f"Pack #{self.main_total_packets} | "
-                                        f"Event {event_num}/{len(events_list)} | "
-                                        f"Loud={loud_value:.4f}"
-                                    )
-
-                                    try:
-                                        zigbee_serial.send_command(message)
-                                    except Exception as e:
-                                        print(f"[WARNING] Failed to send text via Zigbee: {e}")
-
-                                    print(
-                                        f"   └─ Event {event_num}: Start={event_start}, End={event_end}, "
-                                        f"Max={event_max_abs:.0f}"
-                                    )
-                        else:
-                            print(f"[WARNING] Packet too small: {len(package)} bytes")
+                if n == 0:
+                    continue
+                # От пробуждения потока до байт в буфере фреймера (замер Uart_Ingest)
+                self.metrics.observe("read", self.ingest.stats.last_read_s)
+                self.metrics.inc("bytes_read", n)
 
+                # 3. ПОИСК И ОБРАБОТКА ПАКЕТОВ
+                # Фреймер продолжает поиск с того места, где остановился в прошлый раз
+                t_frame = time.perf_counter()
+                for package in self.framer.iter_frames():
+                    self.metrics.observe("frame", time.perf_counter() - t_frame)
+                    if self.staged:
+                        # Только конвертация: всё остальное - в других потоках
+                        converted = self.convert_package(package)
+                        if converted is not None:
+                            self.packet_queue.put(converted)
                     else:
-                        # Маркер конца найден, а начала нет -> мусор
-                        # print(f"[DROP] Garbage detected (no START before END at {idx_end})")
-                        self.buffer = self.buffer[idx_end + len(self.END_MARKER):]
+                        self.process_package(package, zigbee_serial, self.peak_threshold)
+                    t_frame = time.perf_counter()
 
                 # Короткая пауза в цикле обработки
                 # time.sleep(0.001)
 
         except Exception as e:
-            print(f"\n[ERROR] Error in serial reader: {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception("\n[ERROR] Error in serial reader: %s", e)
             self.main_run_flag = False
 
         finally:
-            print("\n[UART] main_serial_reader exiting...")
+            log.info("\n[UART] main_serial_reader exiting...")
+            self.main_run_flag = False
+            if self.zigbee_rx_listener:
+                zigbee_serial.remove_threshold_listener(self.set_peak_threshold)
+                self.zigbee_rx_listener = False
+            if self.zigbee_commands:
+                self.unregister_zigbee_commands(zigbee_serial)
+            if self.stages:
+                self.stop_pipeline()
+            else:
+                for peak_record, data, data_start in self.flush_stream_events(zigbee_serial):
+                    self.transmit_event(zigbee_serial, peak_record, data, data_start)
+                self.dispatch_scheduled(flush=True)
+            log.info("[UART] Packets: %s | windows extended across packets: %d",
+                     self.main_packet_info.summary(), self.windows_extended)
+            if self.scheduler is not None:
+                log.info("[UART] Link scheduler: %s", self.scheduler.stats())
+            if self.stream_detector is not None:
+                log.info("[UART] Stream detector: %s", self.stream_detector.stats())
+            if self.dc_blocker is not None:
+                log.info("[UART] DC blocker: %s", self.dc_blocker.stats())
+            if self.ingest is not None:
+                log.info("[UART] Ingest stats %s", self.ingest.stats.format())
             if self.main_ser and self.main_ser.is_open:
                 try:
                     self.main_ser.write(stop_byte)
                     self.main_ser.flush()
-                    print(f"{datetime.now().strftime('%H:%M:%S')} - Stop byte sent.")
+                    log.info("%s - Stop byte sent.", datetime.now().strftime('%H:%M:%S'))
                 except Exception as e:
-                    print(f"[ERROR] Failed to send stop byte: {e}")
+                    log.error("[ERROR] Failed to send stop byte: %s", e)
 
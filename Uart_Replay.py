@@ -0,0 +1,422 @@
+"""
+Запись и воспроизведение сырого потока UART от АЦП.
+
+Запись с живого порта:
+    python Uart_Replay.py record capture.bin [--port /dev/serial0] [--seconds 60]
+Синтетическая запись (для любой Linux-машины):
+    python Uart_Replay.py synth capture.bin [--packets 500]
+Воспроизведение через Serial_reader:
+    python Uart_Replay.py replay capture.bin [--speed 1|N|0] [--pty] [--json report.json]
+    (--speed 0 - максимально быстро)
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+import ByInConvert
+import Log_Queue
+import Uart_Logic
+
+# 8N1: старт-бит + 8 бит данных + стоп-бит
+BITS_PER_BYTE = 10
+
+START_BYTE = b'\x11'
+STOP_BYTE = b'\x01'
+
+
+# ============================================================================
+# ЗАПИСЬ
+# ============================================================================
+class RecordingSerial:
+    """
+    Обёртка над живым serial.Serial: всё прочитанное дописывается в файл записи.
+    Подставляется вместо Serial_reader.main_ser.
+    """
+
+    def __init__(self, ser, path):
+        self.ser = ser
+        self.path = path
+        self._file = open(path, "wb")
+        self.bytes_recorded = 0
+
+    @property
+    def is_open(self):
+        return self.ser.is_open
+
+    @property
+    def in_waiting(self):
+        return self.ser.in_waiting
+
+    def read(self, size=1):
+        data = self.ser.read(size)
+        if data:
+            self._file.write(data)
+            self.bytes_recorded += len(data)
+        return data
+
+    def write(self, data):
+        return self.ser.write(data)
+
+    def flush(self):
+        self.ser.flush()
+
+    def close(self):
+        self._file.close()
+        self.ser.close()
+
+
+def record_capture(path, port="/dev/serial0", baud_rate=256000, seconds=60.0):
+    """Запись сырого потока АЦП с живого порта в файл"""
+    import serial
+
+    ser = serial.Serial(port, baud_rate, timeout=0.1)
+    rec = RecordingSerial(ser, path)
+    try:
+        ser.write(START_BYTE)
+        ser.flush()
+        print(f"[Record] {port} at {baud_rate} baud -> {path} ({seconds:.0f} s)")
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            n = rec.in_waiting
+            if n > 0:
+                rec.read(n)
+            else:
+                time.sleep(0.005)
+        ser.write(STOP_BYTE)
+        ser.flush()
+    finally:
+        rec.close()
+    print(f"[Record] ✓ {rec.bytes_recorded} bytes recorded")
+    return rec.bytes_recorded
+
+
+def synthetic_capture(packets, seed=0):
+    """
+    Сырой поток из пакетов (np.int64 сэмплы): START + big-endian int32 + END,
+    с небольшим мусором между пакетами и постоянным смещением АЦП.
+    """
+    rng = np.random.default_rng(seed)
+    chunks = []
+    for packet in packets:
+        if rng.random() < 0.05:
+            chunks.append(bytes(rng.integers(0, 256, int(rng.integers(1, 40)), dtype=np.uint8)))
+        samples = np.clip(packet + 12345, -2 ** 31, 2 ** 31 - 1).astype(ByInConvert.ADC_DTYPE)
+        chunks.append(ByInConvert.START_MARKER + samples.tobytes() + ByInConvert.END_MARKER)
+    return b"".join(chunks)
+
+
+# ============================================================================
+# ВОСПРОИЗВЕДЕНИЕ
+# ============================================================================
+class ReplaySerial:
+    """
+    Заглушка serial.Serial, которая отдаёт записанный поток со скоростью UART.
+
+    speed = 1.0 - реальное время, N - в N раз быстрее, 0 - так быстро, как читают.
+    За один раз доступно не больше max_chunk байт (как буфер драйвера UART),
+    ожидание просыпается не раньше, чем придёт fifo байт (как FIFO/таймаут приёмника UART).
+    """
+
+    def __init__(self, data, baud_rate=256000, speed=1.0, max_chunk=4096, fifo=64):
+        self._data = memoryview(bytes(data))
+        self.baud_rate = baud_rate
+        self.speed = speed
+        self.max_chunk = max_chunk
+        self.fifo = fifo
+        self.is_open = True
+        self.written = bytearray()  # стартовый/стоповый байты от Serial_reader
+
+        self._pos = 0
+        self._t0 = None
+        self._byte_rate = baud_rate / BITS_PER_BYTE * speed
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        with open(path, "rb") as f:
+            return cls(f.read(), **kwargs)
+
+    def _start(self):
+        if self._t0 is None:
+            self._t0 = time.perf_counter()
+
+    def _arrived(self):
+        """Сколько байт уже 'пришло' по линии"""
+        self._start()
+        if self.speed <= 0:
+            return len(self._data)
+        arrived = int((time.perf_counter() - self._t0) * self._byte_rate)
+        # Байты становятся видны порциями по fifo (как из FIFO приёмника UART)
+        arrived -= arrived % self.fifo
+        return min(len(self._data), arrived)
+
+    @property
+    def remaining(self):
+        return len(self._data) - self._pos
+
+    @property
+    def exhausted(self):
+        return self._pos >= len(self._data)
+
+    @property
+    def in_waiting(self):
+        if not self.is_open:
+            return 0
+        return max(0, min(self._arrived() - self._pos, self.max_chunk))
+
+    def wait_readable(self, timeout):
+        """Аналог poll() на дескрипторе: ждём первый байт не дольше timeout"""
+        if self.in_waiting > 0:
+            return True
+        if self.exhausted or self.speed <= 0:
+            time.sleep(timeout)
+            return False
+        ready_at = self._t0 + (self._pos - self._pos % self.fifo + self.fifo) / self._byte_rate
+        time.sleep(max(0.0, min(timeout, ready_at - time.perf_counter())))
+        return self.in_waiting > 0
+
+    def read(self, size=1):
+        n = min(size, self.in_waiting)
+        data = self._data[self._pos:self._pos + n].tobytes()
+        self._pos += n
+        return data
+
+    def write(self, data):
+        self.written.extend(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.is_open = False
+
+
+class PtyReplay:
+    """
+    Воспроизведение через пару псевдотерминалов: поток пишет запись в master,
+    Serial_reader открывает slave как обычный serial.Serial (проверяется и select-режим).
+    """
+
+    def __init__(self, data, baud_rate=256000, speed=1.0, chunk=1024):
+        self._data = bytes(data)
+        self.baud_rate = baud_rate
+        self.speed = speed
+        self.chunk = chunk
+        self._master, self._slave = os.openpty()
+        self.port = os.ttyname(self._slave)
+        self._thread = None
+        self.done = threading.Event()
+        # Время записи каждого куска в master (perf_counter) и смещение его первого байта:
+        # задержку байта до читателя меряет Benchmarks.bench_ingest
+        self.sent_times = []
+        self.sent_offsets = []
+
+    def start(self):
+        self._thread = threading.Thread(target=self._writer, daemon=True, name="PtyReplayWriter")
+        self._thread.start()
+
+    def _writer(self):
+        byte_rate = self.baud_rate / BITS_PER_BYTE * self.speed
+        t0 = time.perf_counter()
+        pos = 0
+        try:
+            while pos < len(self._data):
+                if self.speed > 0:
+                    due = t0 + (pos + self.chunk) / byte_rate
+                    delay = due - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                self.sent_times.append(time.perf_counter())
+                self.sent_offsets.append(pos)  # после времени: читатель видит пару целиком
+                pos += os.write(self._master, self._data[pos:pos + self.chunk])
+        finally:
+            self.done.set()
+
+    def close(self):
+        for fd in (self._master, self._slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+class ReplayZigbee:
+    """
+    Заглушка ZigbeeSerial: собирает бинарные пакеты и текстовые строки вместо отправки в радио.
+    """
+
+    class _Port:
+        is_open = True
+        in_waiting = 0
+
+        def __init__(self):
+            self.frames = []
+
+        def write(self, data):
+            self.frames.append(bytes(data))
+            return len(data)
+
+        def flush(self):
+            pass
+
+        def readline(self):
+            return b""
+
+    def __init__(self):
+        self.ser = self._Port()
+        self.peak_log = []
+        self.messages = []
+
+    def check_incoming_threshold(self):
+        return None
+
+    def send_command(self, command):
+        self.messages.append(command)
+        return True
+
+    def send_data(self, data):
+        self.ser.write(data)
+        return True
+
+
+def run_replay(data, speed=0.0, baud_rate=256000, use_pty=False, peak_threshold=150000000,
+               reader_kwargs=None, zigbee=None):
+    """
+    Прогон записи через Serial_reader.main_serial_reader.
+
+    Returns:
+        отчёт (dict): пакеты/с, события/с, байт/с и список обнаруженных событий
+    """
+    import serial
+
+    reader = Uart_Logic.Serial_reader(baud_rate=baud_rate, **(reader_kwargs or {}))
+    zigbee = zigbee if zigbee is not None else ReplayZigbee()
+
+    pty = None
+    if use_pty:
+        pty = PtyReplay(data, baud_rate=baud_rate, speed=speed)
+        reader.main_ser = serial.Serial(pty.port, baud_rate, timeout=0.1)
+        source_done = pty.done.is_set
+    else:
+        reader.main_ser = ReplaySerial(data, baud_rate=baud_rate, speed=speed)
+        source_done = lambda: reader.main_ser.exhausted
+
+    reader.main_run_flag = True
+    thread = threading.Thread(
+        target=reader.main_serial_reader,
+        args=(zigbee, peak_threshold, STOP_BYTE),
+        daemon=True,
+        name="UARTReplayThread",
+    )
+
+    t0 = time.perf_counter()
+    if pty is not None:
+        pty.start()
+    thread.start()
+
+    # Ждём конца записи и пока читатель не выберет всё из порта
+    while thread.is_alive():
+        if source_done() and reader.main_ser.in_waiting == 0:
+            break
+        time.sleep(0.01)
+    ingest_elapsed = time.perf_counter() - t0
+
+    reader.main_run_flag = False
+    thread.join()
+    elapsed = time.perf_counter() - t0
+
+    if pty is not None:
+        reader.main_ser.close()
+        pty.close()
+
+    packets = reader.main_total_packets - 1
+    events = [
+        {k: record[k] for k in ("packet_num", "event_num", "event_start_idx", "event_end_idx",
+                                "max_value", "duration")}
+        for record in zigbee.peak_log
+    ]
+    return {
+        "bytes": len(data),
+        "speed": speed,
+        "pty": use_pty,
+        "elapsed_s": elapsed,
+        "ingest_elapsed_s": ingest_elapsed,
+        "packets": packets,
+        "events": len(events),
+        "packets_per_s": packets / elapsed if elapsed > 0 else 0.0,
+        "events_per_s": len(events) / elapsed if elapsed > 0 else 0.0,
+        "zigbee_frames": len(getattr(zigbee.ser, "frames", ())),
+        "framer": reader.framer.stats(),
+        "detected": events,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record and replay the raw ADC UART stream")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_rec = sub.add_parser("record", help="record a live capture")
+    p_rec.add_argument("path")
+    p_rec.add_argument("--port", default="/dev/serial0")
+    p_rec.add_argument("--baud", type=int, default=256000)
+    p_rec.add_argument("--seconds", type=float, default=60.0)
+
+    p_syn = sub.add_parser("synth", help="write a synthetic capture")
+    p_syn.add_argument("path")
+    p_syn.add_argument("--packets", type=int, default=500)
+    p_syn.add_argument("--events", type=int, default=1, help="events per packet")
+    p_syn.add_argument("--seed", type=int, default=0)
+
+    p_rep = sub.add_parser("replay", help="replay a capture through Serial_reader")
+    p_rep.add_argument("path")
+    p_rep.add_argument("--speed", type=float, default=0.0, help="1 = real time, N = N x, 0 = as fast as possible")
+    p_rep.add_argument("--baud", type=int, default=256000)
+    p_rep.add_argument("--pty", action="store_true", help="feed through a pty pair instead of a stand-in")
+    p_rep.add_argument("--threshold", type=int, default=150000000)
+    p_rep.add_argument("--read-mode", default="select", choices=["poll", "select"])
+    p_rep.add_argument("--detector", default="stream", choices=["packet", "stream"])
+    p_rep.add_argument("--staged", action="store_true")
+    p_rep.add_argument("--dc-filter", default=Uart_Logic.DC_FILTER_EMA, choices=Uart_Logic.DC_FILTERS)
+    p_rep.add_argument("--json", help="save the report to this file")
+    p_rep.add_argument("--log-level", default="info", choices=Log_Queue.LEVELS)
+
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record_capture(args.path, args.port, args.baud, args.seconds)
+
+    elif args.command == "synth":
+        import Benchmarks
+        packets = Benchmarks.synthetic_packets(args.packets, events_per_packet=args.events, seed=args.seed)
+        data = synthetic_capture(packets, seed=args.seed)
+        with open(args.path, "wb") as f:
+            f.write(data)
+        print(f"[Synth] ✓ {len(packets)} packets, {len(data)} bytes -> {args.path}")
+
+    elif args.command == "replay":
+        with open(args.path, "rb") as f:
+            data = f.read()
+        Log_Queue.setup(args.log_level)
+        report = run_replay(
+            data, speed=args.speed, baud_rate=args.baud, use_pty=args.pty, peak_threshold=args.threshold,
+            reader_kwargs={"read_mode": args.read_mode, "detector": args.detector, "staged": args.staged,
+                           "dc_filter": args.dc_filter},
+        )
+        Log_Queue.flush()
+        print(f"\n[Replay] {report['packets']} packets, {report['events']} events in {report['elapsed_s']:.2f} s "
+              f"-> {report['packets_per_s']:.1f} packets/s, {report['events_per_s']:.1f} events/s")
+        for event in report["detected"]:
+            print(f"  Pack#{event['packet_num']} Event {event['event_num']}: "
+                  f"Start={event['event_start_idx']} End={event['event_end_idx']} Max={event['max_value']:.0f}")
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"[Replay] Report saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+import lzma
+import struct
+import zlib
+
+import numpy as np
+
+# ============================================================================
+# КОДЕКИ ФОРМЫ СИГНАЛА В PKT/EVT-ПАКЕТАХ
+# Поле compression заголовка: старший байт - id кодека, младший - прореживание:
+#   биты 0-6 - шаг (1..127), бит 7 (DECIM_MINMAX) - вместо каждого step-го сэмпла
+#   в блоке из step сэмплов передаются min и max (в порядке по времени).
+# Старые пакеты (compression = 4) -> кодек 0 (raw int32), шаг 4: формат не меняется.
+# Поле length: для CODEC_RAW - число сэмплов, для остальных - байт payload.
+# ============================================================================
+CODEC_RAW = 0     # int32 как есть (4 байта на сэмпл)
+CODEC_VARINT = 1  # разности + zigzag + varint (LEB128), без потерь
+CODEC_INT16 = 2   # int16 со сдвигом на общий для пакета показатель, С ПОТЕРЯМИ
+CODEC_ZLIB = 3    # zlib поверх varint-разностей, без потерь
+CODEC_LZMA = 4    # lzma (raw LZMA2) поверх varint-разностей, без потерь
+
+CODECS = {
+    "raw": CODEC_RAW,
+    "varint": CODEC_VARINT,
+    "int16": CODEC_INT16,
+    "zlib": CODEC_ZLIB,
+    "lzma": CODEC_LZMA,
+}
+CODEC_NAMES = {codec: name for name, codec in CODECS.items()}
+
+# "auto": самый короткий из кодеков без потерь, дешёвых для CPU RPi
+CODEC_AUTO = "auto"
+AUTO_CANDIDATES = (CODEC_VARINT, CODEC_ZLIB)
+
+RAW_DTYPE = np.int32  # нативный порядок байт, как в старых PKT-пакетах
+# Остальные кодеки восстанавливают int64: после вычитания смещения сэмплы выходят за int32
+DECODED_DTYPE = np.int64
+INT16_DTYPE = np.dtype("<i2")
+INT16_EXPONENT = struct.Struct("<B")
+
+# raw LZMA2 без контейнера .xz: заголовок xz съел бы ~60 байт на каждом событии
+LZMA_FILTERS = [{"id": lzma.FILTER_LZMA2, "preset": 6}]
+
+
+DECIM_MINMAX = 0x80
+MAX_STEP = 0x7F
+
+
+def pack_compression(codec, step, minmax=False):
+    """(id кодека, шаг прореживания, min/max-блоки) -> поле compression"""
+    if not 0 < step <= MAX_STEP:
+        raise ValueError(f"decimation step must be 1..{MAX_STEP}, got {step}")
+    return (codec << 8) | (DECIM_MINMAX if minmax else 0) | step
+
+
+def unpack_compression(compression):
+    """поле compression -> (id кодека, шаг прореживания, min/max-блоки)"""
+    return compression >> 8, (compression & MAX_STEP) or 1, bool(compression & DECIM_MINMAX)
+
+
+# ----------------------------------------------------------------------------
+# ПРОРЕЖИВАНИЕ
+# ----------------------------------------------------------------------------
+def decimate(samples, step, minmax=False):
+    """
+    Прореживание окна: каждый step-й сэмпл или (minmax) пара min/max на блок из step сэмплов.
+    min/max сохраняет пики и не даёт алиасинга огибающей: в блок попадает каждый сэмпл.
+    """
+    if not minmax or step == 1:
+        return samples[::step]
+
+    n = len(samples)
+    blocks_count = -(-n // step)
+    if blocks_count == 0:
+        return samples[:0]
+    pad = blocks_count * step - n
+    padded = np.concatenate((samples, np.repeat(samples[-1:], pad))) if pad else samples
+    blocks = np.asarray(padded).reshape(blocks_count, step)
+
+    rows = np.arange(blocks_count)
+    imin = blocks.argmin(axis=1)
+    imax = blocks.argmax(axis=1)
+    first = np.minimum(imin, imax)
+    second = np.maximum(imin, imax)
+
+    out = np.empty(blocks_count * 2, dtype=blocks.dtype)
+    out[0::2] = blocks[rows, first]
+    out[1::2] = blocks[rows, second]
+    return out
+
+
+def sample_positions(count, step, minmax=False):
+    """
+    Позиции (в сэмплах от начала окна) для count прореженных сэмплов - для графика
+    без восстановления полной длины (np.repeat).
+    """
+    if not minmax or step == 1:
+        return np.arange(count, dtype=np.float64) * step
+    # Пара min/max блока k - в первой и второй половине блока
+    positions = np.arange(count, dtype=np.float64) // 2 * step
+    positions[1::2] += step / 2
+    return positions + step / 4
+
+
+def fit_budget(samples, payload_budget, codec):
+    """
+    Прореживание под бюджет payload (байт): без прореживания, если влезает,
+    иначе min/max-блоки с минимальным шагом, при котором кодек укладывается.
+
+    Returns:
+        (шаг, minmax, (id кодека, bytes payload)); при MAX_STEP может превышать бюджет
+    """
+    n = len(samples)
+    encoded = encode(codec, samples)
+    if len(encoded[1]) <= payload_budget or n == 0:
+        return 1, False, encoded
+
+    # Начальная оценка по байтам на сэмпл в полном окне, дальше - подбор вверх
+    bytes_per_sample = len(encoded[1]) / n
+    step = max(2, min(MAX_STEP, int(np.ceil(2 * n * bytes_per_sample / max(1, payload_budget)))))
+    while True:
+        encoded = encode(codec, decimate(samples, step, minmax=True))
+        if len(encoded[1]) <= payload_budget or step == MAX_STEP:
+            return step, True, encoded
+        step = min(MAX_STEP, max(step + 1, int(step * 1.25)))
+
+
+def codec_id(codec):
+    """Имя ("varint") или id кодека -> id; "auto" остаётся как есть"""
+    if codec == CODEC_AUTO:
+        return codec
+    if isinstance(codec, str):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec: {codec!r} (expected one of {tuple(CODECS) + (CODEC_AUTO,)})")
+        return CODECS[codec]
+    if codec not in CODEC_NAMES:
+        raise ValueError(f"Unknown codec id: {codec}")
+    return codec
+
+
+# ----------------------------------------------------------------------------
+# varint (LEB128) над zigzag-разностями, векторно
+# ----------------------------------------------------------------------------
+def _varint_encode(samples):
+    values = np.asarray(samples, dtype=np.int64)
+    deltas = np.diff(values, prepend=np.int64(0))
+    zigzag = ((deltas << 1) ^ (deltas >> 63)).astype(np.uint64)
+
+    # Сколько 7-битных групп нужно каждому значению
+    nbytes = np.ones(len(zigzag), dtype=np.int64)
+    rest = zigzag >> np.uint64(7)
+    while rest.any():
+        nbytes += rest > 0
+        rest >>= np.uint64(7)
+
+    out = np.empty(int(nbytes.sum()), dtype=np.uint8)
+    positions = np.cumsum(nbytes) - nbytes
+    for k in range(int(nbytes.max()) if len(nbytes) else 0):
+        mask = nbytes > k
+        group = (zigzag[mask] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        more = (nbytes[mask] > k + 1).astype(np.uint64) << np.uint64(7)
+        out[positions[mask] + k] = (group | more).astype(np.uint8)
+    return out.tobytes()
+
+
+def _varint_decode(payload):
+    data = np.frombuffer(payload, dtype=np.uint8)
+    if data.size == 0:
+        return np.empty(0, dtype=DECODED_DTYPE)
+    if data[-1] & 0x80:
+        raise ValueError("truncated varint payload")
+
+    ends = np.flatnonzero((data & 0x80) == 0)
+    value_idx = np.zeros(data.size, dtype=np.int64)
+    value_idx[ends[:-1] + 1] = 1
+    value_idx = np.cumsum(value_idx)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    shift = (np.arange(data.size) - starts[value_idx]) * 7
+    if shift.max() > 63:
+        raise ValueError("varint value longer than 64 bits")
+
+    zigzag = np.zeros(ends.size, dtype=np.uint64)
+    np.add.at(zigzag, value_idx, (data & 0x7F).astype(np.uint64) << shift.astype(np.uint64))
+    deltas = (zigzag >> np.uint64(1)).astype(np.int64) ^ -(zigzag & np.uint64(1)).astype(np.int64)
+    return np.cumsum(deltas)
+
+
+# ----------------------------------------------------------------------------
+# int16 с показателем: x ~= int16 << exponent
+# ----------------------------------------------------------------------------
+def _int16_encode(samples):
+    values = np.asarray(samples, dtype=np.int64)
+    peak = int(np.abs(values).max()) if values.size else 0
+    exponent = max(0, peak.bit_length() - 15)
+    scaled = values >> exponent
+    np.clip(scaled, -32768, 32767, out=scaled)
+    return INT16_EXPONENT.pack(exponent) + scaled.astype(INT16_DTYPE).tobytes()
+
+
+def _int16_decode(payload):
+    (exponent,) = INT16_EXPONENT.unpack_from(payload)
+    scaled = np.frombuffer(payload, dtype=INT16_DTYPE, offset=INT16_EXPONENT.size)
+    return scaled.astype(DECODED_DTYPE) << exponent
+
+
+def encode(codec, samples):
+    """
+    Сжатие сэмплов (уже прореженных) выбранным кодеком.
+
+    Returns:
+        (id кодека, bytes payload); для "auto" - id выбранного кодека
+    """
+    codec = codec_id(codec)
+    if codec == CODEC_AUTO:
+        return min((encode(c, samples) for c in AUTO_CANDIDATES), key=lambda item: len(item[1]))
+    if codec == CODEC_RAW:
+        return codec, np.asarray(samples).astype(RAW_DTYPE, casting="unsafe").tobytes()
+    if codec == CODEC_VARINT:
+        return codec, _varint_encode(samples)
+    if codec == CODEC_INT16:
+        return codec, _int16_encode(samples)
+    if codec == CODEC_ZLIB:
+        return codec, zlib.compress(_varint_encode(samples), 9)
+    return codec, lzma.compress(_varint_encode(samples), format=lzma.FORMAT_RAW, filters=LZMA_FILTERS)
+
+
+def decode(codec, payload):
+    """bytes payload -> сэмплы (raw - int32, остальные - int64), без восстановления прореживания"""
+    if codec == CODEC_RAW:
+        return np.frombuffer(payload, dtype=RAW_DTYPE).copy()
+    if codec == CODEC_VARINT:
+        return _varint_decode(payload)
+    if codec == CODEC_INT16:
+        return _int16_decode(payload)
+    if codec == CODEC_ZLIB:
+        return _varint_decode(zlib.decompress(bytes(payload)))
+    if codec == CODEC_LZMA:
+        return _varint_decode(lzma.decompress(bytes(payload), format=lzma.FORMAT_RAW, filters=LZMA_FILTERS))
+    raise ValueError(f"Unknown codec id: {codec}")
+
+
+def payload_size(compression, length):
+    """Размер payload в байтах по полям заголовка compression и length"""
+    codec = unpack_compression(compression)[0]
+    if codec == CODEC_RAW:
+        return length * np.dtype(RAW_DTYPE).itemsize
+    return length
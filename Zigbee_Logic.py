@@ -1,17 +1,236 @@
+import heapq
+import itertools
 import serial
 import time
 import threading
-import Printer
+from collections import deque
+
+import numpy as np
+
+import Log_Queue
+import Peak_Store
+
+log = Log_Queue.get_logger("Zigbee")
+
+# Приоритеты очереди передачи (меньше = раньше)
+PRIORITY_CONTROL = 0  # ответы/команды управления
+PRIORITY_EVENT = 1    # PKT-пакет события и его текстовая строка (один приоритет -> порядок сохраняется)
+PRIORITY_BULK = 2     # всё остальное
+
+# 8N1: старт-бит + 8 бит данных + стоп-бит
+BITS_PER_BYTE = 10
+
+# Сколько ждать ответа модуля после текстовой команды (раньше - sleep в потоке вызывающего)
+RESPONSE_TIMEOUT = 0.2
+
+# Остановка writer'а: после очистки очереди (drain_timeout) ждём, пока он допишет текущий кадр
+WRITER_JOIN_TIMEOUT = 5.0
+
+# Команда порога с ПК: SET:<буква a..t> -> (номер буквы) * THRESHOLD_STEP
+THRESHOLD_STEP = 10000000
+
+
+class CommandParser:
+    """
+    Инкрементальный разбор входящего потока Zigbee (байт за байтом, без regex и строковых буферов).
+
+    Команда - "NAME:ARG": NAME - заглавные латинские буквы прямо перед ':' (мусор перед
+    ними пропускается), ARG - arg_len символов или до конца строки (\r/\n).
+    Строки, в которых не было команды, отдаются в on_line (ответы модуля).
+    Строка длиннее MAX_LINE отбрасывается целиком.
+    """
+    MAX_LINE = 128
+    MAX_NAME = 8
+
+    def __init__(self, on_line=None):
+        self.on_line = on_line
+        self._commands = {}  # b"SET" -> (callback, arg_len)
+        self._line = bytearray()
+        self._command = None  # (name, callback, arg_len, начало аргумента в строке)
+        self._had_command = False
+        self._overflow = False
+
+        self.dispatched = 0
+        self.errors = 0
+        self.overflows = 0
+
+    def register(self, name, callback, arg_len=None):
+        """callback(arg: str) для команды name; arg_len - фиксированная длина аргумента (None - до конца строки)"""
+        if not name.isupper() or not name.isalpha() or len(name) > self.MAX_NAME:
+            raise ValueError(f"Command name must be 1..{self.MAX_NAME} uppercase letters, got {name!r}")
+        self._commands[name.encode("ascii")] = (callback, arg_len)
+
+    def unregister(self, name):
+        self._commands.pop(name.encode("ascii"), None)
+
+    def feed(self, data):
+        for byte in data:
+            if byte in (0x0D, 0x0A):
+                self._end_line()
+                continue
+
+            if self._overflow:
+                continue
+            if len(self._line) >= self.MAX_LINE:
+                self.overflows += 1
+                self._overflow = True
+                self._command = None
+                continue
+
+            self._line.append(byte)
+            if self._command is None:
+                if byte == 0x3A:  # ':'
+                    self._start_command()
+            else:
+                name, callback, arg_len, arg_start = self._command
+                if arg_len is not None and len(self._line) - arg_start >= arg_len:
+                    self._dispatch()
+
+    def _start_command(self):
+        # Имя - заглавные буквы прямо перед ':'
+        end = len(self._line) - 1
+        start = end
+        while start > 0 and end - start < self.MAX_NAME and 0x41 <= self._line[start - 1] <= 0x5A:
+            start -= 1
+        name = bytes(self._line[start:end])
+        entry = self._commands.get(name)
+        if entry is not None:
+            callback, arg_len = entry
+            self._command = (name, callback, arg_len, len(self._line))
+
+    def _dispatch(self):
+        name, callback, arg_len, arg_start = self._command
+        self._command = None
+        self._had_command = True
+        arg = self._line[arg_start:].decode("ascii", errors="replace")
+        self.dispatched += 1
+        try:
+            callback(arg)
+        except Exception as e:
+            self.errors += 1
+            log.error("[Zigbee] ERROR in command %s handler: %s", name.decode(), e)
+
+    def _end_line(self):
+        if self._command is not None:
+            self._dispatch()  # аргумент до конца строки
+        elif self._line and not self._had_command and not self._overflow and self.on_line is not None:
+            self.on_line(self._line.decode("ascii", errors="replace").strip())
+        self._line.clear()
+        self._had_command = False
+        self._overflow = False
+
+    def stats(self):
+        return {"dispatched": self.dispatched, "errors": self.errors, "overflows": self.overflows}
+
+
+class TxQueue:
+    """
+    Ограниченная очередь передачи с приоритетами.
+    Внутри одного приоритета - FIFO. При переполнении отбрасывается
+    самый новый элемент самого низкого приоритета (или новый, если он не важнее).
+    """
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+        self.high_water = 0
+        self.dropped = 0
+        self.bytes = 0  # сколько байт ждёт в очереди
+
+    def __len__(self):
+        return len(self._heap)
+
+    def put(self, priority, item, size=0):
+        """Returns: True если элемент принят, False если отброшен"""
+        entry = (priority, next(self._seq), item, size)
+        with self._cond:
+            if len(self._heap) >= self.maxsize:
+                worst = max(self._heap)
+                self.dropped += 1
+                if worst[0] <= priority:
+                    return False
+                self._heap.remove(worst)
+                heapq.heapify(self._heap)
+                self.bytes -= worst[3]
+
+            heapq.heappush(self._heap, entry)
+            self.bytes += size
+            if len(self._heap) > self.high_water:
+                self.high_water = len(self._heap)
+            self._cond.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        """Самый приоритетный элемент или None по таймауту"""
+        with self._cond:
+            if not self._heap:
+                self._cond.wait(timeout)
+                if not self._heap:
+                    return None
+            _, _, item, size = heapq.heappop(self._heap)
+            self.bytes -= size
+            self._cond.notify_all()
+            return item
+
+    def wait_empty(self, timeout):
+        """Ждать, пока writer не заберёт всё из очереди. Returns: True если очередь пуста"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._heap:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def clear(self):
+        """Отбросить всё из очереди. Returns: сколько элементов отброшено"""
+        with self._cond:
+            count = len(self._heap)
+            self._heap = []
+            self.bytes = 0
+            self._cond.notify_all()
+            return count
 
 
 class ZigbeeSerial():
-    def __init__(self, port='/dev/ttyUSB0', baudrate=9600):
+    def __init__(self, port='/dev/ttyUSB0', baudrate=9600, async_tx=True, tx_queue_size=64,
+                 peak_log_path=None, peak_log_capacity=Peak_Store.DEFAULT_CAPACITY):
         self.port = port
         self.baudrate = baudrate
         self.ser = None
-        self.peak_log = []
+        # Журнал пиков: кольцо последних записей + (если задан путь) append-only файл на диске
+        self.peak_log = Peak_Store.PeakStore(peak_log_capacity, peak_log_path)
         self.port_lock = threading.Lock()
-        self._threshold_buffer = ""   # ← добавляем буфер для порога
+        # Чтение отдельно от записи: writer может долго держать port_lock на медленном линке
+        self._rx_lock = threading.Lock()
+        # Поток, который сейчас внутри rx_parser.feed (обработчики команд): ему нельзя снова читать порт
+        self._rx_state = threading.local()
+
+        # Приём: один поток ZigbeeReader владеет RX и разбирает команды с ПК
+        self.rx_parser = CommandParser(on_line=self._on_response)
+        self._reader = None
+        self._reader_run = False
+        self._pending_threshold = None
+        self._threshold_listeners = []
+        self.register_command("SET", self._on_set_command, arg_len=1)
+
+        # Асинхронная передача: send_command/send_data только кладут в очередь,
+        # запись, паузы по скорости линка и чтение ответа - в потоке ZigbeeWriter
+        self.async_tx = async_tx
+        self.tx_queue = TxQueue(tx_queue_size)
+        self._writer = None
+        self._writer_run = False
+        self._next_write_at = 0.0
+        self._response_until = 0.0
+        self._reset_tx_stats()
 
 
     def init_serial(self):
@@ -23,28 +242,287 @@ class ZigbeeSerial():
         """
         try:
             self.ser = serial.Serial(self.port, self.baudrate, timeout=1)
-            print(f"[Zigbee] ✓ Port {self.port} opened at {self.baudrate} baud")
+            log.info("[Zigbee] ✓ Port %s opened at %d baud", self.port, self.baudrate)
             time.sleep(0.5)  # Даём устройству инициализироваться
+            if self.async_tx:
+                self.start_writer()
+                self.start_reader()
             return True
         except serial.SerialException as e:
-            print(f"[Zigbee] ERROR: Failed to open port - {e}")
+            log.error("[Zigbee] ERROR: Failed to open port - %s", e)
             self.ser = None
             return False
 
-    def send_command(self, command):
+    # ------------------------------------------------------------------
+    # АСИНХРОННАЯ ПЕРЕДАЧА
+    # ------------------------------------------------------------------
+    def _reset_tx_stats(self):
+        self.tx_frames = 0
+        self.tx_bytes = 0
+        self.tx_errors = 0
+        self.tx_dropped_on_stop = 0  # кадры, не отправленные к остановке writer'а
+        self._tx_started = time.monotonic()
+        self._tx_latency = deque(maxlen=1024)
+        self._observed_rate = None
+
+    def start_writer(self):
+        """Запуск потока передачи (вызывается из init_serial при async_tx)"""
+        if self._writer is not None and self._writer.is_alive():
+            self._writer_run = True  # прежний writer ещё дописывает кадр - он и продолжит работу
+            return
+        self._writer_run = True
+        self._reset_tx_stats()
+        self._writer = threading.Thread(target=self._writer_loop, daemon=True, name="ZigbeeWriter")
+        self._writer.start()
+
+    def stop_writer(self, drain_timeout=2.0):
+        """
+        Остановка потока передачи: до drain_timeout отправляем то, что уже в очереди,
+        остальное writer отбрасывает (tx_dropped_on_stop).
+
+        Returns:
+            True если поток завершился (порт можно закрывать)
+        """
+        if self._writer is None:
+            return True
+        self.tx_queue.wait_empty(drain_timeout)
+        self._writer_run = False
+        self.tx_queue.wake()
+        self._writer.join(WRITER_JOIN_TIMEOUT)
+        if self._writer.is_alive():
+            # Запись в порт зависла: поток остаётся в _writer, второй не запустится
+            log.error("[Zigbee] ERROR: writer did not stop in %.0f s (port write blocked)", WRITER_JOIN_TIMEOUT)
+            return False
+        self._writer = None
+        log.info("[Zigbee] Tx stats %s", self.format_tx_stats())
+        return True
+
+    def writer_running(self):
+        return self._writer is not None and self._writer.is_alive()
+
+    def _enqueue(self, priority, data, is_command):
+        if not self.tx_queue.put(priority, (time.perf_counter(), data, is_command), len(data)):
+            log.warning("[Zigbee] WARNING: Tx queue full, frame dropped (%d bytes)", len(data))
+            return False
+        return True
+
+    def _writer_loop(self):
+        while self._writer_run:
+            # Ждём новый кадр; пока ждём ответа модуля (и нет потока приёма) - просыпаемся чаще,
+            # чтобы его прочитать
+            awaiting = time.monotonic() < self._response_until and not self.reader_running()
+            item = self.tx_queue.get(timeout=0.02 if awaiting else 0.1)
+            if awaiting:
+                self._poll_incoming()
+            if item is None:
+                continue
+            if not self._writer_run:
+                self.tx_dropped_on_stop += 1  # остановка пришла, пока ждали кадр
+                break
+
+            enqueued_at, data, is_command = item
+            # Пауза по скорости линка: не отдаём модулю больше, чем он успевает передать
+            delay = self._next_write_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            t0 = time.monotonic()
+            try:
+                with self.port_lock:
+                    self.ser.write(data)
+                    self.ser.flush()
+            except Exception as e:
+                self.tx_errors += 1
+                log.error("[Zigbee] ERROR in writer: %s", e)
+                continue
+
+            now = time.monotonic()
+            if now > t0:
+                # Сглаженная наблюдаемая скорость записи (если драйвер/модуль держит write)
+                observed = len(data) / (now - t0)
+                self._observed_rate = observed if self._observed_rate is None else (
+                    0.8 * self._observed_rate + 0.2 * observed)
+            self._next_write_at = now + len(data) * BITS_PER_BYTE / self.baudrate
+            if is_command:
+                self._response_until = now + RESPONSE_TIMEOUT
+            self.tx_frames += 1
+            self.tx_bytes += len(data)
+            self._tx_latency.append(time.perf_counter() - enqueued_at)
+
+        # Не успели за drain_timeout stop_writer - не отправляем (порт сейчас закроют)
+        leftover = self.tx_queue.clear()
+        if leftover:
+            self.tx_dropped_on_stop += leftover
+            log.warning("[Zigbee] WARNING: %d frame(s) not sent before stop, dropped", leftover)
+
+    # ------------------------------------------------------------------
+    # ПРИЁМ
+    # ------------------------------------------------------------------
+    def start_reader(self):
+        """Запуск потока приёма (вызывается из init_serial при async_tx)"""
+        if self._reader is not None and self._reader.is_alive():
+            return
+        self._reader_run = True
+        self._reader = threading.Thread(target=self._reader_loop, daemon=True, name="ZigbeeReader")
+        self._reader.start()
+
+    def stop_reader(self, timeout=2.0):
+        if self._reader is None:
+            return
+        self._reader_run = False
+        self._reader.join(timeout)
+        self._reader = None
+        log.info("[Zigbee] Rx commands %s", self.rx_parser.stats())
+
+    def reader_running(self):
+        return self._reader is not None and self._reader.is_alive()
+
+    def _reader_loop(self):
+        while self._reader_run:
+            try:
+                # Блокируется до прихода байт (не дольше timeout порта)
+                incoming = self.ser.read(self.ser.in_waiting or 1)
+            except Exception as e:
+                if not self._reader_run:
+                    break
+                log.error("[Zigbee] ERROR in reader: %s", e)
+                time.sleep(0.1)
+                continue
+            if incoming:
+                with self._rx_lock:
+                    self._feed(incoming)
+
+    def _poll_incoming(self):
+        """
+        Неблокирующее чтение входящих байт в разборщик команд (когда нет потока приёма).
+        """
+        if self.ser is None or not self.ser.is_open:
+            return
+        with self._rx_lock:
+            waiting = self.ser.in_waiting
+            if waiting <= 0:
+                return
+            self._feed(self.ser.read(waiting))
+
+    def _feed(self, incoming):
+        """
+        Байты в разборщик команд (вызывающий держит _rx_lock). Обработчики (CFG/GET/STAT)
+        отвечают через send_command: отмечаем поток, чтобы синхронная отправка не читала
+        порт повторно из обработчика (_rx_lock не реентерабельный).
+        """
+        self._rx_state.dispatching = True
+        try:
+            self.rx_parser.feed(incoming)
+        finally:
+            self._rx_state.dispatching = False
+
+    def in_rx_callback(self):
+        """True, если вызов идёт из обработчика команды с ПК (внутри rx_parser.feed)"""
+        return getattr(self._rx_state, "dispatching", False)
+
+    def register_command(self, name, callback, arg_len=None):
+        """
+        Обработчик команды с ПК "NAME:ARG" (вызывается из потока приёма).
+
+        Args:
+            name: имя команды (заглавные буквы)
+            callback: callback(arg: str)
+            arg_len: фиксированная длина аргумента, None - до конца строки
+        """
+        self.rx_parser.register(name, callback, arg_len)
+
+    def unregister_command(self, name):
+        self.rx_parser.unregister(name)
+
+    def add_threshold_listener(self, callback):
+        """callback(new_threshold: int) на каждую команду SET:x (из потока приёма)"""
+        if callback not in self._threshold_listeners:
+            self._threshold_listeners.append(callback)
+
+    def remove_threshold_listener(self, callback):
+        if callback in self._threshold_listeners:
+            self._threshold_listeners.remove(callback)
+
+    def _on_set_command(self, arg):
+        # ДЕКОДИРУЕМ: 'a' -> 1 -> 10 000 000
+        if not 'a' <= arg <= 't':
+            log.warning("[Zigbee] WARNING: bad threshold command SET:%s", arg)
+            return
+        new_threshold = (ord(arg) - ord('a') + 1) * THRESHOLD_STEP
+        log.info("[Zigbee] DECODER: Char '%s' -> Threshold %d", arg, new_threshold)
+
+        self._pending_threshold = new_threshold
+        for callback in list(self._threshold_listeners):
+            callback(new_threshold)
+
+    def _on_response(self, line):
+        if line:
+            log.info("[Zigbee Response] %s", line)
+
+    def tx_backlog_bytes(self):
+        """Байт в очереди передачи (ещё не отданы в порт)"""
+        return self.tx_queue.bytes
+
+    def link_bytes_per_s(self):
+        """Оценка скорости линка: по baudrate или ниже, если запись в порт идёт медленнее"""
+        configured = self.baudrate / BITS_PER_BYTE
+        if self._observed_rate is None:
+            return configured
+        return min(configured, self._observed_rate)
+
+    def tx_stats(self):
+        """Метрики передачи (dict): очередь, байт/с, задержка постановка -> запись"""
+        latency = np.fromiter(self._tx_latency, dtype=float) * 1000.0
+        elapsed = max(1e-9, time.monotonic() - self._tx_started)
+        return {
+            "queue_size": len(self.tx_queue),
+            "queue_max": self.tx_queue.maxsize,
+            "queue_high_water": self.tx_queue.high_water,
+            "dropped": self.tx_queue.dropped,
+            "dropped_on_stop": self.tx_dropped_on_stop,
+            "frames": self.tx_frames,
+            "bytes": self.tx_bytes,
+            "errors": self.tx_errors,
+            "bytes_per_s": self.tx_bytes / elapsed,
+            "link_bytes_per_s": self.link_bytes_per_s(),
+            "link_utilization_pct": 100.0 * self.tx_bytes * BITS_PER_BYTE / self.baudrate / elapsed,
+            "latency_ms_mean": float(latency.mean()) if latency.size else 0.0,
+            "latency_ms_p99": float(np.percentile(latency, 99)) if latency.size else 0.0,
+            "latency_ms_max": float(latency.max()) if latency.size else 0.0,
+        }
+
+    def format_tx_stats(self):
+        s = self.tx_stats()
+        return (f"frames={s['frames']} | bytes={s['bytes']} ({s['bytes_per_s']:.0f} B/s, "
+                f"link {s['link_utilization_pct']:.1f}%) | queue {s['queue_size']}/{s['queue_max']} "
+                f"(max {s['queue_high_water']}, dropped {s['dropped']}, on stop {s['dropped_on_stop']}) | "
+                f"latency mean={s['latency_ms_mean']:.1f} ms p99={s['latency_ms_p99']:.1f} ms "
+                f"max={s['latency_ms_max']:.1f} ms")
+
+    # ------------------------------------------------------------------
+    def send_command(self, command, priority=PRIORITY_EVENT):
         """
         Безопасная отправка команды через Zigbee
 
         Args:
             command: строка команды (будет добавлен \r\n если нет)
+            priority: приоритет в очереди передачи (при работающем writer)
 
         Returns:
-            True если успешно, False если ошибка
+            True если успешно (или поставлено в очередь), False если ошибка
         """
         if self.ser is None or not self.ser.is_open:
-            print("[Zigbee] ERROR: Port not initialized or closed!")
+            log.error("[Zigbee] ERROR: Port not initialized or closed!")
             return False
 
+        if self.writer_running():
+            if not command.endswith('\r\n'):
+                command += '\r\n'
+            if not self._enqueue(priority, command.encode('ascii', errors='replace'), True):
+                return False
+            log.debug("[Zigbee Sent] %s", command.strip())
+            return True
+
         try:
             with self.port_lock:
                 # Формируем команду с переводом строки
@@ -55,44 +533,55 @@ class ZigbeeSerial():
                 command_bytes = command.encode('ascii', errors='replace')
                 self.ser.write(command_bytes)
                 self.ser.flush()
+                self.tx_frames += 1
+                self.tx_bytes += len(command_bytes)
 
-                print(f"[Zigbee Sent] {command.strip()}")
-                print(Printer.DELIMETER)
+                log.debug("[Zigbee Sent] %s", command.strip())
 
-                # Пытаемся получить ответ (опционально)
-                time.sleep(0.2)
-                if self.ser.in_waiting > 0:
-                    response = self.ser.readline().decode('ascii', errors='replace').strip()
-                    if response:
-                        print(f"[Zigbee Response] {response}")
+            # Пытаемся получить ответ (опционально): через разборщик, чтобы не потерять команды с ПК.
+            # Из обработчика команды - нет: разборщик занят, ответ модуля прочитает следующий опрос
+            if not self.reader_running() and not self.in_rx_callback():
+                time.sleep(RESPONSE_TIMEOUT)
+                self._poll_incoming()
 
-                return True
+            return True
 
         except Exception as e:
-            print(f"[Zigbee] ERROR sending command: {e}")
+            log.error("[Zigbee] ERROR sending command: %s", e)
             return False
 
-    def send_data(self, data):
+    def send_reply(self, line):
+        """Ответ на команду с ПК (ACK/NAK): вне очереди событий, раньше накопившихся пакетов"""
+        return self.send_command(line, priority=PRIORITY_CONTROL)
+
+    def send_data(self, data, priority=PRIORITY_EVENT):
         """
         Отправка бинарных данных через Zigbee
 
         Args:
-            data: bytes для отправки
+            data: bytes для отправки (bytes-like; при работающем writer копируется в очередь)
+            priority: приоритет в очереди передачи
 
         Returns:
-            True если успешно, False если ошибка
+            True если успешно (или поставлено в очередь), False если ошибка
         """
         if self.ser is None or not self.ser.is_open:
-            print("[Zigbee] ERROR: Port not open!")
+            log.error("[Zigbee] ERROR: Port not open!")
             return False
 
+        if self.writer_running():
+            # Копия: буфер вызывающего (например, ZigbeeFrameBuilder) будет переписан
+            return self._enqueue(priority, bytes(data), False)
+
         try:
             with self.port_lock:
                 self.ser.write(data)
                 self.ser.flush()
+                self.tx_frames += 1
+                self.tx_bytes += len(data)
                 return True
         except Exception as e:
-            print(f"[Zigbee] ERROR sending data: {e}")
+            log.error("[Zigbee] ERROR sending data: %s", e)
             return False
 
     def read_data(self, size=1024):
@@ -113,7 +602,7 @@ class ZigbeeSerial():
                 return self.ser.read(min(size, self.ser.in_waiting))
             return b''
         except Exception as e:
-            print(f"[Zigbee] ERROR reading data: {e}")
+            log.error("[Zigbee] ERROR reading data: %s", e)
             return b''
 
     def read_line(self):
@@ -132,19 +621,25 @@ class ZigbeeSerial():
                 return line.decode('ascii', errors='replace').strip()
             return ''
         except Exception as e:
-            print(f"[Zigbee] ERROR reading line: {e}")
+            log.error("[Zigbee] ERROR reading line: %s", e)
             return ''
 
     def close_serial(self):
         """
         Безопасное закрытие Zigbee порта
         """
+        writer_stopped = self.stop_writer()
+        self.stop_reader()
+        self.peak_log.flush()
+        if not writer_stopped:
+            log.error("[Zigbee] ERROR: port left open, writer is still running")
+            return
         if self.ser and self.ser.is_open:
             try:
                 self.ser.close()
-                print("[Zigbee] ✓ Port closed")
+                log.info("[Zigbee] ✓ Port closed")
             except Exception as e:
-                print(f"[Zigbee] ERROR closing port: {e}")
+                log.error("[Zigbee] ERROR closing port: %s", e)
 
     def is_connected(self):
         """
@@ -160,7 +655,7 @@ class ZigbeeSerial():
         Очистить логирование пиков
         """
         self.peak_log.clear()
-        print("[Zigbee] Peak log cleared")
+        log.info("[Zigbee] Peak log cleared")
 
     def add_peak_record(self, record):
         """
@@ -182,47 +677,20 @@ class ZigbeeSerial():
 
     def check_incoming_threshold(self):
         """
-        МГНОВЕННАЯ проверка: ищет команду SET:char в буфере.
+        МГНОВЕННАЯ проверка: пришла ли команда SET:char.
         Не блокирует поток. Возвращает int (новый порог) или None.
+        При работающем потоке приёма ввода-вывода здесь нет - только последнее значение из разборщика.
         """
         if self.ser is None or not self.ser.is_open:
             return None
 
-        try:
-            # 1. Проверка без блокировки: есть ли байты?
-            if self.ser.in_waiting > 0:
-                # Читаем всё, что накопилось
-                incoming = self.ser.read(self.ser.in_waiting)
-
-                # Дописываем в хвост внутреннего буфера (чтобы не разорвать команду)
-                text = incoming.decode('ascii', errors='ignore')
-                self._threshold_buffer += text
-
-                # 2. Ищем паттерн "SET:" + одна буква от 'a' до 't'
-                # Ищем ПОСЛЕДНЕЕ вхождение (если пришло сразу 10 команд, берем последнюю)
-                import re
-                matches = re.findall(r'SET:([a-t])', self._threshold_buffer)
-
-                if matches:
-                    last_char = matches[-1]  # Берем последнюю актуальную букву
-
-                    # 3. ДЕКОДИРУЕМ: 'a' -> 1 -> 10 000 000
-                    multiplier = ord(last_char) - ord('a') + 1
-                    new_threshold = multiplier * 10000000
-
-                    print(f"[Zigbee] DECODER: Char '{last_char}' -> Threshold {new_threshold}")
-
-                    # Очищаем буфер, команда выполнена
-                    self._threshold_buffer = ""
-                    return new_threshold
-
-                # Защита от переполнения памяти, если мусор копится
-                if len(self._threshold_buffer) > 50:
-                    self._threshold_buffer = self._threshold_buffer[-20:]
-
-        except Exception:
-            pass  # Игнорируем ошибки чтения, чтобы не сломать основной поток
-
-        return None
-
-
+        if not self.reader_running():
+            try:
+                self._poll_incoming()
+            except Exception:
+                pass  # Игнорируем ошибки чтения, чтобы не сломать основной поток
+
+        # Если пришло сразу несколько команд - берём последнюю
+        with self._rx_lock:
+            new_threshold, self._pending_threshold = self._pending_threshold, None
+        return new_threshold